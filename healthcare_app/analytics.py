@@ -0,0 +1,287 @@
+"""Incrementally maintained admin analytics.
+
+Aggregates live in ``AnalyticsRollup`` rows keyed by (metric, key):
+
+    orders_by_status        status -> orders, sum(final_price)
+    vendor_revenue          vendor -> orders, revenue (cancelled excluded)
+    appointments_by_doctor  doctor id -> appointments
+    prescriptions_by_medicine  medicine -> prescriptions
+    totals                  'orders' / 'appointments' / 'prescriptions' / 'feedback'
+
+A session hook turns every ORM insert, update and delete of those models
+into deltas and appends them to ``AnalyticsDelta`` in the same
+transaction, so a rollback undoes them too. Writers only insert, so they
+never wait on each other for a shared rollup row (every order touches
+``('totals', 'orders')``). Writes that bypass the ORM (bulk import) call
+``record_inserted``.
+
+``fold()`` moves pending deltas into the rollups, one short transaction
+upserting the keys in sorted order. It runs as a periodic job
+(``ANALYTICS_FOLD_INTERVAL``), or on demand from
+``POST /admin/analytics/fold``; the admin pages only read, so they show
+the numbers as of the last fold.
+``rebuild()`` recomputes everything from the base tables, for after raw
+SQL edits or to bootstrap an existing DB.
+
+The dashboard reads a bounded top-N per metric through the
+(metric, events) index, whatever the size of the base tables.
+"""
+from collections import defaultdict
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+import database
+from models import db, AnalyticsDelta, AnalyticsRollup, Appointment, Feedback, Order, Prescription
+from pricing import medicine_key
+
+TOP_N = 10
+FOLD_BATCH = 5000
+
+
+# --- Facts: what one row contributes, as (metric, key, events, amount) ---
+def _order_facts(status, vendor, price):
+    status = status or 'Pending'  # the column default, not yet applied before flush
+    price = price or 0.0
+    facts = [('totals', 'orders', 1, price), ('orders_by_status', status, 1, price)]
+    if vendor and status != 'Cancelled':
+        facts.append(('vendor_revenue', vendor, 1, price))
+    return facts
+
+
+def _appointment_facts(doctor_id):
+    facts = [('totals', 'appointments', 1, 0.0)]
+    if doctor_id is not None:
+        facts.append(('appointments_by_doctor', str(doctor_id), 1, 0.0))
+    return facts
+
+
+def _prescription_facts(medicine):
+    facts = [('totals', 'prescriptions', 1, 0.0)]
+    if medicine_key(medicine):
+        facts.append(('prescriptions_by_medicine', medicine_key(medicine), 1, 0.0))
+    return facts
+
+
+def _feedback_facts():
+    return [('totals', 'feedback', 1, 0.0)]
+
+
+# model -> (attributes the facts depend on, facts function)
+TRACKED = {
+    Order: (('status', 'final_vendor', 'final_price'), _order_facts),
+    Appointment: (('doctor_id',), _appointment_facts),
+    Prescription: (('medicine',), _prescription_facts),
+    Feedback: ((), _feedback_facts),
+}
+
+
+def _add(deltas, facts, sign):
+    for metric, key, events, amount in facts:
+        entry = deltas[(metric, key)]
+        entry[0] += sign * events
+        entry[1] += sign * amount
+
+
+def _current(obj, fields):
+    return [getattr(obj, name) for name in fields]
+
+
+def _previous(obj, fields):
+    state = inspect(obj)
+    values = []
+    for name in fields:
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(obj, name))
+    return values
+
+
+# --- Capture ---
+def _before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault('analytics_deltas', defaultdict(lambda: [0, 0.0]))
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            _add(deltas, tracked[1](*_current(obj, tracked[0])), +1)
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if tracked and tracked[0] and session.is_modified(obj, include_collections=False):
+            _add(deltas, tracked[1](*_previous(obj, tracked[0])), -1)
+            _add(deltas, tracked[1](*_current(obj, tracked[0])), +1)
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            _add(deltas, tracked[1](*_previous(obj, tracked[0])), -1)
+
+
+def _after_flush(session, flush_context):
+    deltas = session.info.pop('analytics_deltas', None)
+    if deltas:
+        record(session.connection(), deltas)
+
+
+def _after_rollback(session):
+    session.info.pop('analytics_deltas', None)
+
+
+_installed = False
+
+
+def install():
+    """Hook every session; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_soft_rollback', lambda session, previous: _after_rollback(session))
+    # Load the old value when an expired attribute is set (e.g. a status
+    # changed after a commit), or _previous() cannot see what it replaced
+    for model, (fields, _) in TRACKED.items():
+        for name in fields:
+            event.listen(getattr(model, name), 'set', _keep_history, active_history=True)
+    _installed = True
+
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+
+def record_inserted(model, rows):
+    """Count rows written with Core INSERTs; call in the same transaction."""
+    tracked = TRACKED.get(model)
+    if not tracked:
+        return
+    deltas = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        _add(deltas, tracked[1](*[row.get(name) for name in tracked[0]]), +1)
+    record(db.session.connection(), deltas)
+
+
+# --- Storage ---
+def _rows(deltas):
+    return [{'metric': metric, 'key': key, 'events': events, 'amount': amount}
+            for (metric, key), (events, amount) in sorted(deltas.items())  # stable lock order
+            if events or amount]
+
+
+def record(connection, deltas):
+    """Append ``{(metric, key): [events, amount]}`` as pending deltas (plain INSERTs)."""
+    rows = _rows(deltas)
+    if rows:
+        connection.execute(insert(AnalyticsDelta), rows)
+
+
+def apply(connection, deltas):
+    """Add ``{(metric, key): [events, amount]}`` to the rollups, keys in sorted order."""
+    rows = _rows(deltas)
+    if not rows:
+        return
+    table = AnalyticsRollup.__table__
+    stmt = database.insert_for(connection, table)
+    if stmt is None:
+        # No upsert in this dialect: update, and insert the keys that did not exist
+        for row in rows:
+            updated = connection.execute(
+                update(table).where(table.c.metric == row['metric'], table.c.key == row['key'])
+                .values(events=table.c.events + row['events'], amount=table.c.amount + row['amount'])
+            ).rowcount
+            if not updated:
+                connection.execute(insert(table), [row])
+        return
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.metric, table.c.key],
+        set_={'events': table.c.events + stmt.excluded.events,
+              'amount': table.c.amount + stmt.excluded.amount},
+    )
+    connection.execute(stmt, rows)
+
+
+def fold(batch_size=FOLD_BATCH):
+    """Move pending deltas into the rollups; returns how many were folded.
+
+    Each batch is claimed with DELETE ... RETURNING and applied in the same
+    transaction, so concurrent folds never count a delta twice.
+    """
+    folded = 0
+    while True:
+        connection = db.session.connection()
+        batch = select(AnalyticsDelta.id).order_by(AnalyticsDelta.id).limit(batch_size)
+        if connection.dialect.delete_returning:
+            claimed = connection.execute(
+                delete(AnalyticsDelta).where(AnalyticsDelta.id.in_(batch))
+                .returning(AnalyticsDelta.metric, AnalyticsDelta.key, AnalyticsDelta.events, AnalyticsDelta.amount)
+            ).all()
+        else:
+            rows = connection.execute(
+                select(AnalyticsDelta.id, AnalyticsDelta.metric, AnalyticsDelta.key,
+                       AnalyticsDelta.events, AnalyticsDelta.amount).where(AnalyticsDelta.id.in_(batch))
+            ).all()
+            connection.execute(delete(AnalyticsDelta).where(AnalyticsDelta.id.in_([row[0] for row in rows])))
+            claimed = [row[1:] for row in rows]
+        deltas = defaultdict(lambda: [0, 0.0])
+        _add(deltas, claimed, +1)
+        apply(connection, deltas)
+        db.session.commit()
+        folded += len(claimed)
+        if len(claimed) < batch_size:
+            return folded
+
+
+def rebuild():
+    """Recompute every rollup from the base tables; returns the row count.
+
+    Writes that land while this runs may be counted twice or not at all,
+    so run it when the app is quiet (or from a maintenance window).
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    for status, vendor, events, amount in db.session.execute(
+            select(Order.status, Order.final_vendor, func.count(), func.coalesce(func.sum(Order.final_price), 0.0))
+            .group_by(Order.status, Order.final_vendor)):
+        for metric, key, _, _ in _order_facts(status, vendor, 0.0):
+            entry = deltas[(metric, key)]
+            entry[0] += events
+            entry[1] += amount
+
+    for doctor_id, events in db.session.execute(
+            select(Appointment.doctor_id, func.count()).group_by(Appointment.doctor_id)):
+        _add(deltas, [(m, k, events, 0.0) for m, k, _, _ in _appointment_facts(doctor_id)], +1)
+
+    for medicine, events in db.session.execute(
+            select(func.lower(Prescription.medicine), func.count()).group_by(func.lower(Prescription.medicine))):
+        _add(deltas, [(m, k, events, 0.0) for m, k, _, _ in _prescription_facts(medicine)], +1)
+
+    feedback = db.session.scalar(select(func.count()).select_from(Feedback))
+    _add(deltas, [(m, k, feedback, 0.0) for m, k, _, _ in _feedback_facts()], +1)
+
+    db.session.query(AnalyticsDelta).delete()
+    db.session.query(AnalyticsRollup).delete()
+    db.session.flush()
+    apply(db.session.connection(), deltas)
+    db.session.commit()
+    return len(deltas)
+
+
+# --- Reading ---
+def top(metric, limit=TOP_N, by_amount=False):
+    order = AnalyticsRollup.amount if by_amount else AnalyticsRollup.events
+    return (AnalyticsRollup.query.filter(AnalyticsRollup.metric == metric, AnalyticsRollup.events > 0)
+            .order_by(order.desc(), AnalyticsRollup.key).limit(limit).all())
+
+
+def summary(limit=TOP_N):
+    """Everything the admin dashboard shows: a fixed number of small reads.
+
+    Reads folded rollups only, so it is as current as the last fold.
+    """
+    totals = {row.key: row for row in AnalyticsRollup.query.filter_by(metric='totals')}
+    return {
+        'totals': {name: totals[name].events if name in totals else 0
+                   for name in ('orders', 'appointments', 'prescriptions', 'feedback')},
+        'order_value': round(totals['orders'].amount, 2) if 'orders' in totals else 0.0,
+        'orders_by_status': top('orders_by_status', limit),
+        'vendor_revenue': top('vendor_revenue', limit, by_amount=True),
+        'appointments_by_doctor': top('appointments_by_doctor', limit),
+        'prescriptions_by_medicine': top('prescriptions_by_medicine', limit),
+    }
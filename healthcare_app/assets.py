@@ -0,0 +1,166 @@
+"""Static files: content-fingerprinted URLs, gzip and long-lived caching.
+
+``url_for('static', filename='styles.css')`` renders
+``/static/styles.<hash>.css``, the hash taken from the file's bytes. A
+fingerprinted URL always names the same bytes, so it is served with a
+one-year ``immutable`` Cache-Control and browsers never ask again; editing
+the file changes the URL. Plain names keep working (bookmarks, pages
+cached before a deploy) but are revalidated every time (ETag / 304).
+
+Text files are gzipped once, in memory, and sent compressed to clients
+that accept it. Files are read on first request and kept for the life of
+the process; in debug mode they are re-read when they change on disk.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import namedtuple
+
+from flask import Response, abort, request, url_for
+from werkzeug.security import safe_join
+
+import instrumentation
+
+# Languages offered by the switcher; each has a string bundle in static/i18n
+LANGUAGES = (('en', 'English'), ('ta', 'தமிழ்'), ('hi', 'हिन्दी'))
+
+DIGEST_LENGTH = 12
+_FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % DIGEST_LENGTH)
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+Asset = namedtuple('Asset', ['name', 'digest', 'mtime', 'mimetype', 'body', 'gzipped'])
+
+
+def fingerprinted(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest}{ext}'
+
+
+class AssetManifest:
+    def __init__(self, root, gzip_min_size=512, max_age=31536000, check_mtime=False):
+        self.root = root
+        self.gzip_min_size = gzip_min_size
+        self.max_age = max_age
+        self.check_mtime = check_mtime
+        self._assets = {}
+        self._lock = threading.Lock()
+
+        self.served = 0
+        self.served_gzip = 0
+        self.not_modified = 0
+
+    def get(self, name):
+        """The Asset for a path under ``root``, or None if there is no such file."""
+        asset = self._assets.get(name)
+        if asset is not None and not self.check_mtime:
+            return asset
+        path = safe_join(self.root, name)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if asset is not None and asset.mtime == mtime:
+            return asset
+        asset = self._load(name, path, mtime)
+        with self._lock:
+            self._assets[name] = asset
+        return asset
+
+    def _load(self, name, path, mtime):
+        with open(path, 'rb') as f:
+            body = f.read()
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        gzipped = None
+        if len(body) >= self.gzip_min_size and mimetype.startswith(_COMPRESSIBLE):
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) >= len(body):
+                gzipped = None
+        digest = hashlib.sha256(body).hexdigest()[:DIGEST_LENGTH]
+        return Asset(name, digest, mtime, mimetype, body, gzipped)
+
+    def url_name(self, name):
+        """``name`` with its content hash spliced in (unchanged if missing)."""
+        asset = self.get(name)
+        return fingerprinted(name, asset.digest) if asset else name
+
+    def resolve(self, filename):
+        """(asset, immutable) for a requested path, fingerprinted or not."""
+        match = _FINGERPRINTED.match(filename)
+        if match:
+            asset = self.get(match['stem'] + match['ext'])
+            if asset is not None:
+                # An old hash still gets the current bytes, just not cached for a year
+                return asset, asset.digest == match['digest']
+        return self.get(filename), False
+
+    def respond(self, filename):
+        asset, immutable = self.resolve(filename)
+        if asset is None:
+            abort(404)
+
+        body, etag = asset.body, asset.digest
+        use_gzip = asset.gzipped is not None and request.accept_encodings['gzip'] > 0
+        if use_gzip:
+            body, etag = asset.gzipped, asset.digest + '-gz'
+
+        response = Response(body, mimetype=asset.mimetype)
+        if use_gzip:
+            response.content_encoding = 'gzip'
+        if asset.gzipped is not None:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+
+        self.served += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+        elif use_gzip:
+            self.served_gzip += 1
+        return response
+
+    def stats(self):
+        assets = list(self._assets.values())
+        return {
+            'files': len(assets),
+            'bytes': sum(len(a.body) for a in assets),
+            'gzipped_bytes': sum(len(a.gzipped) for a in assets if a.gzipped is not None),
+            'served': self.served,
+            'served_gzip': self.served_gzip,
+            'not_modified': self.not_modified,
+        }
+
+
+def init_app(app):
+    """Serve /static through the manifest; create the app with ``static_folder=None``."""
+    manifest = AssetManifest(
+        os.path.join(app.root_path, 'static'),
+        gzip_min_size=app.config['STATIC_GZIP_MIN_SIZE'],
+        max_age=app.config['STATIC_MAX_AGE'],
+        check_mtime=app.debug,
+    )
+    app.extensions['assets'] = manifest
+    app.add_url_rule('/static/<path:filename>', endpoint='static', view_func=manifest.respond)
+
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.url_name(values['filename'])
+
+    @app.context_processor
+    def _languages():
+        return {'languages': LANGUAGES, 'language_bundles': language_bundles}
+
+    instrumentation.add_collector('static_assets', manifest.stats)
+
+
+def language_bundles():
+    """{code: fingerprinted URL} of every language's string bundle."""
+    return {code: url_for('static', filename=f'i18n/{code}.json') for code, _ in LANGUAGES}
@@ -0,0 +1,114 @@
+"""Build time and memory of the columnar report (reporting.py) at scale.
+
+Seeds a throwaway SQLite database (or ``--database``) with ``--rows``
+prescriptions and as many orders, then runs one full ``rebuild``:
+stream both tables out in ``--batch-size`` batches, write the column
+files, aggregate. Reports extraction and aggregation time, bytes on
+disk, and peak resident memory before and after the build, which should
+stay flat as ``--rows`` grows.
+
+    python benchmarks/bench_reporting.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+MEDICINES = ['Paracetamol', 'paracetamol', 'Ibuprofen', 'Amoxicillin', 'Cetirizine', 'Metformin',
+             'Atorvastatin', 'Omeprazole', 'Azithromycin', 'Pantoprazole']
+VENDORS = ['NetMeds', '1mg', 'PharmEasy', 'Apollo']
+STATUSES = ['Pending', 'Shipped', 'Delivered', 'Cancelled']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--database', default=None, help="SQLAlchemy URL (default: temp SQLite file)")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    if args.database is None:
+        handle, path = tempfile.mkstemp(prefix='aegiscare-report-', suffix='.db')
+        os.close(handle)
+        os.remove(path)
+        args.database = f"sqlite:///{path}"
+    os.environ['DATABASE_URL'] = args.database
+    os.environ['PRICE_SNAPSHOT_INTERVAL'] = '0'
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['JOBS_WORKERS'] = '0'
+    os.environ['REPORTS_DIR'] = tempfile.mkdtemp(prefix='aegiscare-reports-')
+    os.environ['REPORT_BATCH_SIZE'] = str(args.batch_size)
+
+
+def seed(app, rows, patients):
+    import migrations
+    from models import db, User, Prescription, Order
+
+    rng = random.Random(7)
+    with app.app_context():
+        migrations.upgrade()
+        db.session.execute(db.insert(User), [{'id': i, 'role': 'patient', 'name': f'patient {i}',
+                                              'contact': f'p{i}', 'password': '-'}
+                                             for i in range(1, patients + 2)])
+        doctor = patients + 1
+        for start in range(0, rows, 50000):
+            ids = range(start + 1, min(rows, start + 50000) + 1)
+            db.session.execute(db.insert(Prescription), [
+                {'id': i, 'doctor_id': doctor, 'patient_id': rng.randint(1, patients),
+                 'medicine': rng.choice(MEDICINES), 'dosage': '1 tablet', 'price': rng.choice([None, 12.5, 40.0, 99.0]),
+                 'status': 'Ordered'} for i in ids])
+            db.session.execute(db.insert(Order), [
+                {'id': i, 'patient_id': rng.randint(1, patients), 'prescription_id': i,
+                 'status': rng.choice(STATUSES), 'final_price': rng.uniform(5, 500), 'final_vendor': rng.choice(VENDORS)}
+                for i in ids])
+            db.session.commit()
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app import create_app
+    app = create_app()
+    started = time.perf_counter()
+    seed(app, args.rows, args.patients)
+    seed_seconds = time.perf_counter() - started
+
+    store = app.extensions['aegiscare'].reports
+    rss_before = peak_rss_mb()
+    with app.app_context():
+        report = store.rebuild()
+    snapshot = os.path.join(store.directory, report['snapshot'])
+    on_disk = sum(os.path.getsize(os.path.join(snapshot, name)) for name in os.listdir(snapshot))
+
+    print(json.dumps({
+        'rows': report['rows'],
+        'seed_seconds': round(seed_seconds, 2),
+        'build_seconds': round(store.last_build_seconds, 2),
+        'aggregate_ms': report['aggregate_ms'],
+        'snapshot_bytes': on_disk,
+        'peak_rss_mb_before': rss_before,
+        'peak_rss_mb_after': peak_rss_mb(),
+        'vendor_share': report['vendor_share'],
+    }, indent=2))
+    shutil.rmtree(store.directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
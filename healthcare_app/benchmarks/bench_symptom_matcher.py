@@ -0,0 +1,79 @@
+"""Match time of SymptomMatcher as the vocabulary grows.
+
+    python benchmarks/bench_symptom_matcher.py [--sizes 300,1000,3000,10000]
+
+The shipped vocabulary is padded with synthetic terms up to each size;
+per-message match time should stay roughly flat because the automaton
+scans the message once regardless of how many terms it holds.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symptom_matcher import SymptomMatcher  # noqa: E402
+
+VOCABULARY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'data', 'symptoms.json')
+
+MESSAGES = [
+    "I have had a bad headache and mild fever since yesterday",
+    "sharp chest pain when climbing stairs, also some heartburn every year",
+    "my child has a sore throat and ear pain",
+    "எனக்கு இரண்டு நாட்களாக தலைவலி மற்றும் காய்ச்சல்",
+    "मुझे सीने में दर्द और चक्कर आ रहे हैं",
+]
+
+
+def padded_vocabulary(size, seed=7):
+    with open(VOCABULARY, encoding='utf-8') as f:
+        specialties = json.load(f)['specialties']
+    real = sum(len(terms) for by_lang in specialties.values() for terms in by_lang.values())
+    rng = random.Random(seed)
+    names = list(specialties)
+    for i in range(max(0, size - real)):
+        words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+                 for _ in range(rng.randint(1, 3))]
+        specialties[names[i % len(names)]].setdefault('synthetic', []).append(' '.join(words))
+    return specialties
+
+
+def run(sizes, rounds):
+    results = []
+    for size in sizes:
+        vocabulary = padded_vocabulary(size)
+        started = time.perf_counter()
+        matcher = SymptomMatcher(vocabulary)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for message in MESSAGES:
+                matcher.match(message)
+        per_match_us = (time.perf_counter() - started) / (rounds * len(MESSAGES)) * 1e6
+
+        results.append({
+            'terms': matcher.term_count,
+            'build_ms': round(build_ms, 2),
+            'match_us': round(per_match_us, 2),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='300,1000,3000,10000')
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    print(json.dumps(run(sizes, args.rounds), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Latency of the offline chatbot path: triage model and open circuit breaker.
+
+    python benchmarks/bench_triage.py [--rounds 2000]
+
+Reports the triage model's build time, per-message classify / assess
+time (p50 / p99, microseconds), and how long a chat turn waits on the
+gateway before falling back: with the breaker closed against an
+unreachable upstream, then with the breaker open.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot_gateway import ChatGateway, GatewayError  # noqa: E402
+from triage import TriageModel  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+MESSAGES = [
+    "I vomited twice after dinner",
+    "I twisted my foot playing football",
+    "feeling hopeless and can't focus",
+    "sharp chest pain when climbing stairs",
+    "எனக்கு இரண்டு நாட்களாக தலைவலி மற்றும் காய்ச்சல்",
+    "पैर मुड़ गया",
+]
+
+
+def percentiles(samples_us):
+    ordered = sorted(samples_us)
+    return {
+        'p50_us': round(statistics.median(ordered), 2),
+        'p99_us': round(ordered[int(len(ordered) * 0.99) - 1], 2),
+    }
+
+
+def time_calls(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        for message in MESSAGES:
+            started = time.perf_counter()
+            fn(message)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return percentiles(samples)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def fallback_wait(gateway, calls):
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        try:
+            gateway.complete(f"message {i}", 'en', 'English')
+        except GatewayError:
+            pass
+        samples.append((time.perf_counter() - started) * 1e6)
+    return percentiles(samples)
+
+
+def run(rounds):
+    started = time.perf_counter()
+    model = TriageModel.from_files(os.path.join(DATA, 'symptoms.json'), os.path.join(DATA, 'triage.json'))
+    build_ms = (time.perf_counter() - started) * 1000
+
+    gateway = ChatGateway(f'http://127.0.0.1:{unused_port()}/v1', 'key', 'model',
+                          connect_timeout=1, deadline=2, breaker_failures=5, breaker_reset=3600)
+    closed = fallback_wait(gateway, gateway.breaker.failure_threshold)
+    opened = fallback_wait(gateway, 200)
+
+    return {
+        'build_ms': round(build_ms, 2),
+        'model': model.stats(),
+        'classify': time_calls(model.classify, rounds),
+        'assess': time_calls(model.assess, rounds),
+        'gateway_wait_breaker_closed': closed,
+        'gateway_wait_breaker_open': opened,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rounds), indent=2))
+
+
+if __name__ == '__main__':
+    main()
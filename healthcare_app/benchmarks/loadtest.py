@@ -0,0 +1,329 @@
+"""Reproducible load test for the AEGISCARE routes.
+
+Seeds a throwaway SQLite database, points the chatbot at a local stub
+LLM, then drives each route from ``--concurrency`` threads. Every thread
+has its own logged-in Flask test client. The report is JSON: p50/p95/p99
+latency, throughput and SQL queries per request for each route. Save it
+per commit and pass an older report as ``--compare`` to see deltas.
+
+    python benchmarks/loadtest.py --requests 200 --concurrency 8 --output bench.json
+    python benchmarks/loadtest.py --compare bench.json
+
+Requests run in-process (no sockets), so numbers measure the app and the
+database, not the network stack.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+import stub_llm  # noqa: E402
+
+MEDICINES = ["Paracetamol", "Amoxicillin", "Ibuprofen", "Cetirizine", "Metformin", "Atorvastatin",
+             "Omeprazole", "Azithromycin", "Amlodipine", "Losartan", "Pantoprazole", "Salbutamol"]
+SPECIALIZATIONS = ["Cardiologist", "ENT", "General Physician", "Dermatologist",
+                   "Ophthalmologist", "Neurologist", "Gastroenterologist", "Orthopedist"]
+SYMPTOMS = ["chest pain since morning", "sore throat and fever", "itchy skin rash",
+            "headache and dizziness", "stomach pain after food", "my eyes are red"]
+PASSWORD = 'loadtest'
+
+
+def random_slot(rng, first_day, days):
+    """A 30-minute slot between 09:00 and 17:00 within ``days`` of ``first_day``."""
+    return first_day + timedelta(days=rng.randrange(days), hours=9, minutes=30 * rng.randrange(16))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--doctors', type=int, default=100)
+    parser.add_argument('--prescriptions', type=int, default=20000)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--appointments', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="requests per route")
+    parser.add_argument('--routes', default=None, help="comma-separated subset of routes")
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default=None, help="SQLAlchemy URL (default: temp SQLite file)")
+    parser.add_argument('--output', default=None, help="write the JSON report here")
+    parser.add_argument('--compare', default=None, help="earlier report to diff against")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Must run before the app is imported: config.py reads the environment."""
+    if args.database is None:
+        handle, path = tempfile.mkstemp(prefix='aegiscare-loadtest-', suffix='.db')
+        os.close(handle)
+        os.remove(path)
+        args.database = f"sqlite:///{path}"
+    os.environ['DATABASE_URL'] = args.database
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    _, url = stub_llm.start(latency=args.llm_latency)
+    os.environ['CHATBOT_API_URL'] = url
+    os.environ['OPENROUTER_API_KEY'] = 'stub'  # any key; without one the gateway is never called
+    os.environ['CHATBOT_CACHE_SIZE'] = '1'  # measure the gateway round-trip, not the cache
+    os.environ['PRICE_SNAPSHOT_INTERVAL'] = '0'  # no background job skewing the numbers
+    os.environ['LOGIN_THROTTLE_ENABLED'] = '0'  # every simulated client shares one IP
+
+
+def seed(app, args):
+    from sqlalchemy import insert, text
+    from werkzeug.security import generate_password_hash
+    import migrations
+    from models import db, User, Prescription, Order, Appointment
+
+    rng = random.Random(args.seed)
+    password = generate_password_hash(PASSWORD)  # one hash: seeding is not what we measure
+
+    def bulk(model, rows, batch=5000):
+        for start in range(0, len(rows), batch):
+            db.session.execute(insert(model), rows[start:start + batch])
+        db.session.commit()
+
+    with app.app_context():
+        migrations.upgrade()
+        bulk(User, [dict(id=i, role='patient', name=f"patient{i}", contact=f"p{i}",
+                         address=f"{i} Main Road, Chennai", password=password,
+                         dob='1990-01-01', height=170.0, weight=65.0, bmi=22.49)
+                    for i in range(1, args.patients + 1)])
+        first_doctor = args.patients + 1
+        doctor_ids = list(range(first_doctor, first_doctor + args.doctors))
+        bulk(User, [dict(id=d, role='doctor', name=f"doctor{d}", contact=f"d{d}", password=password,
+                         specialization=SPECIALIZATIONS[d % len(SPECIALIZATIONS)],
+                         hospital="City Hospital", experience=rng.randint(1, 30),
+                         location=rng.choice(["Chennai", "Madurai", "Delhi"]))
+                    for d in doctor_ids])
+
+        prescriptions = [dict(id=i, doctor_id=rng.choice(doctor_ids),
+                              patient_id=rng.randint(1, args.patients), date='2025-01-01',
+                              medicine=rng.choice(MEDICINES), dosage='1 tablet', instructions='After food',
+                              price=round(rng.uniform(20, 400), 2),
+                              status='Ordered' if i <= args.orders else 'Available')
+                         for i in range(1, args.prescriptions + 1)]
+        bulk(Prescription, prescriptions)
+        bulk(Order, [dict(id=i, patient_id=prescriptions[i - 1]['patient_id'], prescription_id=i,
+                          status='Ordered', final_price=prescriptions[i - 1]['price'],
+                          final_vendor='MedPlus Mart')
+                     for i in range(1, min(args.orders, args.prescriptions) + 1)])
+        booked = {}  # (doctor_id, slot) -> row; the unique index allows one each
+        while len(booked) < args.appointments:
+            doctor_id = rng.choice(doctor_ids)
+            slot = random_slot(rng, datetime(2025, 1, 1), 365)
+            booked.setdefault((doctor_id, slot), dict(
+                id=len(booked) + 1, patient_id=rng.randint(1, args.patients), doctor_id=doctor_id,
+                date=slot.strftime('%Y-%m-%d'), time=slot.strftime('%H:%M'), slot_start=slot,
+                reason='Checkup'))
+        bulk(Appointment, list(booked.values()))
+
+        if db.engine.dialect.name == 'postgresql':
+            # Explicit ids above do not advance the serial sequences
+            for table in ('user', 'prescription', 'order', 'appointment'):
+                db.session.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"(SELECT MAX(id) FROM \"{table}\"))"))
+            db.session.commit()
+
+        import analytics
+        analytics.rebuild()  # seeded with Core inserts, which bypass the rollup hooks
+
+        available = [(p['patient_id'], p['id'], p['medicine'])
+                     for p in prescriptions if p['status'] == 'Available']
+    return doctor_ids, available
+
+
+class QueryCounter:
+    """Counts SQL statements issued by the current thread."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def build_scenarios(args, doctor_ids, available):
+    """route name -> (role, request factory(rng, user_id) -> (method, path, data))."""
+    with_stock = sorted({patient for patient, _, _ in available})
+
+    def compare(rng, _):
+        _, pres_id, medicine = rng.choice(available)
+        return 'GET', f"/compare/{medicine}/{pres_id}", None
+
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+
+    def book(rng, _):
+        slot = random_slot(rng, tomorrow, 60)
+        return 'POST', '/book_appointment', {
+            'doctor_id': str(rng.choice(doctor_ids)),
+            'date': slot.strftime('%Y-%m-%d'),
+            'time': slot.strftime('%H:%M'),
+            'reason': 'Follow-up',
+        }
+
+    def next_slot(rng, _):
+        return 'GET', f"/appointments/next_available?specialization={rng.choice(SPECIALIZATIONS)}", None
+
+    return {
+        'login': ('anonymous', lambda rng, _: ('POST', '/login', {
+            'identifier': f"p{rng.randint(1, args.patients)}", 'password': PASSWORD})),
+        'epharmacy': ('patient', lambda rng, _: ('GET', '/epharmacy', None)),
+        'compare_prices': ('patient', compare),
+        'manage_orders': ('doctor', lambda rng, _: ('GET', '/doctor/manage_orders', None)),
+        'doctor_appointments': ('doctor', lambda rng, _: ('GET', '/doctor/appointments', None)),
+        'book_appointment': ('patient', book),
+        'next_available': ('patient', next_slot),
+        'chatbot_api': ('patient', lambda rng, _: ('POST', '/chatbot_api', {
+            'user_input': rng.choice(SYMPTOMS)})),
+    }, with_stock
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_route(app, counter, role, factory, args, route_seed, user_pool):
+    rng = random.Random(route_seed)
+    per_thread = threading.local()
+    lock = threading.Lock()
+    latencies, queries, errors = [], [], [0]
+
+    def client():
+        if not hasattr(per_thread, 'client'):
+            c = app.test_client()
+            if role != 'anonymous':
+                with lock:
+                    identifier = rng.choice(user_pool[role])
+                prefix = 'p' if role == 'patient' else 'd'
+                c.post('/login', data={'identifier': f"{prefix}{identifier}", 'password': PASSWORD})
+            per_thread.client = c
+        return per_thread.client
+
+    def one(_):
+        c = client()
+        with lock:
+            method, path, data = factory(rng, None)
+        counter.reset()
+        started = time.perf_counter()
+        response = c.open(path, method=method, data=data)
+        response.get_data()  # drain streamed bodies too
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            queries.append(counter.count)
+            if response.status_code >= 400:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None  # noqa: E731
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_reports(current, baseline):
+    """Per-route p95 / throughput / query deltas against an earlier report."""
+    diff = {}
+    for route, now in current['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if not before:
+            continue
+        diff[route] = {
+            key: {'before': before.get(key), 'after': now.get(key)}
+            for key in ('p95_ms', 'throughput_rps', 'queries_mean')
+        }
+    return diff
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+
+    from app import create_app
+    app = create_app()
+    from models import db
+
+    doctor_ids, available = seed(app, args)
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    scenarios, patients_with_stock = build_scenarios(args, doctor_ids, available)
+    user_pool = {'patient': patients_with_stock or list(range(1, args.patients + 1)),
+                 'doctor': doctor_ids}
+    selected = args.routes.split(',') if args.routes else list(scenarios)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'database': args.database.split(':', 1)[0],
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'dataset': {key: getattr(args, key) for key in
+                        ('patients', 'doctors', 'prescriptions', 'orders', 'appointments')},
+        },
+        'routes': {},
+    }
+    for i, route in enumerate(selected):
+        role, factory = scenarios[route]
+        report['routes'][route] = run_route(app, counter, role, factory, args,
+                                            args.seed + i, user_pool)
+    if args.compare:
+        with open(args.compare) as f:
+            report['compare'] = compare_reports(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
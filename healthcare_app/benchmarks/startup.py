@@ -0,0 +1,137 @@
+"""Worker boot time: from ``import app`` to the first response served.
+
+Each run is a fresh interpreter, as a pre-forked worker would be, timed
+in three phases: importing the app module, building the app, and
+serving one request (``--path``, default the login page) through the
+test client. Each run gets an empty SQLite database; apps that still
+create their schema on import pay for that, as their workers did.
+
+Results are appended to a JSONL history (one line per invocation, with
+the commit) so boot time can be followed across commits:
+
+    python benchmarks/startup.py --runs 15
+    python benchmarks/startup.py --app-dir /tmp/older-checkout  # e.g. a git worktree
+    python benchmarks/startup.py --show
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+HISTORY = os.path.join(HERE, 'startup_history.jsonl')
+
+# Runs in the child; prints one JSON line of phase timings in seconds
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+status = application.test_client().get(sys.argv[1]).status_code
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create': created - imported,
+                  'first_request': served - created, 'total': served - started,
+                  'status': status}))
+"""
+
+PHASES = ('import', 'create', 'first_request', 'total')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/login', help="first request to serve")
+    parser.add_argument('--app-dir', default=APP_DIR, help="checkout to measure (default: this one)")
+    parser.add_argument('--label', default=None, help="free-form note stored with the result")
+    parser.add_argument('--history', default=HISTORY, help="JSONL file results are appended to")
+    parser.add_argument('--no-save', action='store_true', help="print only, do not append")
+    parser.add_argument('--show', action='store_true', help="print the history and exit")
+    return parser.parse_args()
+
+
+def run_once(app_dir, path):
+    with tempfile.TemporaryDirectory(prefix='aegiscare-startup-') as tmp:
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+                   PRICE_SNAPSHOT_INTERVAL='0',
+                   SECRET_KEY=os.environ.get('SECRET_KEY', 'startup-benchmark'))
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', PROBE, path], cwd=app_dir, env=env,
+                                capture_output=True, text=True)
+        wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"probe failed:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process'] = wall  # interpreter start and exit included
+    return timings
+
+
+def git_commit(app_dir):
+    """Short HEAD sha, suffixed ``-dirty`` when the checkout has local edits."""
+    try:
+        git = lambda *args: subprocess.run(['git', *args], cwd=app_dir, capture_output=True,  # noqa: E731
+                                           text=True, check=True).stdout.strip()
+        commit = git('rev-parse', '--short', 'HEAD')
+        return commit + '-dirty' if git('status', '--porcelain', '--untracked-files=no') else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(runs):
+    ms = lambda seconds: round(seconds * 1000, 1)  # noqa: E731
+    summary = {}
+    for phase in PHASES + ('process',):
+        values = sorted(run[phase] for run in runs)
+        summary[phase] = {'median_ms': ms(statistics.median(values)),
+                          'min_ms': ms(values[0]), 'max_ms': ms(values[-1])}
+    return summary
+
+
+def show(history):
+    if not os.path.exists(history):
+        print("no history yet")
+        return
+    print(f"{'when':20} {'commit':10} {'import':>8} {'create':>8} {'first':>8} {'total':>8}  label")
+    with open(history, encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            phases = entry['phases']
+            print(f"{entry['timestamp'][:19]:20} {entry.get('commit') or '-':10} "
+                  + ' '.join(f"{phases[p]['median_ms']:8.1f}" for p in PHASES)
+                  + f"  {entry.get('label') or ''}")
+
+
+def main():
+    args = parse_args()
+    if args.show:
+        show(args.history)
+        return
+
+    run_once(args.app_dir, args.path)  # warm the OS file cache and .pyc files
+    runs = [run_once(args.app_dir, args.path) for _ in range(args.runs)]
+    statuses = sorted({run['status'] for run in runs})
+    entry = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(args.app_dir),
+        'label': args.label,
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'path': args.path,
+        'statuses': statuses,
+        'phases': summarize(runs),
+    }
+    print(json.dumps(entry, indent=2))
+    if not args.no_save:
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Local stand-in for the chat-completion endpoint.
+
+Speaks just enough of the OpenAI/OpenRouter protocol for ChatGateway:
+plain JSON replies and ``stream: true`` SSE replies. ``latency`` delays
+each reply to mimic generation time.
+
+    python benchmarks/stub_llm.py --port 8099 --latency 0.2
+    CHATBOT_API_URL=http://127.0.0.1:8099/v1/chat/completions OPENROUTER_API_KEY=stub flask run
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "Rest, drink plenty of fluids and see a doctor if the symptoms persist."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.latency)
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for word in REPLY.split(' '):
+                chunk = {"choices": [{"delta": {"content": word + ' '}}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": REPLY}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port=0, latency=0.0):
+    """Serve on a background thread; returns (server, completions_url)."""
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stub chat-completion server")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start(args.port, args.latency)
+    print(f"Stub LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
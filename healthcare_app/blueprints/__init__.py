@@ -0,0 +1,8 @@
+"""Route blueprints, one per area of the app.
+
+URLs are unchanged from the single-module app; endpoint names gain the
+blueprint prefix (``url_for('pharmacy.epharmacy')``).
+"""
+from blueprints import admin, auth, chatbot, doctor, job_status, patient, pharmacy
+
+BLUEPRINTS = (auth.bp, patient.bp, doctor.bp, admin.bp, pharmacy.bp, chatbot.bp, job_status.bp)
@@ -0,0 +1,103 @@
+from flask import Blueprint, render_template, request, redirect, session, url_for, jsonify
+from flask_login import login_required, current_user
+
+import analytics
+import jobs
+import listings
+import services
+from blueprints.job_status import accepted
+
+bp = Blueprint('admin', __name__)
+
+
+@bp.route('/admin_dashboard')
+@login_required
+def admin_dashboard():
+    if session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    page = listings.feedback_page(
+        after=listings.parse_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+    stats = analytics.summary()
+    specialists = services.get().specialists
+    doctor_names = {}
+    for row in stats['appointments_by_doctor']:
+        doctor = specialists.get(int(row.key))
+        doctor_names[row.key] = doctor.name if doctor else f"Doctor #{row.key}"
+    return render_template('admin_dashboard.html', feedbacks=page.items, next_cursor=page.next_cursor,
+                           stats=stats, doctor_names=doctor_names)
+
+
+@bp.route('/admin/analytics')
+@login_required
+def admin_analytics():
+    if session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    stats = analytics.summary(limit=listings.parse_limit(request.args.get('limit')))
+    return jsonify({
+        'totals': stats['totals'],
+        'order_value': stats['order_value'],
+        'orders_by_status': _rollup_rows(stats['orders_by_status']),
+        'vendor_revenue': _rollup_rows(stats['vendor_revenue']),
+        'appointments_by_doctor': _rollup_rows(stats['appointments_by_doctor']),
+        'prescriptions_by_medicine': _rollup_rows(stats['prescriptions_by_medicine']),
+    })
+
+
+def _rollup_rows(rollups):
+    return [{'key': r.key, 'count': r.events, 'amount': round(r.amount, 2)} for r in rollups]
+
+
+@bp.route('/admin/analytics/fold', methods=['POST'])
+@login_required
+def fold_analytics():
+    """Fold pending deltas now instead of at the next periodic run; 202 plus a status URL."""
+    if session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    job = services.get().jobs.enqueue('analytics.fold', owner_id=current_user.id, dedupe_key='analytics.fold:now')
+    return accepted(job)
+
+
+@bp.route('/admin/metrics/specialists')
+@login_required
+def specialist_directory_metrics():
+    if session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    return jsonify(services.get().specialists.stats())
+
+
+@bp.route('/admin/reports')
+@login_required
+def admin_reports():
+    """The latest columnar report (see reporting.py); a stale one is rebuilt in the background."""
+    if session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    store = services.get().reports
+    report = store.latest()
+    job = None
+    if report is None or store.is_stale(report):
+        job = _report_build_job()
+    if report is None:
+        return accepted(job)
+
+    response = jsonify(dict(report, stale=store.is_stale(report), rebuilding=job is not None))
+    response.set_etag(f"{report['snapshot']}-{job is not None:d}")
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response.make_conditional(request)
+
+
+def _report_build_job():
+    # One build at a time, however many admins are refreshing the page
+    return services.get().jobs.enqueue('reports.build', owner_id=current_user.id, dedupe_key='reports.build')
+
+
+@jobs.task('analytics.fold', priority=jobs.LOW, max_attempts=1, every='ANALYTICS_FOLD_INTERVAL')
+def fold_analytics_job(job):
+    return {'folded': analytics.fold()}
+
+
+@jobs.task('reports.build', priority=jobs.LOW, max_attempts=1)
+def build_report_job(job):
+    report = services.get().reports.rebuild()
+    return {'snapshot': report['snapshot'], 'rows': report['rows']}
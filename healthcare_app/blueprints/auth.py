@@ -0,0 +1,148 @@
+from flask import Blueprint, make_response, render_template, request, redirect, session, url_for, flash
+from flask_login import login_user, logout_user, login_required
+
+import services
+from models import db, User
+from passwords import HasherBusy
+
+bp = Blueprint('auth', __name__)
+
+DASHBOARDS = {
+    'patient': 'patient.patient_dashboard',
+    'doctor': 'doctor.doctor_dashboard',
+    'admin': 'admin.admin_dashboard',
+}
+
+
+@bp.route('/')
+def home():
+    return redirect(url_for('auth.login'))
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    svc = services.get()
+    if request.method == 'POST':
+        if svc.login_throttle is not None and svc.login_throttle.check(request.remote_addr):
+            flash("Too many attempts. Please wait a moment and try again.")
+            return redirect(url_for('auth.register'))
+
+        role = request.form['role']
+        name = request.form['name']
+        address = request.form['address']
+        contact = request.form['contact']
+        try:
+            password = svc.hasher.hash(request.form['password'])
+        except HasherBusy:
+            flash("The server is busy. Please try again in a moment.")
+            return redirect(url_for('auth.register'))
+
+        # ✅ Patient registration
+        if role == 'patient':
+            dob = request.form['dob']
+            height = float(request.form['height'])
+            weight = float(request.form['weight'])
+            bmi = round(weight / ((height / 100) ** 2), 2)
+
+            new_user = User(
+                role=role,
+                name=name,
+                dob=dob,
+                height=height,
+                weight=weight,
+                bmi=bmi,
+                address=address,
+                contact=contact,
+                password=password
+            )
+
+        # ✅ Doctor registration
+        elif role == 'doctor':
+            specialization = request.form['specialization']
+            hospital = request.form['hospital']
+            experience = int(request.form['experience'])
+            location = request.form['location']
+
+            new_user = User(
+                role=role,
+                name=name,
+                specialization=specialization,
+                hospital=hospital,
+                experience=experience,
+                location=location,
+                address=address,
+                contact=contact,
+                password=password
+            )
+
+        # ✅ Admin registration
+        elif role == 'admin':
+            new_user = User(
+                role=role,
+                name=name,
+                address=address,
+                contact=contact,
+                password=password
+            )
+
+        # ❌ If role is invalid
+        else:
+            flash("Invalid role selected. Please try again.")
+            return redirect(url_for('auth.register'))
+
+        # ✅ Save to database
+        db.session.add(new_user)
+        db.session.commit()
+        svc.users.forget(new_user.id)
+        if role == 'doctor':
+            svc.specialists.upsert(new_user)
+        flash("Registration successful! Please log in.")
+        return redirect(url_for('auth.login'))
+
+    return render_template('register.html')
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        svc = services.get()
+        identifier = request.form['identifier']
+        password = request.form['password']
+
+        throttle = svc.login_throttle
+        wait = throttle.check(request.remote_addr, identifier) if throttle else 0
+        if wait:
+            response = make_response(render_template(
+                'login.html', error="Too many login attempts. Please wait and try again."), 429)
+            response.headers['Retry-After'] = str(int(wait) + 1)
+            return response
+
+        # Two single-index lookups instead of one OR across both columns
+        user = (User.query.filter_by(contact=identifier).first()
+                or User.query.filter_by(name=identifier).first())
+
+        try:
+            valid = user is not None and svc.hasher.verify(user.password, password)
+        except HasherBusy:
+            return render_template('login.html', error="The server is busy. Please try again in a moment."), 503
+
+        if valid:
+            if throttle:
+                throttle.succeeded(identifier)
+            if svc.hasher.upgrade(user, password):
+                db.session.commit()
+            login_user(user)
+            session['role'] = user.role
+            return redirect(url_for(DASHBOARDS.get(user.role, 'doctor.doctor_dashboard')))
+        else:
+            return render_template('login.html', error="Invalid username/contact or password")
+
+    return render_template('login.html')
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    session.clear()
+    return redirect(url_for('auth.login'))
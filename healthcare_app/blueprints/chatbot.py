@@ -0,0 +1,184 @@
+"""Symptom chatbot.
+
+The LLM gateway, the symptom matcher and the triage model are built on
+the first chat request (see services.py); ``chatbot_gateway``,
+``requests`` and NumPy are only imported then. While the gateway's
+circuit breaker is open, replies come from the triage model without
+waiting on the upstream.
+"""
+import json
+import logging
+
+from flask import Blueprint, Response, render_template, request, session, jsonify, stream_with_context
+from flask_login import login_required, current_user
+
+import jobs
+import services
+from blueprints.job_status import accepted, wants_async
+from specialist_directory import summary as doctor_summary
+
+bp = Blueprint('chatbot', __name__)
+log = logging.getLogger(__name__)
+
+CHATBOT_LANGUAGES = {"en": "English", "ta": "Tamil", "hi": "Hindi"}
+
+
+@bp.route('/chatbot')
+@login_required
+def chatbot_page():
+    return render_template('chatbot.html')
+
+
+@bp.route('/chatbot_api', methods=['POST'])
+@login_required
+def chatbot_api():
+    """One chat turn. With ``Prefer: respond-async`` (or ``async=1``) the
+    reply is produced by a background job: 202 plus a status URL to poll.
+    """
+    # --- Integration of Language Logic into Chatbot ---
+    user_lang_code = session.get('language', 'en')
+    # --- End Language Logic ---
+
+    user_input = request.form['user_input']
+
+    if wants_async():
+        job = services.get().jobs.enqueue('chat.reply', {
+            'user_input': user_input, 'lang_code': user_lang_code, 'near': current_user.address,
+        }, owner_id=current_user.id)
+        return accepted(job)
+
+    return jsonify({'reply': chat_reply(user_input, user_lang_code, near=current_user.address)})
+
+
+def chat_reply(user_input, lang_code, near=None, fallback=True):
+    """The LLM answer plus a local specialist pick.
+
+    On a gateway error the local first-aid reply is used instead, or the
+    error is raised when ``fallback`` is false.
+    """
+    lang_name = CHATBOT_LANGUAGES.get(lang_code, "English")
+    gateway = services.get().chat_gateway
+    from chatbot_gateway import GatewayError, GatewayNotConfigured  # loaded with the gateway above
+
+    # --- Local Specialist Match (Case-Insensitive) ---
+    # Look for keywords to match a local specialist, even if AI is active
+    specialist, doctor = find_specialist_doctor(user_input, near=near)
+    try:
+        content = gateway.complete(user_input, lang_code, lang_name)
+        # The AI is instructed to reply in a chosen language, no need for JSON parsing here.
+    except GatewayNotConfigured:
+        # No upstream at all: nothing to retry, and no error to show
+        return local_fallback_text(user_input, lang_code) + format_doctor_info(specialist, doctor, with_experience=False)
+    except GatewayError as e:
+        if not fallback:
+            raise
+        # Use local fallback on any API error
+        return local_fallback_text(user_input, lang_code, _shown_error(e)) + format_doctor_info(specialist, doctor, with_experience=False)
+    return content + format_doctor_info(specialist, doctor)  # Append local doctor info to AI response
+
+
+@jobs.task('chat.reply', priority=jobs.HIGH)
+def chat_reply_job(job, user_input, lang_code, near=None):
+    # Upstream errors are retried with backoff; the last attempt falls back locally
+    return {'reply': chat_reply(user_input, lang_code, near, fallback=jobs.is_last_attempt(job))}
+
+
+@bp.route('/chatbot_api/stream', methods=['POST'])
+@login_required
+def chatbot_api_stream():
+    """Same reply as /chatbot_api, relayed as Server-Sent Events.
+
+    ``token`` events carry reply text as it arrives, then one
+    ``specialist`` event carries the doctor recommendation, then ``done``.
+    """
+    user_lang_code = session.get('language', 'en')
+    lang_name = CHATBOT_LANGUAGES.get(user_lang_code, "English")
+    user_input = request.form['user_input']
+
+    # Resolved up front so the trailing event is ready when the reply ends
+    specialist, doctor = find_specialist_doctor(user_input, near=current_user.address)
+    gateway = services.get().chat_gateway
+    from chatbot_gateway import GatewayError
+
+    def generate():
+        sent_any = False
+        with_experience = True
+        try:
+            for chunk in gateway.stream(user_input, user_lang_code, lang_name):
+                sent_any = True
+                yield sse_event('token', {'text': chunk})
+        except GatewayError as e:
+            # Local fallback in streaming mode; a half-streamed reply just stops
+            shown = _shown_error(e)
+            text = local_fallback_text(user_input, user_lang_code, None if sent_any else shown)
+            yield sse_event('token', {'text': ("\n\n" if sent_any else "") + text})
+            with_experience = False
+
+        yield sse_event('specialist', {
+            'specialist': specialist,
+            'doctor': doctor_summary(doctor),
+            'text': format_doctor_info(specialist, doctor, with_experience),
+        })
+        yield sse_event('done', {})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def find_specialist_doctor(user_input, near=None):
+    """Match the symptoms to a specialty and pick the best-ranked doctor.
+
+    ``near`` is the patient's address; doctors located there rank first.
+    """
+    specialist = match_specialist(user_input)
+    # Case-insensitive lookup in the in-memory directory, no DB round-trip
+    doctor = services.get().specialists.best(specialist, near=near)
+    return specialist, doctor
+
+
+def format_doctor_info(specialist, doctor, with_experience=True):
+    if not doctor:
+        return f"\n\n⚠️ No {specialist} available currently in the system."
+
+    location = f"Location: {doctor.location}"
+    if with_experience:
+        location += f" | Experience: {doctor.experience} years"
+    return (
+        f"\n\n🩺 **Recommended Specialist**:\n"
+        f"Dr. {doctor.name}\n"
+        f"{doctor.specialization}, {doctor.hospital}\n"
+        f"{location}"
+    )
+
+
+# --- LOCAL FALLBACK: offline triage (triage.py), in the message's language ---
+def _shown_error(error):
+    """The part of a gateway error the patient sees with the local reply.
+
+    Nothing when the upstream was simply not called (no key, circuit
+    open, at capacity); the detail goes to the log instead.
+    """
+    from chatbot_gateway import GatewayBusy, GatewayNotConfigured, GatewayUnavailable
+
+    if isinstance(error, GatewayNotConfigured):
+        return None
+    log.warning("chatbot answered locally: %s: %s", type(error).__name__, error)
+    if isinstance(error, (GatewayBusy, GatewayUnavailable)):
+        return None
+    return str(error)
+
+
+def local_fallback_text(user_input, lang_code, error=None):
+    error_msg = f"API Error: {error}. " if error else ""
+    return f"🆘 {error_msg}{services.get().triage.assess(user_input, lang_code).advice}"
+
+
+# --- LOCAL SPECIALIST MATCHER ---
+def match_specialist(user_input):
+    """Best specialty for the symptoms in ``user_input`` (en/ta/hi): the
+    keyword matcher, or the triage classifier when no known symptom is named."""
+    return services.get().triage.assess(user_input).specialty
@@ -0,0 +1,152 @@
+from flask import Blueprint, render_template, stream_template, request, redirect, session, url_for, flash, jsonify
+from flask_login import login_required, current_user
+
+import listings
+import services
+from models import db, User, Prescription
+
+bp = Blueprint('doctor', __name__)
+
+
+@bp.route('/doctor_dashboard')
+@login_required
+def doctor_dashboard():
+    if session.get('role') == 'doctor':
+        return render_template('doctor_dashboard.html')
+    return redirect(url_for('auth.login'))
+
+
+@bp.route('/doctor/appointments')
+@login_required
+def doctor_appointments():
+    if current_user.role != 'doctor':
+        return redirect(url_for('auth.login'))
+    page = listings.doctor_appointments(
+        current_user.id,
+        after=listings.parse_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+    return render_template('doctor_appointments.html', appointments=page.items, next_cursor=page.next_cursor)
+
+
+@bp.route('/doctor/patient_history')
+@login_required
+def patient_history():
+    if current_user.role != 'doctor':
+        return redirect(url_for('auth.login'))
+
+    query = request.args.get('q', '')
+    page = listings.patient_directory(
+        query,
+        after=listings.parse_name_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+    return render_template('patient_history.html', patients=page.items,
+                           next_cursor=page.next_cursor, query=query)
+
+
+@bp.route('/doctor/patients')
+@login_required
+def patient_search():
+    """Typeahead / dropdown source: ?q=<name prefix>&after=<cursor>&limit=."""
+    if current_user.role != 'doctor':
+        return jsonify({'error': 'forbidden'}), 403
+
+    page = listings.patient_directory(
+        request.args.get('q', ''),
+        after=listings.parse_name_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+    return jsonify({
+        'patients': [{'id': p.id, 'name': p.name, 'contact': p.contact} for p in page.items],
+        'next': page.next_cursor,
+    })
+
+
+@bp.route('/doctor/patient_history/<int:patient_id>')
+@login_required
+def view_patient_history(patient_id):
+    if current_user.role != 'doctor':
+        return redirect(url_for('auth.login'))
+
+    patient = User.query.get_or_404(patient_id)
+    # Streamed: rows are fetched in chunks as the page renders, so a long
+    # history neither sits in memory nor delays the first byte
+    prescriptions = (Prescription.query.filter_by(patient_id=patient_id)
+                     .order_by(Prescription.id.desc())
+                     .yield_per(200))
+    return stream_template('view_patient_history.html', patient=patient, prescriptions=prescriptions)
+
+
+@bp.route('/doctor/patient_history/<int:patient_id>/prescriptions')
+@login_required
+def patient_prescriptions_api(patient_id):
+    """One page of a patient's prescriptions as JSON, newest first."""
+    if current_user.role != 'doctor':
+        return jsonify({'error': 'forbidden'}), 403
+
+    page = listings.patient_prescriptions(
+        patient_id,
+        after=listings.parse_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+    return jsonify({
+        'prescriptions': [
+            {'id': p.id, 'date': p.date, 'medicine': p.medicine, 'dosage': p.dosage,
+             'instructions': p.instructions, 'price': p.price, 'status': p.status}
+            for p in page.items
+        ],
+        'next': page.next_cursor,
+    })
+
+
+@bp.route('/doctor/prescribe', methods=['GET', 'POST'])
+@login_required
+def prescribe_medicine():
+    if current_user.role != 'doctor':
+        return redirect(url_for('auth.login'))
+
+    if request.method == 'POST':
+        patient = db.session.get(User, request.form.get('patient_id', type=int) or 0)
+        if patient is None or patient.role != 'patient':
+            flash("Please choose a patient from the list.")
+            return redirect(url_for('doctor.prescribe_medicine'))
+        patient_id = patient.id
+        date = request.form['date']
+        medicine = request.form['medicine']
+        dosage = request.form['dosage']
+        instructions = request.form['instructions']
+        price = float(request.form['price'])
+        prescription = Prescription (
+            doctor_id=current_user.id,
+            patient_id=patient_id,
+            date=date,
+            medicine=medicine,
+            dosage=dosage,
+            instructions=instructions,
+            price=price
+        )
+        db.session.add(prescription)
+        db.session.commit()
+        services.get().jobs.enqueue('pricing.refresh', {'medicines': [medicine]}, owner_id=current_user.id)
+        return redirect(url_for('doctor.doctor_dashboard'))
+
+    return render_template('prescribe_medicine.html')
+
+
+@bp.route('/doctor/edit_profile', methods=['GET', 'POST'])
+@login_required
+def edit_profile():
+    if request.method == 'POST':
+        svc = services.get()
+        # current_user is a read-only cached snapshot; edit the row itself
+        user = db.session.get(User, current_user.id)
+        user.hospital = request.form['hospital']
+        user.experience = int(request.form['experience'])
+        user.location = request.form['location']
+        db.session.commit()
+        svc.users.forget(user.id)
+        if user.role == 'doctor':
+            svc.specialists.upsert(user)
+        return redirect(url_for('doctor.doctor_dashboard'))
+    return render_template('edit_profile.html')
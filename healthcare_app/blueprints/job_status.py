@@ -0,0 +1,43 @@
+"""Status polling for background jobs (see jobs.py)."""
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_login import login_required, current_user
+
+import jobs
+import services
+from models import db, Job
+
+bp = Blueprint('jobs', __name__)
+
+
+@bp.before_app_request
+def start_job_workers():
+    queue = services.get().jobs
+    queue.ensure_started()
+    queue.schedule_periodic()
+
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    # Someone else's job is reported as missing, not forbidden
+    if job is None or (job.owner_id != current_user.id and current_user.role != 'admin'):
+        return jsonify({'error': 'not found'}), 404
+    response = jsonify(jobs.describe(job))
+    if job.status not in jobs.FINISHED:
+        response.headers['Retry-After'] = str(max(1, int(current_app.config['JOBS_POLL_INTERVAL'])))
+    return response
+
+
+def wants_async():
+    """True if the client asked for a job id instead of the finished work."""
+    return 'respond-async' in request.headers.get('Prefer', '') or request.values.get('async') == '1'
+
+
+def accepted(job):
+    """202 response for a request whose work was handed to ``job``."""
+    status_url = url_for('jobs.job_status', job_id=job.id)
+    response = jsonify({'job_id': job.id, 'status': job.status, 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, redirect, session, url_for, flash, jsonify
+from flask_login import login_required, current_user
+
+import jobs
+import scheduling
+import services
+from blueprints.job_status import accepted, wants_async
+from models import db, User, Feedback
+from specialist_directory import summary as doctor_summary
+
+bp = Blueprint('patient', __name__)
+
+
+@bp.route('/patient_dashboard')
+@login_required
+def patient_dashboard():
+    if session.get('role') == 'patient':
+        return render_template('patient_dashboard.html')
+    return redirect(url_for('auth.login'))
+
+
+@bp.route('/patient/profile')
+@login_required
+def patient_profile():
+    return render_template('patient_profile.html')
+
+
+@bp.route('/submit_feedback', methods=['POST'])
+@login_required
+def submit_feedback():
+    if session.get('role') != 'patient':
+        return redirect(url_for('auth.login'))
+
+    message = request.form['message']
+    job = services.get().jobs.enqueue('feedback.submit', {'patient_id': current_user.id, 'message': message},
+                                      owner_id=current_user.id)
+    if wants_async():
+        return accepted(job)
+    flash("Thank you for your feedback!", "success")
+    return redirect(url_for('patient.patient_dashboard'))
+
+
+@bp.route('/book_appointment', methods=['GET', 'POST'])
+@login_required
+def book_appointment():
+    if current_user.role != 'patient':
+        return redirect(url_for('auth.login'))
+
+    svc = services.get()
+    if request.method == 'POST':
+        doctor = db.session.get(User, request.form.get('doctor_id', type=int) or 0)
+        slot = scheduling.parse_slot(request.form.get('date'), request.form.get('time'))
+        if doctor is None or doctor.role != 'doctor' or slot is None:
+            flash("Please choose a doctor, a date and a time.", "danger")
+            return redirect(url_for('patient.book_appointment'))
+
+        try:
+            svc.slots.book(current_user.id, doctor.id, slot, request.form.get('reason', ''))
+        except scheduling.SlotTaken as taken:
+            suggestion = f" Next free slot: {taken.next_free:%Y-%m-%d %H:%M}." if taken.next_free else ""
+            flash(f"Dr. {doctor.name} is already booked at {slot:%Y-%m-%d %H:%M}.{suggestion}", "danger")
+            return redirect(url_for('patient.book_appointment'))
+        except scheduling.InvalidSlot as invalid:
+            flash(str(invalid), "danger")
+            return redirect(url_for('patient.book_appointment'))
+        return redirect(url_for('patient.patient_dashboard'))
+
+    config = current_app.config
+    # The doctor list is a cached fragment keyed by the directory's version
+    return render_template('book_appointment.html', directory=svc.specialists,
+                           opens=config['CLINIC_OPENS'], closes=config['CLINIC_CLOSES'],
+                           slot_minutes=config['APPOINTMENT_SLOT_MINUTES'])
+
+
+@bp.route('/appointments/slots/<int:doctor_id>')
+@login_required
+def free_slots(doctor_id):
+    """Free slot times for one doctor on ?date=YYYY-MM-DD."""
+    try:
+        day = datetime.strptime(request.args.get('date', ''), scheduling.DATE_FORMAT).date()
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    return jsonify({
+        'doctor_id': doctor_id,
+        'date': day.strftime(scheduling.DATE_FORMAT),
+        'slots': [slot.strftime(scheduling.TIME_FORMAT)
+                  for slot in services.get().slots.free_slots(doctor_id, day)],
+    })
+
+
+@bp.route('/appointments/next_available')
+@login_required
+def next_available():
+    """Earliest free slot across every doctor of ?specialization=..."""
+    svc = services.get()
+    specialization = request.args.get('specialization', '')
+    near = current_user.address if current_user.role == 'patient' else None
+    doctors = svc.specialists.doctors_for(specialization, near=near)
+    found = svc.slots.next_available([d.id for d in doctors])
+    if found is None:
+        return jsonify({'specialization': specialization, 'available': False})
+    doctor_id, slot = found
+    doctor = next(d for d in doctors if d.id == doctor_id)
+    return jsonify({
+        'specialization': specialization,
+        'available': True,
+        'doctor': doctor_summary(doctor),
+        'date': slot.strftime(scheduling.DATE_FORMAT),
+        'time': slot.strftime(scheduling.TIME_FORMAT),
+    })
+
+
+@jobs.task('feedback.submit', priority=jobs.LOW)
+def submit_feedback_job(job, patient_id, message):
+    # A re-run (retry, lost lease) finds the row it already wrote; the
+    # unique job_id index stops two concurrent runs both inserting
+    feedback = Feedback.query.filter_by(job_id=job.id).first()
+    if feedback is None:
+        feedback = Feedback(patient_id=patient_id, message=message, job_id=job.id)
+        db.session.add(feedback)
+        db.session.commit()
+    return {'feedback_id': feedback.id}
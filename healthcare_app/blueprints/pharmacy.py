@@ -0,0 +1,238 @@
+"""E-pharmacy: price comparison, checkout and order tracking.
+
+Snapshot refreshes (periodic), order status changes and re-pricing of
+newly prescribed medicines run as background jobs; status changes are
+pushed to the patient's open "My Orders" pages (order_events.py).
+"""
+import time
+
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, stream_with_context
+from flask_login import login_required, current_user
+
+import jobs
+import listings
+import order_events
+import orders
+import price_snapshots
+import services
+from blueprints.chatbot import sse_event
+from blueprints.job_status import accepted, wants_async
+from models import db, Prescription, Order
+
+bp = Blueprint('pharmacy', __name__)
+
+
+@bp.route('/patient/my_orders')
+@login_required
+def my_orders():
+    if current_user.role != 'patient':
+        return redirect(url_for('patient.patient_dashboard'))
+
+    page = listings.patient_orders(
+        current_user.id,
+        after=listings.parse_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+
+    return render_template('my_orders.html', orders=page.items, next_cursor=page.next_cursor)
+
+
+@bp.route('/patient/my_orders/stream')
+@login_required
+def my_orders_stream():
+    """Server-Sent Events: one ``order`` event per status change of the patient's orders.
+
+    Changes are pushed through the broker. With the in-process broker,
+    which never sees changes made by other processes, the patient's order
+    statuses are also polled every SSE_POLL_SECONDS. A ``resync`` event
+    means updates were missed and the page should reload; the stream ends
+    after SSE_STREAM_MAX_SECONDS and the browser reconnects on its own.
+    At most SSE_MAX_STREAMS are open per process; past that the answer
+    is a 503.
+    """
+    if current_user.role != 'patient':
+        return Response(status=403)
+
+    svc = services.get()
+    config = current_app.config
+    keepalive, lifetime = config['SSE_KEEPALIVE_SECONDS'], config['SSE_STREAM_MAX_SECONDS']
+    poll = config['SSE_POLL_SECONDS'] if not svc.pubsub.shared else 0
+    if not svc.streams.acquire(blocking=False):
+        return Response(status=503, headers={'Retry-After': str(int(keepalive))})
+
+    patient_id = current_user.id
+    subscription = seen = None
+    closed = []
+
+    def close():
+        # Also runs when the client goes away before the stream starts
+        if not closed:
+            closed.append(True)
+            if subscription is not None:
+                subscription.close()
+            svc.streams.release()
+
+    def generate():
+        nonlocal seen
+        yield "retry: 3000\n\n"
+        now = time.monotonic()
+        deadline, next_keepalive, next_poll = now + lifetime, now + keepalive, now + poll
+        while now < deadline:
+            wake = min(deadline, next_keepalive, next_poll) if poll else min(deadline, next_keepalive)
+            message = subscription.get(timeout=max(wake - now, 0))
+            if subscription.overflowed:
+                yield sse_event('resync', {})
+                return
+            now = time.monotonic()
+            changes = [message] if message is not None else []
+            if seen is not None:
+                if message is not None:
+                    seen[message['order_id']] = message['status']
+                elif now >= next_poll:
+                    current = _order_statuses(patient_id)
+                    changes = [{'order_id': order_id, 'status': status} for order_id, status in current.items()
+                               if seen.get(order_id) != status]
+                    seen, next_poll = current, now + poll
+            for change in changes:
+                yield sse_event('order', change)
+            if changes:
+                next_keepalive = now + keepalive
+            elif now >= next_keepalive:
+                yield ": keepalive\n\n"
+                next_keepalive = now + keepalive
+
+    # Until call_on_close owns it, a failure here must hand the slot back
+    try:
+        # Subscribed before the response starts, so nothing published from here on is missed
+        subscription = svc.pubsub.subscribe(order_events.channel(patient_id))
+        if poll:
+            seen = _order_statuses(patient_id)
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(close)
+    except BaseException:
+        close()
+        raise
+    return response
+
+
+def _order_statuses(patient_id):
+    """{order id: status} for the patient, through the patient_id index.
+
+    The session is closed again so an open stream holds no connection
+    between polls.
+    """
+    statuses = dict(db.session.query(Order.id, Order.status).filter(Order.patient_id == patient_id))
+    db.session.close()
+    return statuses
+
+
+@bp.route('/epharmacy', methods=['GET', 'POST'])
+@login_required
+def epharmacy():
+    if current_user.role != 'patient':
+        return redirect(url_for('patient.patient_dashboard'))
+
+    svc = services.get()
+    # Get available prescriptions (not yet ordered)
+    available_prescriptions = Prescription.query.filter_by(
+        patient_id=current_user.id,
+        status='Available'
+    ).all()
+
+    # Handle order submission: one prescription from the compare page, or
+    # every ticked prescription from the cart form below
+    if request.method == 'POST':
+        items = []
+        for pres_id in request.form.getlist('prescription_id', type=int):
+            vendor = request.form.get(f'vendor_{pres_id}') or request.form.get('vendor')
+            if vendor:
+                items.append((pres_id, vendor))
+
+        try:
+            result = orders.checkout(current_user.id, items, request.form.get('idempotency_key'),
+                                     svc.prices)
+        except orders.Unavailable:
+            flash("Some of those prescriptions have already been ordered. Nothing was charged.", "danger")
+            return redirect(url_for('pharmacy.epharmacy'))
+        except orders.OrderError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('pharmacy.epharmacy'))
+
+        for order in result.orders:
+            flash(f"🎉 Order Confirmed with {order.final_vendor} for ₹{order.final_price}! Click the link to complete purchase.", "success")
+        return redirect(url_for('pharmacy.epharmacy'))
+
+    # Handle display logic (GET): stored snapshots for every listed medicine
+    prices = svc.prices([pres.medicine for pres in available_prescriptions])
+    return render_template('epharmacy.html', prescriptions=available_prescriptions, prices=prices,
+                           idempotency_key=orders.new_key())
+
+
+@bp.route('/compare/<medicine_name>/<int:pres_id>')
+@login_required
+def compare_prices(medicine_name, pres_id):
+    prescription = Prescription.query.get_or_404(pres_id)
+    # Priced by the prescription's medicine so the order POST sees the same quotes
+    priced = services.get().prices([prescription.medicine])[prescription.medicine]
+
+    return render_template('compare_prices.html',
+                           vendors=priced.vendors,
+                           cheapest=priced.cheapest,
+                           priced_at=priced.refreshed_at,
+                           stale=priced.stale,
+                           medicine_name=medicine_name,
+                           pres_id=pres_id,
+                           prescription=prescription,
+                           idempotency_key=orders.new_key())
+
+
+@bp.route('/doctor/manage_orders', methods=['GET', 'POST'])
+@login_required
+def manage_orders():
+    if current_user.role != 'doctor':
+        return redirect(url_for('doctor.doctor_dashboard'))
+
+    if request.method == 'POST':
+        order_id = request.form.get('order_id', type=int)
+        new_status = request.form['status']
+
+        # The update (and whatever reacts to it) runs as a job
+        if order_id and db.session.get(Order, order_id):
+            job = services.get().jobs.enqueue('orders.set_status', {'order_id': order_id, 'status': new_status},
+                                              owner_id=current_user.id)
+            if wants_async():
+                return accepted(job)
+            flash(f"Order #{order_id} is being updated to {new_status}.", 'success')
+        return redirect(url_for('pharmacy.manage_orders'))
+
+    # Fetch one page of orders to display
+    page = listings.all_orders(
+        after=listings.parse_cursor(request.args.get('after')),
+        limit=listings.parse_limit(request.args.get('limit')),
+    )
+
+    return render_template('manage_orders.html', orders=page.items, next_cursor=page.next_cursor)
+
+
+@jobs.task('orders.set_status', priority=jobs.HIGH)
+def set_order_status_job(job, order_id, status):
+    order = db.session.get(Order, order_id)
+    if order is None:
+        raise jobs.Permanent(f"order {order_id} does not exist")
+    order.status = status
+    db.session.commit()
+    return {'order_id': order_id, 'status': status}
+
+
+@jobs.task(price_snapshots.REFRESH_JOB, priority=jobs.LOW, max_attempts=1, every='PRICE_SNAPSHOT_INTERVAL')
+def refresh_snapshots_job(job):
+    return {'stored': price_snapshots.refresh(services.get().pricing)}
+
+
+@jobs.task('pricing.refresh', priority=jobs.LOW)
+def refresh_prices_job(job, medicines):
+    svc = services.get()
+    for medicine in medicines:
+        svc.ensure_priced(medicine)
+    return {'medicines': len(medicines)}
@@ -0,0 +1,390 @@
+"""Bulk CSV / JSONL import and export for users, prescriptions and orders.
+
+Imports stream the input ``batch_size`` rows at a time, so memory stays
+bounded however large the file is. Each batch is validated, has its
+plaintext passwords hashed across a process pool, and is written with a
+single multi-row INSERT and one commit. Bad rows are reported by line
+number and skipped; the rest of the batch still goes in.
+
+Exports stream rows with ``yield_per`` and write them as they arrive.
+A users export carries the password hashes (``password_hash`` column),
+so it can be imported back unchanged as a backup.
+
+    flask import-data users hospital_staff.csv --errors rejected.jsonl
+    flask export-data prescriptions backup/prescriptions.jsonl
+"""
+import csv
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DBAPIError
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Prescription, Order
+import analytics
+import passwords
+
+FORMATS = ('csv', 'jsonl')
+ROLES = ('patient', 'doctor', 'admin')
+
+RowError = namedtuple('RowError', ['line', 'message'])
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.failed = 0
+
+    def as_dict(self):
+        return {'read': self.read, 'inserted': self.inserted, 'failed': self.failed}
+
+
+def format_for(path, fmt=None):
+    """Explicit ``fmt``, else guessed from the file extension."""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    return fmt
+
+
+# --- Field specs ---
+def _text(value):
+    value = '' if value is None else str(value).strip()
+    return value or None
+
+
+def _int(value):
+    value = _text(value)
+    return int(value) if value is not None else None
+
+
+def _float(value):
+    value = _text(value)
+    return float(value) if value is not None else None
+
+
+# column -> converter; anything else in the input is ignored
+USER_FIELDS = {
+    'id': _int, 'role': _text, 'name': _text, 'dob': _text, 'height': _float,
+    'weight': _float, 'bmi': _float, 'address': _text, 'contact': _text,
+    'specialization': _text, 'hospital': _text, 'experience': _int, 'location': _text,
+    'adminID': _int,
+}
+PRESCRIPTION_FIELDS = {
+    'id': _int, 'doctor_id': _int, 'patient_id': _int, 'date': _text, 'medicine': _text,
+    'dosage': _text, 'instructions': _text, 'price': _float, 'status': _text,
+}
+ORDER_FIELDS = {
+    'id': _int, 'patient_id': _int, 'prescription_id': _int, 'status': _text,
+    'final_price': _float, 'final_vendor': _text, 'checkout_key': _text,
+}
+
+
+def _convert(raw, fields):
+    row = {}
+    for column, convert in fields.items():
+        try:
+            row[column] = convert(raw.get(column))
+        except ValueError:
+            raise ValueError(f"{column}: not a number ({raw.get(column)!r})")
+    return row
+
+
+def _too_long(row, model):
+    """An error for the first text value longer than its column allows, else None."""
+    columns = model.__table__.c
+    for column, value in row.items():
+        limit = getattr(columns[column].type, 'length', None) if column in columns else None
+        if limit and isinstance(value, str) and len(value) > limit:
+            return f"{column}: longer than {limit} characters"
+    return None
+
+
+# --- Reading ---
+def read_rows(stream, fmt):
+    """Yield (line_number, raw dict or None, error or None) lazily."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for raw in reader:
+            yield reader.line_num, raw, None
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(raw, dict):
+            yield line_number, None, "expected a JSON object"
+            continue
+        yield line_number, raw, None
+
+
+def _contacts_to_ids(contacts):
+    contacts = {c for c in contacts if c}
+    if not contacts:
+        return {}
+    rows = db.session.execute(select(User.contact, User.id).where(User.contact.in_(contacts)))
+    return dict(rows.all())
+
+
+def _resolve_person(raw, row, column, ids_by_contact):
+    """Fill ``<column>_id`` from ``<column>_contact`` when only the contact is given."""
+    if row[f'{column}_id'] is None:
+        contact = _text(raw.get(f'{column}_contact'))
+        row[f'{column}_id'] = ids_by_contact.get(contact)
+        if row[f'{column}_id'] is None:
+            return f"unknown {column}" + (f" contact {contact!r}" if contact else "")
+    return None
+
+
+# --- Per-entity batch preparation: [(line, raw)] -> ([(line, row)], [RowError]) ---
+def _prepare_users(batch, hasher):
+    rows, errors, plaintext = [], [], []
+    seen = set()
+    existing = set(_contacts_to_ids(_text(raw.get('contact')) for _, raw in batch))
+    for line, raw in batch:
+        try:
+            row = _convert(raw, USER_FIELDS)
+        except ValueError as exc:
+            errors.append(RowError(line, str(exc)))
+            continue
+        password, password_hash = _text(raw.get('password')), _text(raw.get('password_hash'))
+        too_long = _too_long(row, User)
+        if too_long:
+            message = too_long
+        elif password_hash and len(password_hash) > User.password.type.length:
+            message = f"password_hash: longer than {User.password.type.length} characters"
+        elif row['role'] not in ROLES:
+            message = f"role must be one of {', '.join(ROLES)}"
+        elif not row['name'] or not row['contact']:
+            message = "name and contact are required"
+        elif row['contact'] in existing or row['contact'] in seen:
+            message = f"contact {row['contact']!r} is already registered"
+        elif not password and not password_hash:
+            message = "password (or password_hash) is required"
+        elif password_hash and not password and '$' not in password_hash:
+            message = "password_hash is not a werkzeug hash"
+        else:
+            message = None
+        if message:
+            errors.append(RowError(line, message))
+            continue
+        seen.add(row['contact'])
+        row['password'] = password_hash if not password else None
+        rows.append((line, row))
+        if password:
+            plaintext.append((row, password))
+
+    for (row, _), hashed in zip(plaintext, hasher([p for _, p in plaintext])):
+        row['password'] = hashed
+    return rows, errors
+
+
+def _prepare_prescriptions(batch, hasher):
+    ids_by_contact = _contacts_to_ids(
+        _text(raw.get(key)) for _, raw in batch for key in ('doctor_contact', 'patient_contact'))
+    rows, errors = [], []
+    for line, raw in batch:
+        try:
+            row = _convert(raw, PRESCRIPTION_FIELDS)
+        except ValueError as exc:
+            errors.append(RowError(line, str(exc)))
+            continue
+        message = (_resolve_person(raw, row, 'doctor', ids_by_contact)
+                   or _resolve_person(raw, row, 'patient', ids_by_contact))
+        if not message and not row['medicine']:
+            message = "medicine is required"
+        message = message or _too_long(row, Prescription)
+        if message:
+            errors.append(RowError(line, message))
+            continue
+        row['status'] = row['status'] or 'Available'
+        rows.append((line, row))
+    return rows, errors
+
+
+def _prepare_orders(batch, hasher):
+    converted, errors = [], []
+    for line, raw in batch:
+        try:
+            converted.append((line, _convert(raw, ORDER_FIELDS)))
+        except ValueError as exc:
+            errors.append(RowError(line, str(exc)))
+    pres_ids = {row['prescription_id'] for _, row in converted if row['prescription_id']}
+    owners = dict(db.session.execute(
+        select(Prescription.id, Prescription.patient_id).where(Prescription.id.in_(pres_ids))
+    ).all()) if pres_ids else {}
+
+    rows = []
+    for line, row in converted:
+        if row['prescription_id'] not in owners:
+            errors.append(RowError(line, f"unknown prescription {row['prescription_id']}"))
+            continue
+        if row['patient_id'] is None:
+            row['patient_id'] = owners[row['prescription_id']]
+        elif row['patient_id'] != owners[row['prescription_id']]:
+            errors.append(RowError(line, "prescription belongs to a different patient"))
+            continue
+        message = _too_long(row, Order)
+        if message:
+            errors.append(RowError(line, message))
+            continue
+        row['status'] = row['status'] or 'Pending'
+        rows.append((line, row))
+    return rows, errors
+
+
+ENTITIES = {
+    'users': (User, _prepare_users),
+    'prescriptions': (Prescription, _prepare_prescriptions),
+    'orders': (Order, _prepare_orders),
+}
+
+
+# --- Import ---
+def import_rows(entity, stream, fmt='csv', batch_size=1000, workers=None, on_error=None,
+                hash_method='scrypt'):
+    """Stream ``stream`` into the ``entity`` table; returns an ImportReport.
+
+    ``on_error(RowError)`` is called for every rejected row.
+    """
+    model, prepare = ENTITIES[entity]
+    report = ImportReport()
+    on_error = on_error or (lambda error: None)
+    explicit_ids = False
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if entity == 'users' and workers > 1:
+        # Not forked: this process holds the engine's connections (see passwords.py)
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context(passwords.START_METHOD))
+
+    hash_one = partial(generate_password_hash, method=hash_method)
+
+    def hasher(passwords):
+        if pool is None or len(passwords) < 8:
+            return [hash_one(p) for p in passwords]
+        chunk = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(hash_one, passwords, chunksize=chunk))
+
+    def flush(batch):
+        nonlocal explicit_ids
+        rows, errors = prepare(batch, hasher)
+        inserted, insert_errors = _insert(model, rows)
+        report.inserted += inserted
+        explicit_ids = explicit_ids or any(row.get('id') for _, row in rows)
+        for error in sorted(errors + insert_errors):
+            report.failed += 1
+            on_error(error)
+
+    try:
+        batch = []
+        for line, raw, error in read_rows(stream, fmt):
+            report.read += 1
+            if error:
+                report.failed += 1
+                on_error(RowError(line, error))
+                continue
+            batch.append((line, raw))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if explicit_ids:
+        _sync_sequence(model)
+    return report
+
+
+def _insert(model, rows):
+    """One multi-row INSERT per column shape; falls back row by row on any database error."""
+    if not rows:
+        return 0, []
+    shapes = {}
+    for line, row in rows:
+        if row.get('id') is None:
+            row = {k: v for k, v in row.items() if k != 'id'}
+        shapes.setdefault(tuple(sorted(row)), []).append((line, row))
+    try:
+        for group in shapes.values():
+            db.session.execute(insert(model), [row for _, row in group])
+        analytics.record_inserted(model, [row for _, row in rows])
+        db.session.commit()
+        return len(rows), []
+    except DBAPIError as exc:
+        db.session.rollback()
+        if exc.connection_invalidated:
+            raise
+
+    # Something in the batch clashed (duplicate id, contact registered
+    # meanwhile, dangling foreign key) or did not fit a column (DataError
+    # on Postgres); find it row by row.
+    inserted, errors = 0, []
+    for group in shapes.values():
+        for line, row in group:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(model), [row])
+                    analytics.record_inserted(model, [row])
+                inserted += 1
+            except DBAPIError as exc:
+                if exc.connection_invalidated:
+                    raise
+                errors.append(RowError(line, f"rejected by the database: {exc.orig}"))
+    db.session.commit()
+    return inserted, errors
+
+
+def _sync_sequence(model):
+    # Explicit ids do not advance Postgres serial sequences
+    if db.engine.dialect.name != 'postgresql':
+        return
+    table = model.__table__.name
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"))
+    db.session.commit()
+
+
+# --- Export ---
+EXPORT_COLUMNS = {
+    'users': [c for c in USER_FIELDS] + ['password_hash'],
+    'prescriptions': list(PRESCRIPTION_FIELDS),
+    'orders': list(ORDER_FIELDS),
+}
+
+
+def export_rows(entity, stream, fmt='csv', batch_size=1000):
+    """Write every ``entity`` row to ``stream`` in id order; returns the count."""
+    model, _ = ENTITIES[entity]
+    names = EXPORT_COLUMNS[entity]
+    columns = [model.password if name == 'password_hash' else getattr(model, name) for name in names]
+    result = db.session.execute(
+        select(*columns).order_by(model.id).execution_options(yield_per=batch_size)
+    )
+
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(names)
+    count = 0
+    for values in result:
+        if writer:
+            writer.writerow(['' if v is None else v for v in values])
+        else:
+            stream.write(json.dumps(dict(zip(names, values)), ensure_ascii=False) + '\n')
+        count += 1
+    return count
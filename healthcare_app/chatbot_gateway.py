@@ -0,0 +1,311 @@
+"""Gateway between /chatbot_api and the remote chat-completion endpoint.
+
+* one pooled keep-alive ``requests.Session`` shared by all requests
+* a hard per-request deadline (connect + read + queueing), not just a
+  per-socket timeout
+* a concurrency limiter: when every upstream slot is busy the caller is
+  turned away at once (and served by the local fallback) instead of
+  piling more Flask workers onto a slow upstream
+* a TTL/LRU cache keyed on the normalized question and reply language
+* ``stream()`` relays completion tokens as they arrive for the SSE route
+* a circuit breaker: after repeated upstream failures calls fail at once
+  (``GatewayUnavailable``) so chat turns go straight to the local triage
+  model (triage.py); one trial call per ``reset_timeout`` probes recovery
+* without an API key every call fails at once (``GatewayNotConfigured``)
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+
+
+# What indexing into an unexpected JSON shape raises
+MALFORMED = (ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+
+class GatewayError(Exception):
+    """The remote completion could not be obtained."""
+
+
+class GatewayBusy(GatewayError):
+    """All upstream slots are taken."""
+
+
+class GatewayTimeout(GatewayError):
+    """The completion did not arrive before the deadline."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The circuit breaker is open; the upstream is not being called."""
+
+
+class GatewayNotConfigured(GatewayError):
+    """No API key is configured; the upstream is never called."""
+
+
+def normalize_input(user_input):
+    return ' '.join(user_input.lower().split())
+
+
+def build_messages(user_input, lang_name):
+    return [
+        {
+            "role": "system",
+            # Instruct the AI to reply in the user's selected language
+            "content": f"You are a healthcare assistant. Provide first aid advice and recommend a specialist. Reply fully in {lang_name}."
+        },
+        {"role": "user", "content": user_input}
+    ]
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures.
+
+    While open every call is refused. ``reset_timeout`` seconds after
+    opening, one trial call is let through (half-open): success closes the
+    circuit, failure opens it again. A trial that never reports back (an
+    abandoned stream) is replaced by a new one after another
+    ``reset_timeout``.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2  # numeric so /metrics can export the state
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self._since = 0.0  # when the circuit opened, or the trial call started
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self._clock() - self._since >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._since = self._clock()
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self):
+        return max(0.0, self.reset_timeout - (self._clock() - self._since))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._since = self._clock()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+
+class ChatGateway:
+    def __init__(self, url, api_key, model, connect_timeout=3.0, deadline=20.0,
+                 max_concurrency=8, cache_size=512, cache_ttl=600,
+                 breaker_failures=5, breaker_reset=30.0):
+        self.url = url
+        # Optional callback(seconds) after each upstream call, for metrics
+        self.on_upstream = None
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.configured = bool(api_key)
+
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        if self.configured:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='chatbot')
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            url=config['CHATBOT_API_URL'],
+            api_key=config['CHATBOT_API_KEY'],
+            model=config['CHATBOT_MODEL'],
+            connect_timeout=config['CHATBOT_CONNECT_TIMEOUT'],
+            deadline=config['CHATBOT_DEADLINE'],
+            max_concurrency=config['CHATBOT_MAX_CONCURRENCY'],
+            cache_size=config['CHATBOT_CACHE_SIZE'],
+            cache_ttl=config['CHATBOT_CACHE_TTL'],
+            breaker_failures=config['CHATBOT_BREAKER_FAILURES'],
+            breaker_reset=config['CHATBOT_BREAKER_RESET'],
+        )
+
+    def complete(self, user_input, lang_code, lang_name):
+        """Return the assistant's reply text, raising GatewayError on failure."""
+        key = (lang_code, normalize_input(user_input))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self._check_configured()
+        if not self._slots.acquire(blocking=False):
+            raise GatewayBusy("chatbot upstream is at capacity")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise self._unavailable()
+        try:
+            future = self._pool.submit(self._post, build_messages(user_input, lang_name))
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the upstream call really finishes, even if
+        # this caller gives up at the deadline below.
+        future.add_done_callback(lambda _: self._slots.release())
+
+        started = time.perf_counter()
+        try:
+            content = future.result(timeout=self.deadline)
+        except FutureTimeout:
+            self.breaker.record_failure()
+            raise GatewayTimeout(f"no reply within {self.deadline:g}s")
+        except GatewayError:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._observe(started)
+
+        self.breaker.record_success()
+        self.cache.set(key, content)
+        return content
+
+    def stream(self, user_input, lang_code, lang_name):
+        """Yield the reply in text chunks as the upstream produces them.
+
+        Raises GatewayError before the first chunk or part-way through; a
+        reply is only cached once it has streamed to completion.
+        """
+        key = (lang_code, normalize_input(user_input))
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        self._check_configured()
+        if not self._slots.acquire(blocking=False):
+            raise GatewayBusy("chatbot upstream is at capacity")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise self._unavailable()
+        started = time.perf_counter()
+        try:
+            parts = []
+            for chunk in self._stream_post(build_messages(user_input, lang_name)):
+                parts.append(chunk)
+                yield chunk
+            self.breaker.record_success()
+            self.cache.set(key, ''.join(parts))
+        except GatewayError:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._slots.release()
+            self._observe(started)
+
+    def _check_configured(self):
+        if not self.configured:
+            raise GatewayNotConfigured("no chatbot API key configured (OPENROUTER_API_KEY)")
+
+    def _unavailable(self):
+        return GatewayUnavailable(f"chat service unavailable, retrying in {self.breaker.retry_in():.0f}s")
+
+    def _observe(self, started):
+        if self.on_upstream is not None:
+            self.on_upstream(time.perf_counter() - started)
+
+    def _stream_post(self, messages):
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True
+        }
+        started = time.monotonic()
+        try:
+            with self.session.post(self.url, json=data, stream=True,
+                                   timeout=(self.connect_timeout, self.deadline)) as response:
+                if response.status_code != 200:
+                    raise GatewayError(f"upstream returned HTTP {response.status_code}")
+                # chunk_size=None hands over data as it arrives instead of
+                # waiting to fill a read buffer
+                for raw in response.iter_lines(chunk_size=None):
+                    if time.monotonic() - started > self.deadline:
+                        raise GatewayTimeout(f"no complete reply within {self.deadline:g}s")
+                    line = raw.decode('utf-8')
+                    # SSE framing; ": ..." keep-alive comments are skipped
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        return
+                    content = (json.loads(payload)['choices'][0].get('delta') or {}).get('content')
+                    if content:
+                        if not isinstance(content, str):
+                            raise TypeError(f"content is {type(content).__name__}, not text")
+                        yield content
+        except requests.RequestException as e:
+            raise GatewayError(str(e)) from e
+        except MALFORMED as e:
+            raise GatewayError(f"bad upstream reply: {e!r}") from e
+
+    def _post(self, messages):
+        data = {
+            "model": self.model,
+            "messages": messages
+        }
+        try:
+            response = self.session.post(
+                self.url, json=data, timeout=(self.connect_timeout, self.deadline)
+            )
+            result = response.json()
+        except requests.RequestException as e:
+            raise GatewayError(str(e)) from e
+        except ValueError as e:
+            raise GatewayError(f"bad upstream reply: {e!r}") from e
+
+        if isinstance(result, dict) and 'choices' not in result:
+            error = result.get('error')
+            raise GatewayError((error.get('message') if isinstance(error, dict) else None)
+                               or 'no choices in response')
+        try:
+            content = result['choices'][0]['message']['content']
+        except MALFORMED as e:
+            raise GatewayError(f"bad upstream reply: {e!r}") from e
+        if not isinstance(content, str):
+            raise GatewayError("bad upstream reply: no text content")
+        return content
+
+    def stats(self):
+        return {'cache': self.cache.stats(), 'breaker': self.breaker.stats()}
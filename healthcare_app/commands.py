@@ -0,0 +1,154 @@
+"""``flask`` CLI commands: schema upgrades, data import/export, rebuilds, jobs, reports.
+
+The schema is only created or changed here. Run ``flask db-upgrade``
+once per deploy, before starting the workers; importing or creating the
+app never touches the schema.
+"""
+import json
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import analytics
+import bulk_io
+import migrations
+import price_snapshots
+import services
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Create missing tables and indexes on an existing database."""
+    ensured = migrations.upgrade()
+    print(f"Schema up to date; {len(ensured)} indexes ensured.")
+
+
+@click.command('refresh-price-snapshots')
+@with_appcontext
+def refresh_price_snapshots_command():
+    """Re-price every prescribed medicine into the snapshot table."""
+    print(f"Stored {price_snapshots.refresh(services.get().pricing)} price snapshots.")
+
+
+@click.command('db-check-plans')
+@with_appcontext
+def db_check_plans_command():
+    """EXPLAIN the hot-route queries and fail on any sequential scan."""
+    failed = False
+    for name, (plan, full_scan) in migrations.check_query_plans().items():
+        print(f"{'SEQ SCAN' if full_scan else 'ok':8} {name}")
+        for line in plan:
+            print(f"           {line}")
+        failed = failed or full_scan
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command('import-data')
+@click.argument('entity', type=click.Choice(list(bulk_io.ENTITIES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(bulk_io.FORMATS), default=None,
+              help="Default: from the file extension.")
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--workers', default=None, type=int, help="Password hashing processes (default: CPUs).")
+@click.option('--errors', 'errors_path', default=None, help="Write rejected rows here as JSONL.")
+@with_appcontext
+def import_data_command(entity, source, fmt, batch_size, workers, errors_path):
+    """Bulk-load users, prescriptions or orders from CSV / JSONL."""
+    errors_out = open(errors_path, 'w', encoding='utf-8') if errors_path else None
+
+    def on_error(error):
+        if errors_out:
+            errors_out.write(json.dumps(error._asdict()) + '\n')
+        else:
+            print(f"line {error.line}: {error.message}", file=sys.stderr)
+
+    try:
+        report = bulk_io.import_rows(entity, source, bulk_io.format_for(source.name, fmt),
+                                     batch_size=batch_size, workers=workers, on_error=on_error,
+                                     hash_method=current_app.config['PASSWORD_HASH_METHOD'])
+    finally:
+        if errors_out:
+            errors_out.close()
+    if entity == 'users':
+        services.get().specialists.reload()
+    print(json.dumps(report.as_dict()))
+
+
+@click.command('export-data')
+@click.argument('entity', type=click.Choice(list(bulk_io.ENTITIES)))
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(bulk_io.FORMATS), default=None,
+              help="Default: from the file extension (CSV for stdout).")
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def export_data_command(entity, target, fmt, batch_size):
+    """Stream a table out as CSV / JSONL for backups."""
+    count = bulk_io.export_rows(entity, target, bulk_io.format_for(target.name, fmt), batch_size)
+    print(f"Exported {count} {entity}.", file=sys.stderr)
+
+
+@click.command('analytics-rebuild')
+@with_appcontext
+def analytics_rebuild_command():
+    """Recompute the admin analytics rollups from the base tables."""
+    print(f"Rebuilt {analytics.rebuild()} analytics rollups.")
+
+
+@click.command('run-jobs')
+@click.option('--once', is_flag=True, help="Run the jobs due now, then exit (for cron).")
+@with_appcontext
+def run_jobs_command(once):
+    """Work the background job queue in this process until interrupted."""
+    queue = services.get().jobs
+    queue.schedule_periodic()
+    if once:
+        print(f"Ran {queue.run_pending()} jobs.")
+        return
+    queue.workers = queue.workers or 1
+    queue.ensure_started()
+    print(f"Working jobs with {queue.workers} threads; Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        queue.stop()
+
+
+@click.command('report')
+@click.option('--parquet', is_flag=True, help="Also write Parquet files (needs pyarrow).")
+@click.option('--top', default=None, type=int, help="Rows in the top-N lists (default: REPORT_TOP_N).")
+@click.option('--batch-size', default=None, type=int, help="Rows per cursor fetch (default: REPORT_BATCH_SIZE).")
+@with_appcontext
+def report_command(parquet, top, batch_size):
+    """Snapshot prescriptions and orders into columns and print the report."""
+    store = services.get().reports
+    if batch_size:
+        store.batch_size = batch_size
+    try:
+        result = store.rebuild(parquet=parquet, top=top)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Built in {store.last_build_seconds:.2f}s.", file=sys.stderr)
+
+
+COMMANDS = (
+    db_upgrade_command,
+    refresh_price_snapshots_command,
+    db_check_plans_command,
+    import_data_command,
+    export_data_command,
+    analytics_rebuild_command,
+    run_jobs_command,
+    report_command,
+)
+
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -0,0 +1,131 @@
+"""Engine configuration for Postgres (production) and SQLite (dev/bench).
+
+``DATABASE_URL`` picks the backend. For Postgres the pool is sized from
+config: each gunicorn worker process gets its own pool, so plan for
+``workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)`` server connections.
+Connections are pre-pinged and recycled so a database restart or an
+idle-timeout proxy does not surface as errors.
+
+Statement timeouts apply to web requests only (CLI jobs such as exports
+may legitimately run long). Each transaction a request opens starts with
+``SET LOCAL statement_timeout``: ``DB_STATEMENT_TIMEOUT_MS``, or the
+endpoint's entry in ``DB_STATEMENT_TIMEOUTS``.
+
+SQLite needs no service: ``DATABASE_URL=sqlite:///aegiscare.db`` (relative
+paths land in the instance folder). WAL mode lets readers proceed while
+one writer commits, and a busy timeout makes writers queue instead of
+failing with "database is locked".
+"""
+import os
+import weakref
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+# Per-engine settings for the process-wide hooks below; an app's entries
+# go away with its engine, so tests and CLI runs creating many apps add
+# no listeners.
+_statement_timeouts = weakref.WeakKeyDictionary()  # engine -> (default ms, {endpoint: ms})
+_engines = weakref.WeakSet()  # disposed in forked children
+_installed = False
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured backend."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if url.get_backend_name() == 'sqlite':
+        return options
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+    )
+    return options
+
+
+def init_app(app, db):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == 'sqlite':
+        _install_sqlite_pragmas(engine, app.config)
+    elif engine.dialect.name == 'postgresql':
+        _statement_timeouts[engine] = (app.config['DB_STATEMENT_TIMEOUT_MS'], app.config['DB_STATEMENT_TIMEOUTS'])
+    _engines.add(engine)
+    _install()
+    return engine
+
+
+def _install():
+    """Register the process-wide hooks; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, 'after_begin', _set_timeout)
+    # Forked children (gunicorn --preload) must not reuse the parent's
+    # sockets; dispose(close=False) leaves them to the parent.
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_dispose_in_child)
+    _installed = True
+
+
+def _dispose_in_child():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+def _install_sqlite_pragmas(engine, config):
+    wal = config['SQLITE_WAL']
+    busy_ms = int(config['SQLITE_BUSY_TIMEOUT_MS'])
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {busy_ms}")
+        if wal:
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("PRAGMA synchronous = NORMAL")  # durable enough with WAL
+        cursor.execute("PRAGMA foreign_keys = ON")  # as Postgres enforces them
+        cursor.close()
+
+
+def _set_timeout(session, transaction, connection):
+    settings = _statement_timeouts.get(connection.engine)
+    if settings is None or not has_request_context():
+        return
+    default_ms, per_route = settings
+    timeout = g.get('statement_timeout_ms')
+    if timeout is None:
+        timeout = g.statement_timeout_ms = per_route.get(request.endpoint, default_ms)
+    if timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def insert_for(connection, table):
+    """``insert(table)`` with ``on_conflict_do_update``, or None if the dialect has no upsert."""
+    name = connection.dialect.name
+    if name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+
+def statement_timeout(ms):
+    """Override the statement timeout for the rest of this request.
+
+    Takes effect from the next transaction the request begins.
+    """
+    g.statement_timeout_ms = ms
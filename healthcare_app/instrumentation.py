@@ -0,0 +1,299 @@
+"""Opt-in per-request instrumentation.
+
+When ``INSTRUMENTATION_ENABLED`` is off, ``init_app`` registers nothing,
+so requests pay no cost at all. When it is on, each request records:
+
+* wall time, SQL statement count and time (SQLAlchemy cursor events),
+  template render time and outbound chatbot HTTP time
+* one structured JSON log line on the ``aegiscare.requests`` logger
+* a cProfile dump (or pyinstrument, if installed and selected) for a
+  sampled fraction of requests that turn out slower than the threshold
+
+Aggregates are served in Prometheus text format at ``/metrics``, to
+addresses in ``METRICS_ALLOWED_IPS`` or with ``METRICS_TOKEN`` as a bearer
+token; anyone else gets a 404. Requests that end in an unhandled error
+are recorded too, as 500s.
+"""
+import cProfile
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+try:
+    import pyinstrument
+except ImportError:  # optional
+    pyinstrument = None
+
+log = logging.getLogger('aegiscare.requests')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Process-wide aggregates, rendered as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> n
+        self.durations = defaultdict(_Histogram)  # endpoint -> seconds
+        self.sql = defaultdict(lambda: [0, 0.0])  # endpoint -> [statements, seconds]
+        self.templates = defaultdict(lambda: [0, 0.0])  # template -> [renders, seconds]
+        self.outbound = defaultdict(lambda: [0, 0.0])  # target -> [calls, seconds]
+        self.collectors = {}  # prefix -> callable returning {name: number}
+
+    def record_request(self, endpoint, method, status, seconds, sql_count, sql_seconds):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.durations[endpoint].observe(seconds)
+            totals = self.sql[endpoint]
+            totals[0] += sql_count
+            totals[1] += sql_seconds
+
+    def record(self, table, key, seconds):
+        with self._lock:
+            totals = table[key]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ['# TYPE aegiscare_requests_total counter']
+            for (endpoint, method, status), n in sorted(self.requests.items()):
+                lines.append(f'aegiscare_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {n}')
+
+            lines += ['# TYPE aegiscare_request_duration_seconds histogram']
+            for endpoint, hist in sorted(self.durations.items()):
+                for bound, n in zip(BUCKETS, hist.counts):
+                    lines.append(f'aegiscare_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {n}')
+                lines.append(f'aegiscare_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {hist.count}')
+                lines.append(f'aegiscare_request_duration_seconds_sum{{endpoint="{endpoint}"}} {hist.total:.6f}')
+                lines.append(f'aegiscare_request_duration_seconds_count{{endpoint="{endpoint}"}} {hist.count}')
+
+            for name, label, table in (('sql_statements', 'endpoint', self.sql),
+                                       ('template_renders', 'template', self.templates),
+                                       ('outbound_requests', 'target', self.outbound)):
+                lines += [f'# TYPE aegiscare_{name}_total counter']
+                for key, (n, _) in sorted(table.items()):
+                    lines.append(f'aegiscare_{name}_total{{{label}="{key}"}} {n}')
+                lines += [f'# TYPE aegiscare_{name}_seconds_total counter']
+                for key, (_, seconds) in sorted(table.items()):
+                    lines.append(f'aegiscare_{name}_seconds_total{{{label}="{key}"}} {seconds:.6f}')
+
+            collectors = list(self.collectors.items())
+
+        for prefix, collect in collectors:
+            for name, value in sorted(collect().items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'aegiscare_{prefix}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+_enabled = False
+_profile_seq = itertools.count(1)
+
+
+def enabled():
+    return _enabled
+
+
+def add_collector(prefix, collect):
+    """Export the numeric values of ``collect()`` as gauges on /metrics."""
+    metrics.collectors[prefix] = collect
+
+
+def record_outbound(target, seconds):
+    """Called by outbound clients (chatbot gateway) after each upstream call."""
+    if not _enabled:
+        return
+    metrics.record(metrics.outbound, target, seconds)
+    if has_request_context() and hasattr(g, '_instr'):
+        g._instr['outbound'] += seconds
+
+
+def init_app(app, db):
+    global _enabled
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+    _enabled = True
+
+    slow_threshold = app.config['SLOW_REQUEST_THRESHOLD']
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    profile_dir = app.config['PROFILE_DIR']
+    use_pyinstrument = app.config['PROFILER'] == 'pyinstrument' and pyinstrument is not None
+
+    @app.before_request
+    def _start_timer():
+        g._instr = {'started': time.perf_counter(), 'sql_count': 0, 'sql': 0.0,
+                    'templates': 0.0, 'outbound': 0.0, 'profiler': None}
+        if sample_rate and random.random() < sample_rate:
+            g._instr['profiler'] = _start_profiler(use_pyinstrument)
+
+    @app.after_request
+    def _note_status(response):
+        if hasattr(g, '_instr'):
+            g._instr['status'] = response.status_code
+        return response
+
+    # Teardown also runs when a view (or an after_request hook) raised and
+    # no response went through after_request
+    @app.teardown_request
+    def _finish(exc):
+        state = g.pop('_instr', None)
+        if state is None:
+            return
+        elapsed = time.perf_counter() - state['started']
+        endpoint = request.endpoint or 'unknown'
+        status = 500 if exc is not None else state.get('status', 500)
+
+        profile_path = None
+        if state['profiler'] is not None:
+            profile_path = _stop_profiler(state['profiler'], elapsed > slow_threshold,
+                                          profile_dir, endpoint)
+
+        metrics.record_request(endpoint, request.method, status,
+                               elapsed, state['sql_count'], state['sql'])
+        log.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 3),
+            'sql_count': state['sql_count'],
+            'sql_ms': round(state['sql'] * 1000, 3),
+            'template_ms': round(state['templates'] * 1000, 3),
+            'outbound_ms': round(state['outbound'] * 1000, 3),
+            'profile': profile_path,
+        }))
+
+    allowed = _networks(app.config['METRICS_ALLOWED_IPS'])
+    token = app.config['METRICS_TOKEN']
+
+    @app.route(app.config['METRICS_PATH'])
+    def metrics_endpoint():
+        if not _may_scrape(allowed, token):
+            abort(404)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    def _before_render(sender, template, context, **extra):
+        if has_request_context() and hasattr(g, '_instr'):
+            g._instr.setdefault('render_started', []).append(time.perf_counter())
+
+    def _rendered(sender, template, context, **extra):
+        if has_request_context() and g.get('_instr', {}).get('render_started'):
+            seconds = time.perf_counter() - g._instr['render_started'].pop()
+            g._instr['templates'] += seconds
+            metrics.record(metrics.templates, template.name or 'string', seconds)
+
+    before_render_template.connect(_before_render, app, weak=False)
+    template_rendered.connect(_rendered, app, weak=False)
+
+    with app.app_context():
+        engine = db.engine
+
+    # The start time is pushed per statement and popped when it finishes,
+    # successfully or not, so a failing statement leaves nothing behind
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_instr_started', []).append(time.perf_counter())
+        if context is not None:
+            context._instr_pushed = True
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        _statement_done(conn)
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed_cursor(exception_context):
+        # Errors raised before the cursor ran (connect, compile) pushed nothing
+        if getattr(exception_context.execution_context, '_instr_pushed', False):
+            _statement_done(exception_context.connection)
+
+
+def _statement_done(conn):
+    started = conn.info.get('_instr_started')
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    if has_request_context() and hasattr(g, '_instr'):
+        g._instr['sql_count'] += 1
+        g._instr['sql'] += seconds
+
+
+def _networks(entries):
+    return [ipaddress.ip_network(entry.strip(), strict=False) for entry in entries if entry.strip()]
+
+
+def _may_scrape(allowed, token):
+    if token:
+        sent = request.headers.get('Authorization', '')
+        if hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in allowed)
+
+
+def _start_profiler(use_pyinstrument):
+    try:
+        if use_pyinstrument:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+    except ValueError:
+        return None  # another profiler is already active on this thread
+    return profiler
+
+
+def _stop_profiler(profiler, keep, profile_dir, endpoint):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+    if not keep:
+        return None
+
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    # Requests finishing in the same second, in any thread, each get their own file
+    base = os.path.join(profile_dir, f"{stamp}-{endpoint.replace('.', '_')}-{os.getpid()}-{next(_profile_seq)}")
+    if isinstance(profiler, cProfile.Profile):
+        path = base + '.prof'
+        profiler.dump_stats(path)
+    else:
+        path = base + '.html'
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+    return path
@@ -0,0 +1,337 @@
+"""Background jobs, persisted in the ``job`` table.
+
+Work that need not finish inside the request (LLM replies, re-pricing,
+order status changes, feedback writes) is stored as a ``Job`` row and
+the request returns its id at once; clients poll ``/jobs/<id>``.
+
+* Handlers are registered per kind with ``@task('kind', ...)`` and called
+  as ``handler(job, **payload)`` inside an app context. The return value
+  (JSON-serialisable) becomes the job's result. A job may run more than
+  once (a retry, or a worker dying after the handler committed), so
+  handlers must be safe to repeat: key what they write on ``job.id``.
+* ``enqueue(..., dedupe_key=...)`` keeps at most one queued or running
+  job per key (a unique index on ``job.dedupe_key``, released when the
+  job finishes); a second enqueue returns the live job instead.
+* ``@task(..., every='SETTING')`` makes a periodic task: one job is kept
+  queued across all processes (its kind is its dedupe key), and each run
+  queues the next ``app.config[SETTING]`` seconds later before it starts,
+  so a failed run does not end the cycle.
+* Each web process runs ``JOBS_WORKERS`` threads; the handlers wait on
+  the network or the database, so threads are enough. ``flask run-jobs``
+  runs a dedicated worker process instead (set ``JOBS_WORKERS=0``) or
+  as well.
+* Workers claim a job with a compare-and-set UPDATE (queued -> running;
+  on Postgres the candidate row is also locked SKIP LOCKED), so any
+  number of processes can share the table and each claim wins once.
+* A failing job is retried with exponential backoff and jitter up to
+  ``max_attempts``; raising ``Permanent`` fails it at once. Jobs left
+  running by a dead worker are requeued after ``JOBS_LEASE_SECONDS``.
+* Lower ``priority`` runs first; ties run oldest first.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Job
+
+log = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = 0, 5, 9
+FINISHED = ('succeeded', 'failed')
+
+Task = namedtuple('Task', ['handler', 'priority', 'max_attempts', 'every'])
+TASKS = {}  # kind -> Task
+
+
+class Permanent(Exception):
+    """Raised by a handler: fail the job now, retrying cannot help."""
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(kind, priority=NORMAL, max_attempts=None, every=None):
+    """Register the decorated function as the handler for ``kind``.
+
+    ``every`` names the config setting holding the seconds between runs of
+    a periodic task (0 = not scheduled).
+    """
+    def register(handler):
+        TASKS[kind] = Task(handler, priority, max_attempts, every)
+        return handler
+    return register
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:64]
+
+
+def is_last_attempt(job):
+    return job.attempts >= job.max_attempts
+
+
+def _stamp(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def describe(job):
+    """The job as the status endpoint reports it."""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'priority': job.priority,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created_at': _stamp(job.created_at),
+        'run_at': _stamp(job.run_at),
+        'finished_at': _stamp(job.finished_at),
+    }
+
+
+class JobQueue:
+    def __init__(self, app, workers=2, poll_interval=1.0, max_attempts=3,
+                 backoff_base=2.0, backoff_max=300.0, lease=300.0, clock=datetime.utcnow):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.clock = clock
+
+        self._started = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_sweep = None
+
+        self.enqueued = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.requeued = 0
+
+    @classmethod
+    def from_config(cls, app):
+        config = app.config
+        return cls(
+            app,
+            workers=config['JOBS_WORKERS'],
+            poll_interval=config['JOBS_POLL_INTERVAL'],
+            max_attempts=config['JOBS_MAX_ATTEMPTS'],
+            backoff_base=config['JOBS_BACKOFF_BASE'],
+            backoff_max=config['JOBS_BACKOFF_MAX'],
+            lease=config['JOBS_LEASE_SECONDS'],
+        )
+
+    def enqueue(self, kind, payload=None, priority=None, owner_id=None, delay=0, dedupe_key=None):
+        """Store a job (committing the session) and wake a worker; returns the Job.
+
+        With ``dedupe_key``, if a job with that key is already queued or
+        running, nothing is stored and that job is returned.
+        """
+        registered = TASKS.get(kind)
+        if registered is None:
+            raise UnknownTask(kind)
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            priority=registered.priority if priority is None else priority,
+            max_attempts=registered.max_attempts or self.max_attempts,
+            run_at=self.clock() + timedelta(seconds=delay),
+            owner_id=owner_id,
+            dedupe_key=dedupe_key,
+        )
+        if dedupe_key is None:
+            db.session.add(job)
+        else:
+            live = self._add_deduped(job)
+            if live is not None:
+                db.session.commit()
+                return live
+        db.session.commit()
+        self.enqueued += 1
+        self.ensure_started()
+        self._wake.set()
+        return job
+
+    def schedule_periodic(self):
+        """Queue every periodic task that is not queued already; once per process."""
+        if self._scheduled:
+            return
+        self._scheduled = True
+        for kind, registered in TASKS.items():
+            if registered.every and self.app.config[registered.every] > 0:
+                self.enqueue(kind, dedupe_key=kind)
+
+    def _add_deduped(self, job):
+        # The unique index decides between concurrent enqueuers; the
+        # savepoint keeps the rest of the caller's session intact.
+        for _ in range(3):
+            try:
+                with db.session.begin_nested():
+                    db.session.add(job)
+                return None
+            except IntegrityError:
+                live = db.session.scalar(select(Job).where(Job.dedupe_key == job.dedupe_key))
+                if live is not None:
+                    return live
+                # It finished in between and released the key: try again
+        raise RuntimeError(f"could not enqueue {job.kind!r} with dedupe key {job.dedupe_key!r}")
+
+    # --- Workers ---
+    def ensure_started(self):
+        if self._started or self.workers <= 0:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for n in range(self.workers):
+            threading.Thread(target=self._loop, name=f'jobs_{n}', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_pending(self, limit=None):
+        """Run due jobs in the calling thread until none is due; returns the count."""
+        ran = 0
+        while (limit is None or ran < limit) and self.run_one():
+            ran += 1
+        return ran
+
+    def run_one(self):
+        """Claim and run the next due job; False if none is due."""
+        job = self._claim()
+        if job is None:
+            return False
+        self._execute(job)
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    ran = self.run_one()
+            except Exception:
+                log.exception("Job worker error")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    # --- internals ---
+    def _claim(self):
+        now = self.clock()
+        self._sweep(now)
+        for _ in range(5):  # lost the race for a candidate: try the next one
+            candidate = db.session.scalar(
+                select(Job.id)
+                .where(Job.status == 'queued', Job.run_at <= now)
+                .order_by(Job.priority, Job.run_at, Job.id)
+                .limit(1)
+                .with_for_update(skip_locked=True))
+            if candidate is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == candidate, Job.status == 'queued')
+                .values(status='running', attempts=Job.attempts + 1, started_at=now, worker=_worker_name())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, candidate)
+        return None
+
+    def _execute(self, job):
+        registered = TASKS.get(job.kind)
+        try:
+            if registered is None:
+                raise Permanent(f"no handler registered for {job.kind!r}")
+            if registered.every:
+                self._schedule_next(job, registered.every)
+            result = registered.handler(job, **json.loads(job.payload))
+        except Exception as error:
+            db.session.rollback()
+            self._record_failure(job, error)
+            return
+        job.status = 'succeeded'
+        job.dedupe_key = None
+        job.result = json.dumps(result) if result is not None else None
+        job.error = None
+        job.finished_at = self.clock()
+        db.session.commit()
+        self.succeeded += 1
+
+    def _schedule_next(self, job, setting):
+        # Hand the key to the next run before this one starts
+        job.dedupe_key = None
+        db.session.commit()
+        interval = self.app.config[setting]
+        if interval > 0:
+            self.enqueue(job.kind, delay=interval, dedupe_key=job.kind)
+
+    def _record_failure(self, job, error):
+        job.error = f"{type(error).__name__}: {error}"
+        if isinstance(error, Permanent) or is_last_attempt(job):
+            log.warning("Job %s (%s) failed after %d attempts: %s", job.id, job.kind, job.attempts, job.error)
+            job.status = 'failed'
+            job.dedupe_key = None
+            job.finished_at = self.clock()
+            self.failed += 1
+        else:
+            job.status = 'queued'
+            job.run_at = self.clock() + timedelta(seconds=self.backoff(job.attempts))
+            self.retried += 1
+        db.session.commit()
+
+    def backoff(self, attempts):
+        """Seconds before retry number ``attempts``: exponential, half jittered."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _sweep(self, now):
+        # Jobs whose worker died mid-run; checked a few times per lease
+        if self._last_sweep and now - self._last_sweep < timedelta(seconds=self.lease / 4):
+            return
+        self._last_sweep = now
+        requeued = db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.started_at < now - timedelta(seconds=self.lease))
+            .values(status=case((Job.attempts >= Job.max_attempts, 'failed'), else_='queued'),
+                    finished_at=case((Job.attempts >= Job.max_attempts, now), else_=None),
+                    dedupe_key=case((Job.attempts >= Job.max_attempts, None), else_=Job.dedupe_key),
+                    run_at=now, error='worker lost (lease expired)')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if requeued:
+            log.warning("Requeued %d jobs from lost workers", requeued)
+            self.requeued += requeued
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'enqueued': self.enqueued,
+            'succeeded': self.succeeded,
+            'retried': self.retried,
+            'failed': self.failed,
+            'requeued_lost': self.requeued,
+        }
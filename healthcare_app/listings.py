@@ -0,0 +1,153 @@
+"""Paginated listings for the order, appointment and patient views.
+
+Pages are cut with keyset pagination on ``id`` (``WHERE id < :after``)
+so page N costs the same as page 1, and the related Prescription / User
+rows the templates read are joined in the same SELECT instead of being
+lazy-loaded once per row. The patient directory is ordered by name, so
+its cursor is the (lowercased name, id) of the last row shown.
+"""
+import base64
+import json
+from collections import namedtuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload, load_only
+
+from models import Appointment, Feedback, Order, Prescription, User
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+def parse_cursor(value):
+    """Turn the ``?after=`` query arg into an id, ignoring junk."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, key_column, after=None, limit=PAGE_SIZE, descending=True):
+    """Return one page of ``query`` ordered by ``key_column``.
+
+    One extra row is fetched to know whether another page exists; its
+    key is never exposed, the cursor is the key of the last row shown.
+    """
+    if after is not None:
+        query = query.filter(key_column < after if descending else key_column > after)
+    query = query.order_by(key_column.desc() if descending else key_column.asc())
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = getattr(rows[-1], key_column.key)
+    return Page(rows, next_cursor)
+
+
+def patient_orders(patient_id, after=None, limit=PAGE_SIZE):
+    """Newest-first orders of one patient with their prescription joined."""
+    query = Order.query.options(joinedload(Order.prescription)).filter(
+        Order.patient_id == patient_id
+    )
+    return keyset_page(query, Order.id, after, limit)
+
+
+def all_orders(after=None, limit=PAGE_SIZE):
+    """Newest-first orders across all patients for the doctor console."""
+    query = Order.query.options(
+        joinedload(Order.prescription),
+        joinedload(Order.patient),
+    )
+    return keyset_page(query, Order.id, after, limit)
+
+
+def doctor_appointments(doctor_id, after=None, limit=PAGE_SIZE):
+    """A doctor's appointments in booking order with the patient joined."""
+    query = Appointment.query.options(joinedload(Appointment.patient)).filter(
+        Appointment.doctor_id == doctor_id
+    )
+    return keyset_page(query, Appointment.id, after, limit, descending=False)
+
+
+def feedback_page(after=None, limit=PAGE_SIZE):
+    """Newest-first feedback with the patient joined."""
+    query = Feedback.query.options(joinedload(Feedback.patient))
+    return keyset_page(query, Feedback.id, after, limit)
+
+
+def patient_prescriptions(patient_id, after=None, limit=PAGE_SIZE):
+    """Newest-first prescriptions of one patient."""
+    query = Prescription.query.filter(Prescription.patient_id == patient_id)
+    return keyset_page(query, Prescription.id, after, limit)
+
+
+# --- Patient directory ---
+def encode_name_cursor(name, patient_id):
+    raw = json.dumps([name, patient_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def parse_name_cursor(value):
+    """Turn a directory ``?after=`` token into (lowered name, id), or None."""
+    try:
+        name, patient_id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not isinstance(name, str) or not isinstance(patient_id, int):
+        return None
+    return name, patient_id
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def patient_directory(prefix=None, after=None, limit=PAGE_SIZE):
+    """Patients whose name starts with ``prefix`` (any case), by name then id.
+
+    The prefix becomes a range on lower(name) so the planner can walk
+    ix_user_role_name_lower; the LIKE only re-checks rows in that range.
+    """
+    lowered = func.lower(User.name)
+    query = User.query.options(load_only(User.id, User.name, User.contact)).filter(
+        User.role == 'patient'
+    )
+    prefix = (prefix or '').strip().lower()
+    if prefix:
+        query = query.filter(
+            lowered >= prefix,
+            lowered < _prefix_upper_bound(prefix),
+            lowered.like(_like_escape(prefix) + '%', escape='\\'),
+        )
+    if after is not None:
+        name, patient_id = after
+        query = query.filter(
+            lowered >= name,
+            or_(lowered > name, and_(lowered == name, User.id > patient_id)),
+        )
+    # The sort key comes back with each row so the cursor uses the
+    # database's lower(), not Python's
+    rows = query.add_columns(lowered).order_by(lowered, User.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_name_cursor(rows[-1][1] or '', rows[-1][0].id)
+    return Page([patient for patient, _ in rows], next_cursor)
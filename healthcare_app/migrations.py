@@ -0,0 +1,159 @@
+"""Schema upgrades for databases created before a model change.
+
+``db.create_all()`` only creates missing tables; it never touches a
+table that already exists, so columns and indexes added to the models
+later would silently be missing on older databases. ``upgrade()`` fills
+that gap.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, func, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from models import db, User, Appointment, Prescription, Order, Job
+import scheduling
+import analytics
+
+# Indexes an earlier upgrade created that a model change has since replaced
+RETIRED_INDEXES = [
+    'ix_appointment_doctor_slot',  # (doctor_id, date, time); now uq_appointment_doctor_slot
+]
+
+
+def upgrade():
+    """Create missing tables, columns and any model index the database lacks.
+
+    Indexes are issued as CREATE INDEX IF NOT EXISTS (Postgres and SQLite
+    both support it) because reflection skips expression indexes such as
+    lower(specialization), so they cannot be diffed by name. Indexes in
+    RETIRED_INDEXES are dropped the same way, with DROP INDEX IF EXISTS.
+    """
+    had_rollups = inspect(db.engine).has_table('analytics_rollup')
+    db.create_all()
+    if 'appointment.slot_start' in _add_missing_columns():
+        _backfill_appointment_slots()
+
+    ensured = []
+    with db.engine.begin() as conn:
+        preparer = conn.dialect.identifier_preparer
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {preparer.quote(name)}"))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+                ensured.append(index.name)
+
+    if not had_rollups:
+        analytics.rebuild()  # seed the new rollup table from existing rows
+    return ensured
+
+
+def _add_missing_columns():
+    """ALTER TABLE ... ADD COLUMN for model columns an old table lacks.
+
+    New columns are added nullable; returns the "table.column" names added.
+    """
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=db.engine.dialect)}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_appointment_slots(batch_size=1000):
+    """Fill Appointment.slot_start from the legacy date/time strings.
+
+    Runs before the unique (doctor_id, slot_start) index is created. Rows
+    that do not parse, or that double-book a slot someone already holds,
+    keep slot_start NULL: they still list, but do not block the slot twice.
+    """
+    taken = set()
+    last_id = 0
+    while True:
+        rows = (Appointment.query
+                .filter(Appointment.id > last_id, Appointment.slot_start.is_(None))
+                .order_by(Appointment.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        for appt in rows:
+            slot = scheduling.parse_slot(appt.date, appt.time)
+            if slot is not None and (appt.doctor_id, slot) not in taken:
+                taken.add((appt.doctor_id, slot))
+                appt.slot_start = slot
+        last_id = rows[-1].id
+        db.session.commit()
+
+
+# --- QUERY PLAN CHECKS ---
+# The filters the hot routes run; each one must be answered by an index.
+def hot_queries():
+    return {
+        'login_contact': select(User).where(User.contact == 'x'),
+        'login_name': select(User).where(User.name == 'x'),
+        'doctors': select(User).where(User.role == 'doctor'),
+        'chatbot_specialist': select(User).where(
+            User.role == 'doctor',
+            func.lower(User.specialization) == 'cardiologist',
+        ),
+        'epharmacy': select(Prescription).where(
+            Prescription.patient_id == 1,
+            Prescription.status == 'Available',
+        ),
+        'patient_directory': select(User).where(
+            User.role == 'patient',
+            func.lower(User.name) >= 'ra',
+            func.lower(User.name) < 'rb',
+        ).order_by(func.lower(User.name), User.id).limit(25),
+        'my_orders': select(Order).where(Order.patient_id == 1),
+        'doctor_appointments': select(Appointment).where(Appointment.doctor_id == 1),
+        'doctor_slots': select(Appointment.doctor_id, Appointment.slot_start).where(
+            Appointment.doctor_id.in_([1, 2]),
+            Appointment.slot_start >= datetime(2025, 1, 1),
+            Appointment.slot_start < datetime(2025, 1, 8),
+        ),
+        'job_claim': select(Job.id).where(
+            Job.status == 'queued',
+            Job.run_at <= datetime(2025, 1, 1),
+        ).order_by(Job.priority, Job.run_at, Job.id).limit(1),
+    }
+
+
+def _explain(stmt):
+    dialect = db.engine.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.execute(text(prefix + sql)).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def _is_full_scan(plan_line):
+    line = plan_line.strip()
+    # Postgres: "Seq Scan on user"; SQLite: "SCAN user" (vs "SEARCH ... USING INDEX")
+    return line.startswith('Seq Scan') or '-> Seq Scan' in line or (
+        line.startswith('SCAN') and 'USING' not in line
+    )
+
+
+def check_query_plans():
+    """EXPLAIN every hot query; return {name: (plan_lines, full_scan)}.
+
+    Planners happily seq-scan tiny tables, so run this against a seeded
+    database sized like production, not an empty dev one.
+    """
+    report = {}
+    for name, stmt in hot_queries().items():
+        plan = _explain(stmt)
+        report[name] = (plan, any(_is_full_scan(line) for line in plan))
+    return report
@@ -0,0 +1,162 @@
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import UserMixin
+from sqlalchemy import func
+from datetime import datetime
+
+db = SQLAlchemy()
+
+
+# User model
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    role = db.Column(db.String(10))  # patient or doctor
+    name = db.Column(db.String(100), index=True)
+    dob = db.Column(db.String(20))
+    height = db.Column(db.Float)
+    weight = db.Column(db.Float)
+    bmi = db.Column(db.Float)
+    address = db.Column(db.String(200))
+    contact = db.Column(db.String(20), unique=True)
+    password = db.Column(db.String(200))
+    specialization = db.Column(db.String(100))
+    hospital = db.Column(db.String(200))
+    experience = db.Column(db.Integer)
+    location = db.Column(db.String(100))
+    adminID = db.Column(db.Integer)
+
+    # Chatbot lookups filter on role + lower(specialization); role-only
+    # filters use the leading column. The patient directory searches and
+    # pages by role + lower(name), id.
+    __table_args__ = (
+        db.Index('ix_user_role_specialization_lower', 'role', func.lower(specialization)),
+        db.Index('ix_user_role_name_lower', 'role', func.lower(name), 'id'),
+    )
+
+
+
+class Feedback(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    job_id = db.Column(db.Integer)  # the feedback.submit job that wrote it; a re-run finds it here
+    patient = db.relationship('User', backref='feedbacks')
+
+    __table_args__ = (
+        db.Index('uq_feedback_job', 'job_id', unique=True),
+    )
+
+
+class Appointment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    date = db.Column(db.String(20))
+    time = db.Column(db.String(10))
+    slot_start = db.Column(db.DateTime)  # typed copy of date + time
+    reason = db.Column(db.String(200))
+
+    patient = db.relationship('User', foreign_keys=[patient_id], backref='patient_appointments')
+    doctor = db.relationship('User', foreign_keys=[doctor_id], backref='doctor_appointments')
+
+    # One booking per doctor per slot; also serves doctor_id lookups.
+    # A unique index (not a constraint) so migrations.upgrade can add it.
+    __table_args__ = (
+        db.Index('uq_appointment_doctor_slot', 'doctor_id', 'slot_start', unique=True),
+    )
+    
+class Prescription(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    date = db.Column(db.String(20))
+    medicine = db.Column(db.String(200))
+    dosage = db.Column(db.String(200))
+    instructions = db.Column(db.String(500))
+    price = db.Column(db.Float)
+    status = db.Column(db.String(20), default='Available')
+
+    # E-pharmacy lists a patient's prescriptions by status
+    __table_args__ = (
+        db.Index('ix_prescription_patient_status', 'patient_id', 'status'),
+    )
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'))
+    status = db.Column(db.String(50), default="Pending")
+    final_price=db.Column(db.Float)
+    final_vendor=db.Column(db.String(50))
+    checkout_key = db.Column(db.String(64))  # idempotency key of the checkout that placed it
+    patient = db.relationship('User', backref='orders')
+    prescription = db.relationship('Prescription', backref='orders')
+
+    # Replayed checkouts are found by (patient, key)
+    __table_args__ = (
+        db.Index('ix_order_patient_checkout', 'patient_id', 'checkout_key'),
+    )
+
+
+class PriceSnapshot(db.Model):
+    """Precomputed vendor quotes for one medicine name."""
+    id = db.Column(db.Integer, primary_key=True)
+    medicine_key = db.Column(db.String(200), unique=True, nullable=False)  # lowercased name
+    medicine = db.Column(db.String(200))
+    quotes = db.Column(db.Text, nullable=False)  # JSON: [[vendor, price, link], ...]
+    cheapest_vendor = db.Column(db.String(50))
+    cheapest_price = db.Column(db.Float)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AnalyticsDelta(db.Model):
+    """A change to one rollup, appended by the write that caused it; folded in by a job."""
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(40), nullable=False)
+    key = db.Column(db.String(200), nullable=False)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class AnalyticsRollup(db.Model):
+    """One running aggregate, e.g. ('vendor_revenue', 'NetMeds').
+
+    Folded from AnalyticsDelta by analytics.py; rebuilt by `flask analytics-rebuild`.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(40), nullable=False)
+    key = db.Column(db.String(200), nullable=False)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('uq_analytics_rollup_metric_key', 'metric', 'key', unique=True),
+        db.Index('ix_analytics_rollup_metric_events', 'metric', 'events'),
+    )
+
+
+class Job(db.Model):
+    """One unit of deferred work, run by jobs.JobQueue."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON keyword arguments for the handler
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued/running/succeeded/failed
+    priority = db.Column(db.Integer, nullable=False, default=5)  # lower runs first
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # who may poll it
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Set while queued or running, cleared once finished: one live job per key
+    dedupe_key = db.Column(db.String(128))
+
+    # Workers claim the next due job in (priority, run_at) order
+    __table_args__ = (
+        db.Index('ix_job_claim', 'status', 'priority', 'run_at', 'id'),
+        db.Index('uq_job_dedupe_key', 'dedupe_key', unique=True),
+    )
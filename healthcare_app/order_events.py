@@ -0,0 +1,52 @@
+"""Order status changes, published to the patient's live pages.
+
+A session hook notes every ``Order.status`` change made through the ORM
+and, once the transaction commits, publishes ``{'order_id', 'status'}``
+on the patient's channel (see pubsub.py). Nothing is published for a
+rolled-back change. ``/patient/my_orders/stream`` relays the channel to
+the patient's open pages as Server-Sent Events.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import services
+from models import Order
+
+PENDING = 'order_events'
+
+
+def channel(patient_id):
+    return f'orders:patient:{patient_id}'
+
+
+def _before_flush(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, Order) and inspect(obj).attrs.status.history.has_changes():
+            session.info.setdefault(PENDING, {})[obj.id] = (obj.patient_id, obj.status)
+
+
+def _after_commit(session):
+    pending = session.info.pop(PENDING, None)
+    if not pending:
+        return
+    broker = services.get().pubsub
+    for order_id, (patient_id, status) in pending.items():
+        broker.publish(channel(patient_id), {'order_id': order_id, 'status': status})
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING, None)
+
+
+_installed = False
+
+
+def install():
+    """Hook every session; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', lambda session, previous: _after_rollback(session))
+    _installed = True
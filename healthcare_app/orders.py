@@ -0,0 +1,124 @@
+"""Order placement for the e-pharmacy.
+
+``checkout`` turns a cart of (prescription, vendor) picks into orders in
+one transaction:
+
+* The prescriptions are claimed with a single compare-and-set UPDATE
+  (``status = 'Ordered' WHERE status = 'Available'`` and owned by the
+  patient). The database serialises concurrent updates of a row, so two
+  tabs or a double click cannot both claim one prescription. If any
+  item is no longer available the whole cart is rolled back.
+* Every submit carries an idempotency key, stored on its orders. A
+  retried submit with the same key returns the orders it already placed
+  instead of failing or placing new ones.
+* Prices are the vendor quotes the patient was shown, never the posted
+  amount.
+"""
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import update
+
+from models import db, Order, Prescription
+
+MAX_KEY_LENGTH = 64
+
+CheckoutResult = namedtuple('CheckoutResult', ['orders', 'replayed'])
+
+
+class OrderError(Exception):
+    pass
+
+
+class Unavailable(OrderError):
+    """Some prescriptions are not (or no longer) available to this patient."""
+
+    def __init__(self, prescription_ids):
+        super().__init__(f"Prescriptions not available: {sorted(prescription_ids)}")
+        self.prescription_ids = set(prescription_ids)
+
+
+class NoQuote(OrderError):
+    def __init__(self, medicine, vendor):
+        super().__init__(f"{vendor} has no price for {medicine} right now.")
+        self.medicine = medicine
+        self.vendor = vendor
+
+
+def new_key():
+    """A fresh idempotency key, rendered into each order form."""
+    return uuid.uuid4().hex
+
+
+def clean_key(value):
+    value = (value or '').strip()
+    return value[:MAX_KEY_LENGTH] if value else None
+
+
+def placed_with(patient_id, key):
+    return (Order.query.filter_by(patient_id=patient_id, checkout_key=key)
+            .order_by(Order.id).all())
+
+
+def checkout(patient_id, items, key, price_lookup):
+    """Place one order per ``(prescription_id, vendor)`` in ``items``.
+
+    ``price_lookup(medicine_names)`` returns ``{name: PricedMedicine}``.
+    Raises Unavailable or NoQuote (and places nothing) on a bad cart.
+    """
+    key = clean_key(key) or new_key()
+    cart = dict(items)  # one vendor per prescription; last pick wins
+    if not cart:
+        raise OrderError("Nothing selected to order.")
+
+    existing = placed_with(patient_id, key)
+    if existing:
+        return CheckoutResult(existing, True)
+
+    prescriptions = Prescription.query.filter(
+        Prescription.id.in_(list(cart)),
+        Prescription.patient_id == patient_id,
+        Prescription.status == 'Available',
+    ).all()
+    missing = set(cart) - {p.id for p in prescriptions}
+    if missing:
+        raise Unavailable(missing)
+
+    prices = price_lookup([p.medicine for p in prescriptions])
+    orders = []
+    for prescription in prescriptions:
+        vendor = cart[prescription.id]
+        priced = prices.get(prescription.medicine)
+        offer = priced.vendors.get(vendor) if priced else None
+        if offer is None:
+            raise NoQuote(prescription.medicine, vendor)
+        orders.append(Order(
+            patient_id=patient_id,
+            prescription_id=prescription.id,
+            status='Ordered',
+            final_price=offer['price'],
+            final_vendor=vendor,
+            checkout_key=key,
+        ))
+
+    # Compare-and-set: only rows still Available are claimed. A concurrent
+    # checkout that got there first leaves us short, and we back out.
+    claimed = db.session.execute(
+        update(Prescription)
+        .where(Prescription.id.in_(list(cart)),
+               Prescription.patient_id == patient_id,
+               Prescription.status == 'Available')
+        .values(status='Ordered')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed != len(cart):
+        db.session.rollback()
+        # Same key: the racing request was our own retry, which has won
+        replayed = placed_with(patient_id, key)
+        if replayed:
+            return CheckoutResult(replayed, True)
+        raise Unavailable(set(cart))
+
+    db.session.add_all(orders)
+    db.session.commit()
+    return CheckoutResult(orders, False)
@@ -0,0 +1,75 @@
+"""HTML rendering caches: template fragments and conditional GETs.
+
+Fragments: wrap an expensive block of a template in
+
+    {% cache 'doctor_options', directory.current_version() %} ... {% endcache %}
+
+and its output is reused for as long as the key is unchanged. Keys must
+name the data the block shows, including its version (a directory
+version, a price snapshot time), so a change produces a new key rather
+than needing an invalidation; ``FRAGMENT_CACHE_TTL`` only bounds how long
+dead keys linger. A key part that is None (no version known, e.g. a live
+price) renders the block uncached.
+
+Conditional GETs: every complete 200 text/html response to a GET gets an
+ETag of its body and ``Cache-Control: private, no-cache``; a browser that
+sends the ETag back gets an empty 304 instead of the page.
+"""
+from flask import request
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+import instrumentation
+from cache import TTLCache
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ... %}...{% endcache %}`` backed by ``environment.fragment_cache``."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or any(part is None for part in parts):
+            return caller()
+        key = tuple(parts)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html)
+        return html
+
+
+def _conditional_html(response):
+    if (request.method != 'GET' or response.status_code != 200 or response.mimetype != 'text/html'
+            or response.is_streamed or response.direct_passthrough):
+        return response
+    response.add_etag()
+    if not response.cache_control:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    size = app.config['FRAGMENT_CACHE_SIZE']
+    if size:
+        cache = TTLCache(maxsize=size, ttl=app.config['FRAGMENT_CACHE_TTL'])
+        app.jinja_env.fragment_cache = cache
+        instrumentation.add_collector('fragment_cache', cache.stats)
+    if app.config['HTML_ETAGS']:
+        app.after_request(_conditional_html)
@@ -0,0 +1,130 @@
+"""Password hashing off the request threads.
+
+Key derivation (scrypt / pbkdf2) is deliberately CPU-heavy. Here it runs
+in a small process pool, so at most ``workers`` cores are spent on
+hashing however many requests log in at once. At most ``max_pending``
+hashes may wait for the pool; beyond that ``HasherBusy`` is raised so a
+login storm is turned away instead of queuing without bound.
+
+That bound is the only gain: the request thread still blocks on the
+result, and hashlib releases the GIL while deriving, so inline hashing
+would not stall other threads either.
+
+The pool's processes are started with forkserver (spawn where that is
+not available), never fork: by the time the first login needs the pool
+the web process has threads, and a forked child could inherit a lock one
+of them held. Those children import the main module again, so a script
+that hashes through the pool needs an ``if __name__ == '__main__'`` guard.
+
+``PASSWORD_HASH_METHOD`` takes any werkzeug method string, e.g.
+``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes made with other
+parameters still verify; ``needs_rehash`` tells login to upgrade them.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class HasherBusy(Exception):
+    """Too many hashes already waiting; try again shortly."""
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=32, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._prefix = None
+
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            method=config['PASSWORD_HASH_METHOD'],
+            workers=config['PASSWORD_HASH_WORKERS'],
+            max_pending=config['PASSWORD_HASH_MAX_PENDING'],
+            timeout=config['PASSWORD_HASH_TIMEOUT'],
+        )
+
+    def hash(self, password):
+        self.hashed += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        self.verified += 1
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with other parameters than ``method``."""
+        if self._prefix is None:
+            # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1");
+            # one throwaway hash tells us the canonical prefix.
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def upgrade(self, user, password):
+        """Re-hash ``user.password`` with the current method if needed.
+
+        Call after a successful verify; returns True if the row changed.
+        Skipped when the pool is busy; the next login tries again.
+        """
+        if not self.needs_rehash(user.password):
+            return False
+        try:
+            user.password = self.hash(password)
+        except HasherBusy:
+            return False
+        self.rehashed += 1
+        return True
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rehashed': self.rehashed,
+            'rejected_busy': self.rejected,
+        }
+
+    # --- internals ---
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy("Too many password checks in progress")
+        try:
+            future = self._executor().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                raise HasherBusy("Password check timed out")
+        finally:
+            self._slots.release()
+
+    def _executor(self):
+        # Started on first use so importing the app does not fork workers
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(START_METHOD))
+        return self._pool
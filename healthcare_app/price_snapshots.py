@@ -0,0 +1,128 @@
+"""Precomputed price snapshots for the e-pharmacy and compare pages.
+
+A refresh job prices every distinct prescribed medicine and stores the
+vendor quotes as one compact ``PriceSnapshot`` row per medicine. Pages
+then read quotes through the unique ``medicine_key`` index, one query
+per page, and do no live vendor calls. Only a medicine with no snapshot
+yet is priced live. Each result records when it was priced so the
+templates can show how old the numbers are.
+
+``pricing.refresh_snapshots`` is a periodic job, one queued across all
+processes (see jobs.py). It can still overlap a ``pricing.refresh`` job
+or the CLI, so snapshots are written with an upsert on ``medicine_key``.
+"""
+import json
+from collections import namedtuple
+from datetime import datetime
+
+import database
+from models import db, Prescription, PriceSnapshot
+from pricing import Quote, as_comparison, medicine_key
+
+REFRESH_JOB = 'pricing.refresh_snapshots'
+
+# vendors/cheapest have the shape compare_prices.html already uses;
+# refreshed_at is None for a live (not yet snapshotted) price.
+PricedMedicine = namedtuple('PricedMedicine', ['vendors', 'cheapest', 'refreshed_at', 'stale'])
+
+
+def _encode(quotes):
+    return json.dumps([[q.vendor, q.price, q.link] for q in quotes], separators=(',', ':'))
+
+
+def _decode(payload):
+    return [Quote(*row) for row in json.loads(payload)]
+
+
+def refresh(service, medicine_names=None, batch_size=200):
+    """Re-price ``medicine_names`` (default: every prescribed medicine).
+
+    Quotes are fetched and written ``batch_size`` medicines at a time.
+    Returns the number of snapshots stored.
+    """
+    if medicine_names is None:
+        # Loaded up front: the batches below commit, which would end a
+        # streaming cursor. Distinct names are few next to prescriptions.
+        medicine_names = [row[0] for row in db.session.query(Prescription.medicine).distinct()
+                          if row[0]]
+
+    stored, batch = 0, []
+    for name in medicine_names:
+        batch.append(name)
+        if len(batch) >= batch_size:
+            stored += _store(service, batch)
+            batch = []
+    if batch:
+        stored += _store(service, batch)
+    return stored
+
+
+def _store(service, names):
+    by_key = {}
+    for name in names:
+        by_key.setdefault(medicine_key(name), name)
+    # Fetch fresh quotes; the service cache would otherwise hand back old ones
+    for name in by_key.values():
+        service.invalidate(name)
+    quotes = service.quotes_many(list(by_key.values()))
+
+    now = datetime.utcnow()
+    rows = []
+    for key, name in sorted(by_key.items()):  # same lock order in every concurrent refresh
+        found = quotes.get(name)
+        if not found:
+            continue  # every vendor failed; keep the previous snapshot
+        cheapest = min(found, key=lambda q: q.price)
+        rows.append({'medicine_key': key, 'medicine': name, 'quotes': _encode(found),
+                     'cheapest_vendor': cheapest.vendor, 'cheapest_price': cheapest.price,
+                     'refreshed_at': now})
+    if rows:
+        _upsert(rows)
+    db.session.commit()
+    return len(rows)
+
+
+def _upsert(rows):
+    connection = db.session.connection()
+    stmt = database.insert_for(connection, PriceSnapshot.__table__)
+    if stmt is None:
+        # No upsert in this dialect: read, then update or insert
+        existing = {snap.medicine_key: snap for snap in PriceSnapshot.query.filter(
+            PriceSnapshot.medicine_key.in_([row['medicine_key'] for row in rows]))}
+        for row in rows:
+            snap = existing.get(row['medicine_key']) or PriceSnapshot()
+            for column, value in row.items():
+                setattr(snap, column, value)
+            db.session.add(snap)
+        return
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PriceSnapshot.__table__.c.medicine_key],
+        set_={column: stmt.excluded[column] for column in rows[0] if column != 'medicine_key'},
+    )
+    connection.execute(stmt, rows)
+
+
+def lookup(medicine_names, max_age):
+    """Stored snapshots for ``medicine_names``: {name: PricedMedicine}."""
+    keys = {name: medicine_key(name) for name in medicine_names}
+    if not keys:
+        return {}
+    now = datetime.utcnow()
+    found = {}
+    for snap in PriceSnapshot.query.filter(PriceSnapshot.medicine_key.in_(set(keys.values()))):
+        vendors, cheapest = as_comparison(_decode(snap.quotes))
+        stale = (now - snap.refreshed_at).total_seconds() > max_age
+        found[snap.medicine_key] = PricedMedicine(vendors, cheapest, snap.refreshed_at, stale)
+    return {name: found[key] for name, key in keys.items() if key in found}
+
+
+def priced(service, medicine_names, max_age):
+    """Snapshot prices, with live pricing only for medicines never snapshotted."""
+    medicine_names = list(dict.fromkeys(medicine_names))
+    result = lookup(medicine_names, max_age)
+    missing = [name for name in medicine_names if name not in result]
+    if missing:
+        for name, (vendors, cheapest) in service.compare_many(missing).items():
+            result[name] = PricedMedicine(vendors, cheapest, None, False)
+    return result
+
@@ -0,0 +1,205 @@
+"""Vendor price comparison for the e-pharmacy.
+
+Quotes come from pluggable ``VendorAdapter`` objects. They are fetched
+concurrently with a per-vendor timeout and cached per medicine. A fresh
+entry is served as is. A stale entry is still served while one
+background refresh runs (stale-while-revalidate). Only a missing or
+expired entry makes the caller wait.
+
+The bundled adapters simulate the three pharmacies. Each price is derived
+from a hash of the medicine name, so the same medicine is quoted the same
+price on the compare page and when the order is placed.
+"""
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import quote_plus
+
+Quote = namedtuple('Quote', ['vendor', 'price', 'link'])
+
+_MISSING = object()
+
+
+def medicine_key(medicine_name):
+    return ' '.join((medicine_name or '').lower().split())
+
+
+class VendorAdapter:
+    """One pharmacy's price source; subclasses implement ``quote``."""
+
+    name = None
+
+    def quote(self, medicine_name):
+        """Return a Quote for ``medicine_name`` (may block on I/O)."""
+        raise NotImplementedError
+
+
+class SimulatedVendor(VendorAdapter):
+    """Deterministic stand-in for a pharmacy's price API."""
+
+    def __init__(self, name, factor, link_template, latency=0.0):
+        self.name = name
+        self.factor = factor
+        self.link_template = link_template
+        self.latency = latency
+
+    @staticmethod
+    def base_price(medicine_name):
+        digest = hashlib.sha256(medicine_key(medicine_name).encode('utf-8')).digest()
+        fraction = int.from_bytes(digest[:8], 'big') / 2 ** 64
+        return round(100 + fraction * 300, 2)
+
+    def quote(self, medicine_name):
+        if self.latency:
+            time.sleep(self.latency)
+        price = round(self.base_price(medicine_name) * self.factor, 2)
+        return Quote(self.name, price, self.link_template.format(quote_plus(medicine_name)))
+
+
+def default_vendors():
+    return [
+        SimulatedVendor("Apollo Pharmacy", 1.0, "https://www.apollopharmacy.in/search/{}"),
+        SimulatedVendor("MedPlus Mart", 0.93, "https://www.medplusmart.com/search/{}"),  # 7% cheaper
+        SimulatedVendor("NetMeds", 1.05, "https://www.netmeds.com/catalogsearch/result?q={}"),  # 5% pricier
+    ]
+
+
+def as_comparison(quotes):
+    """Shape quotes the way compare_prices.html expects: (vendors, cheapest)."""
+    vendors = {q.vendor: {"price": q.price, "link": q.link} for q in quotes}
+    # Sort to easily find the cheapest vendor
+    cheapest = min(vendors.items(), key=lambda item: item[1]['price']) if vendors else None
+    return vendors, cheapest
+
+
+class PriceService:
+    # A result missing some vendors is only trusted briefly
+    PARTIAL_TTL = 30
+
+    def __init__(self, adapters, ttl=900, stale_ttl=3600, vendor_timeout=2.0,
+                 max_workers=16, clock=time.monotonic):
+        self.adapters = list(adapters)
+        self._vendor_order = {adapter.name: i for i, adapter in enumerate(self.adapters)}
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.vendor_timeout = vendor_timeout
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pricing')
+        # Refreshes wait on vendor futures, so they must not occupy _pool
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pricing-refresh')
+        self._lock = threading.Lock()
+        self._cache = {}  # key -> (fresh_until, stale_until, [Quote])
+        self._refreshing = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config, adapters=None):
+        return cls(
+            adapters if adapters is not None else default_vendors(),
+            ttl=config['PRICE_CACHE_TTL'],
+            stale_ttl=config['PRICE_STALE_TTL'],
+            vendor_timeout=config['PRICE_VENDOR_TIMEOUT'],
+        )
+
+    # --- public API ---
+    def compare(self, medicine_name):
+        return as_comparison(self.quotes(medicine_name))
+
+    def compare_many(self, medicine_names):
+        """Batch form of compare(): {medicine_name: (vendors, cheapest)}.
+
+        Every uncached medicine is priced in the same concurrent round, so
+        pricing a whole prescription list costs one vendor timeout at most.
+        """
+        return {name: as_comparison(quotes)
+                for name, quotes in self.quotes_many(medicine_names).items()}
+
+    def quotes(self, medicine_name):
+        return self.quotes_many([medicine_name])[medicine_name]
+
+    def quotes_many(self, medicine_names):
+        now = self._clock()
+        results, to_fetch, stale = {}, [], []
+        for name in dict.fromkeys(medicine_names):
+            entry = self._cache.get(medicine_key(name), _MISSING)
+            if entry is _MISSING or now >= entry[1]:
+                to_fetch.append(name)
+                continue
+            results[name] = entry[2]
+            if now >= entry[0]:
+                stale.append(name)
+        # Request threads, job threads and refreshes all count here
+        with self._lock:
+            self.hits += len(results) - len(stale)
+            self.stale_hits += len(stale)
+            self.misses += len(to_fetch)
+
+        for name in stale:
+            self._refresh_in_background(name)
+        if to_fetch:
+            results.update(self._fetch(to_fetch))
+        return results
+
+    def invalidate(self, medicine_name=None):
+        with self._lock:
+            if medicine_name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(medicine_key(medicine_name), None)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    # --- internals ---
+    def _fetch(self, medicine_names):
+        futures = {
+            self._pool.submit(adapter.quote, name): name
+            for name in medicine_names
+            for adapter in self.adapters
+        }
+        # Vendors run in parallel, so one timeout bounds the whole round;
+        # a vendor that misses it is left out of the comparison.
+        done, _ = wait(futures, timeout=self.vendor_timeout)
+
+        quotes = {name: [] for name in medicine_names}
+        for future in done:
+            if future.exception() is None:
+                quotes[futures[future]].append(future.result())
+
+        now = self._clock()
+        with self._lock:
+            for name, found in quotes.items():
+                if not found:
+                    continue
+                found.sort(key=lambda q: self._vendor_order.get(q.vendor, 0))
+                ttl = self.ttl if len(found) == len(self.adapters) else min(self.ttl, self.PARTIAL_TTL)
+                self._cache[medicine_key(name)] = (now + ttl, now + ttl + self.stale_ttl, found)
+        return quotes
+
+    def _refresh_in_background(self, medicine_name):
+        key = medicine_key(medicine_name)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch([medicine_name])
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
@@ -0,0 +1,172 @@
+"""Lightweight publish/subscribe for pushing live updates to open pages.
+
+``publish(channel, message)`` hands a JSON-able dict to every current
+``subscribe(channel)`` subscription; nothing is stored, so a subscriber
+only sees what is published while it is listening. Each subscription
+has a bounded queue: a consumer that falls behind loses the oldest
+messages and is flagged ``overflowed`` so it can resync.
+
+By default the broker is in-process: a publish from another process (a
+job worker, ``flask run-jobs``) is never seen here, and ``shared`` is
+False so consumers know to poll as well. Set ``PUBSUB_REDIS_URL`` to fan
+out between processes and hosts through Redis pub/sub (any
+Redis-protocol server works): publishes go to Redis, and one listener
+thread per process relays them to the local subscriptions.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+log = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize)
+
+    def _put(self, message):
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                self.overflowed = True
+                try:
+                    self._queue.get_nowait()  # drop the oldest
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """The next message, or None if none arrived within ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _RedisRelay:
+    """Publishes through Redis and relays every message back to the local broker."""
+
+    PREFIX = 'aegiscare:'
+
+    def __init__(self, url, deliver):
+        self._client = redis.Redis.from_url(url)
+        self._deliver = deliver
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self._client.publish(self.PREFIX + channel, json.dumps(message))
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='pubsub-redis', daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        # One pattern subscription for the whole prefix; channels are
+        # filtered locally, so subscribing never touches this connection
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.PREFIX + '*')
+                for item in pubsub.listen():
+                    if item['type'] != 'pmessage':
+                        continue
+                    channel = item['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self._deliver(channel[len(self.PREFIX):], json.loads(item['data']))
+            except Exception:
+                log.exception("pub/sub relay lost its Redis connection; reconnecting")
+                time.sleep(1)
+
+
+class Broker:
+    def __init__(self, queue_size=100, redis_url=None):
+        if redis_url and redis is None:
+            raise RuntimeError("PUBSUB_REDIS_URL is set but the redis package is not installed")
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)  # channel -> {Subscription}
+        self._lock = threading.Lock()
+        self._relay = _RedisRelay(redis_url, self._deliver) if redis_url else None
+
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(queue_size=config['PUBSUB_QUEUE_SIZE'], redis_url=config['PUBSUB_REDIS_URL'])
+
+    @property
+    def shared(self):
+        """True when publishes from other processes reach this broker."""
+        return self._relay is not None
+
+    def publish(self, channel, message):
+        self.published += 1
+        if self._relay is not None:
+            self._relay.publish(channel, message)
+        else:
+            self._deliver(channel, message)
+
+    def subscribe(self, channel):
+        if self._relay is not None:
+            self._relay.ensure_started()
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            was_overflowed = subscription.overflowed
+            subscription._put(message)
+            if subscription.overflowed and not was_overflowed:
+                self.overflows += 1
+        self.delivered += len(subscribers)
+
+    def stats(self):
+        with self._lock:
+            channels = len(self._subscribers)
+            subscriptions = sum(len(s) for s in self._subscribers.values())
+        return {
+            'backend': 'redis' if self._relay is not None else 'local',
+            'channels': channels,
+            'subscriptions': subscriptions,
+            'published': self.published,
+            'delivered': self.delivered,
+            'overflows': self.overflows,
+        }
@@ -0,0 +1,417 @@
+"""Columnar reporting over prescriptions and orders.
+
+    flask report                  # snapshot the tables, aggregate, print the report
+    flask report --parquet        # also write Parquet files (needs pyarrow)
+
+A build streams the two tables out of the database ``batch_size`` rows
+at a time (``yield_per``, a server-side cursor on PostgreSQL) as plain
+tuples, never ORM objects, and appends each column to its own binary
+file. Strings (medicine, dosage, vendor, status) are dictionary-encoded
+to int32 codes; missing numbers are -1 (ids) or NaN (prices). The
+columns are then opened as read-only NumPy memory maps and aggregated in
+``CHUNK``-row slices, so memory stays bounded by one batch plus the
+result arrays, whatever the row count.
+
+Each build writes into a ``.tmp-`` directory, renames it into place and
+then points ``LATEST`` at it, so readers never see half a snapshot.
+Pruning only removes published snapshots beyond the newest ``keep`` and
+never the one ``LATEST`` names, so it cannot delete a build another
+process is still writing or the report readers are being served.
+``ReportStore`` keeps the latest ``report.json`` in memory for the admin
+endpoint, which rebuilds in a background job once it is older than
+``REPORT_MAX_AGE``.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from models import db, Order, Prescription
+from pricing import medicine_key
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional
+    pyarrow = None
+
+CHUNK = 1 << 20  # rows per aggregation slice
+POINTER = 'LATEST'
+BUILDING = '.tmp-'  # prefix of snapshots still being written
+ABANDONED_AFTER = 24 * 3600  # seconds; an older .tmp- directory is a crashed build
+
+# table -> (model, [(column, kind)]); kind is 'int', 'float' or 'str'
+TABLES = {
+    'prescriptions': (Prescription, [('id', 'int'), ('patient_id', 'int'), ('doctor_id', 'int'),
+                                     ('medicine', 'str'), ('dosage', 'str'), ('price', 'float'),
+                                     ('status', 'str')]),
+    'orders': (Order, [('id', 'int'), ('patient_id', 'int'), ('prescription_id', 'int'),
+                       ('final_price', 'float'), ('final_vendor', 'str'), ('status', 'str')]),
+}
+DTYPES = {'int': np.int64, 'float': np.float64, 'str': np.int32}
+ARROW_TYPES = {'int': 'int64', 'float': 'float64', 'str': 'string'}
+
+
+# --- Extraction ---
+class _Dictionary:
+    """Distinct strings of one column, in order of first appearance."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, strings):
+        codes = self._codes
+        out = np.empty(len(strings), dtype=np.int32)
+        for i, value in enumerate(strings):
+            if value is None:
+                out[i] = -1
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            out[i] = code
+        return out
+
+
+def _encode(kind, values, dictionary):
+    if kind == 'str':
+        return dictionary.encode(values)
+    if kind == 'int':
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _extract(path, table, batch_size, parquet):
+    model, columns = TABLES[table]
+    dictionaries = {name: _Dictionary() for name, kind in columns if kind == 'str'}
+    files = {name: open(os.path.join(path, f'{table}.{name}.bin'), 'wb') for name, _ in columns}
+    writer = None
+    if parquet:
+        schema = pyarrow.schema([(name, ARROW_TYPES[kind]) for name, kind in columns])
+        writer = pyarrow.parquet.ParquetWriter(os.path.join(path, f'{table}.parquet'), schema)
+    rows = 0
+    try:
+        # Core execution on the session's connection: plain rows, no ORM row processing
+        result = db.session.connection().execute(
+            select(*[getattr(model, name) for name, _ in columns])
+            .order_by(model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in result.partitions():
+            by_column = list(zip(*batch))
+            for (name, kind), values in zip(columns, by_column):
+                files[name].write(_encode(kind, values, dictionaries.get(name)).tobytes())
+            if writer is not None:
+                writer.write_table(pyarrow.table(
+                    [list(values) for values in by_column], schema=writer.schema))
+            rows += len(batch)
+    finally:
+        for f in files.values():
+            f.close()
+        if writer is not None:
+            writer.close()
+    return {
+        'rows': rows,
+        'columns': {name: kind for name, kind in columns},
+        'dictionaries': {name: d.values for name, d in dictionaries.items()},
+    }
+
+
+def build(directory, batch_size=5000, parquet=False):
+    """Snapshot both tables into a new ``.tmp-`` directory under ``directory``; returns its path.
+
+    Nothing reads or prunes it until ``publish`` renames it into place.
+    """
+    if parquet and pyarrow is None:
+        raise RuntimeError("Parquet output needs the pyarrow package")
+    os.makedirs(directory, exist_ok=True)
+    name = f"{BUILDING}{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    manifest = {'created_at': datetime.utcnow().isoformat() + 'Z', 'tables': {}}
+    try:
+        for table in TABLES:
+            manifest['tables'][table] = _extract(path, table, batch_size, parquet)
+        with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return path
+
+
+def publish(directory, path, keep=2):
+    """Move built snapshot ``path`` into place, point ``LATEST`` at it and prune.
+
+    Returns the published path.
+    """
+    name = os.path.basename(path)[len(BUILDING):]
+    published = os.path.join(directory, name)
+    os.rename(path, published)
+    pointer = os.path.join(directory, POINTER)
+    temporary = f"{pointer}{BUILDING}{os.getpid()}"  # per process: publishes may overlap
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(temporary, pointer)
+    prune(directory, keep)
+    return published
+
+
+def _pointed_at(directory):
+    try:
+        with open(os.path.join(directory, POINTER), encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def prune(directory, keep=2):
+    """Remove published snapshots beyond the newest ``keep``, and abandoned builds.
+
+    In-progress builds (``.tmp-``) and the snapshot ``LATEST`` names, read
+    again here because another process may have published since, are kept.
+    """
+    if not keep:
+        return
+    current = _pointed_at(directory)
+    snapshots = []
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if not os.path.isdir(path):
+            continue
+        if entry.startswith(BUILDING):
+            try:
+                if time.time() - os.path.getmtime(path) > ABANDONED_AFTER:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass  # published or cleaned up meanwhile
+        else:
+            snapshots.append(entry)
+    for stale in sorted(snapshots)[:-keep]:
+        if stale != current:
+            shutil.rmtree(os.path.join(directory, stale), ignore_errors=True)
+
+
+class Snapshot:
+    """Read-only view of one built snapshot: memory-mapped columns plus dictionaries."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+    def rows(self, table):
+        return self.manifest['tables'][table]['rows']
+
+    def column(self, table, name):
+        dtype = DTYPES[self.manifest['tables'][table]['columns'][name]]
+        if not self.rows(table):
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f'{table}.{name}.bin'), dtype=dtype, mode='r',
+                         shape=(self.rows(table),))
+
+    def dictionary(self, table, name):
+        return self.manifest['tables'][table]['dictionaries'][name]
+
+    def code(self, table, name, value):
+        """The int32 code of ``value`` in a string column, or -2 (matches nothing)."""
+        try:
+            return self.dictionary(table, name).index(value)
+        except ValueError:
+            return -2
+
+
+# --- Aggregation ---
+def _slices(n):
+    for start in range(0, n, CHUNK):
+        yield slice(start, min(n, start + CHUNK))
+
+
+def _add_bins(total, bins):
+    """``total + bins`` for bincount results of different lengths."""
+    if len(bins) > len(total):
+        bins = bins.copy()
+        bins[:len(total)] += total
+        return bins
+    total[:len(bins)] += bins
+    return total
+
+
+def _top(values, limit):
+    """Indices of the ``limit`` largest non-zero ``values``, largest first."""
+    candidates = np.flatnonzero(values)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(values[candidates], -limit)[-limit:]]
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+
+def _paid_orders(snapshot, part):
+    """Mask of orders in slice ``part`` that carry revenue: priced and not cancelled."""
+    price = snapshot.column('orders', 'final_price')[part]
+    cancelled = snapshot.code('orders', 'status', 'Cancelled')
+    return ~np.isnan(price) & (snapshot.column('orders', 'status')[part] != cancelled)
+
+
+def spend_per_patient(snapshot, top=10):
+    spend = np.zeros(0)
+    orders = np.zeros(0)
+    for part in _slices(snapshot.rows('orders')):
+        paid = _paid_orders(snapshot, part)
+        patients = snapshot.column('orders', 'patient_id')[part][paid]
+        prices = snapshot.column('orders', 'final_price')[part][paid]
+        keep = patients >= 0
+        spend = _add_bins(spend, np.bincount(patients[keep], weights=prices[keep]))
+        orders = _add_bins(orders, np.bincount(patients[keep]).astype(np.float64))
+
+    spenders = spend[spend > 0]
+    return {
+        'patients': int(len(spenders)),
+        'total': round(float(spenders.sum()), 2),
+        'mean': round(float(spenders.mean()), 2) if len(spenders) else 0.0,
+        'median': round(float(np.median(spenders)), 2) if len(spenders) else 0.0,
+        'p90': round(float(np.percentile(spenders, 90)), 2) if len(spenders) else 0.0,
+        'top': [{'patient_id': int(i), 'spend': round(float(spend[i]), 2), 'orders': int(orders[i])}
+                for i in _top(spend, top)],
+    }
+
+
+def vendor_share(snapshot):
+    vendors = snapshot.dictionary('orders', 'final_vendor')
+    revenue = np.zeros(len(vendors))
+    orders = np.zeros(len(vendors))
+    for part in _slices(snapshot.rows('orders')):
+        codes = snapshot.column('orders', 'final_vendor')[part]
+        paid = _paid_orders(snapshot, part) & (codes >= 0)
+        prices = snapshot.column('orders', 'final_price')[part][paid]
+        revenue += np.bincount(codes[paid], weights=prices, minlength=len(vendors))
+        orders += np.bincount(codes[paid], minlength=len(vendors))
+
+    total = revenue.sum()
+    return [{'vendor': vendors[i], 'orders': int(orders[i]), 'revenue': round(float(revenue[i]), 2),
+             'share': round(float(revenue[i] / total), 4) if total else 0.0}
+            for i in _top(revenue, len(vendors))]
+
+
+def top_medicines(snapshot, top=10):
+    spellings = snapshot.dictionary('prescriptions', 'medicine')
+    # Raw spellings -> normalised medicine keys, as in analytics and pricing
+    keys, key_codes, names = {}, np.empty(len(spellings), dtype=np.int32), []
+    for code, spelling in enumerate(spellings):
+        key = medicine_key(spelling)
+        if key not in keys:
+            keys[key] = len(names)
+            names.append(spelling)
+        key_codes[code] = keys[key]
+
+    count = np.zeros(len(names))
+    value = np.zeros(len(names))
+    for part in _slices(snapshot.rows('prescriptions')):
+        codes = snapshot.column('prescriptions', 'medicine')[part]
+        known = codes >= 0
+        medicines = key_codes[codes[known]]
+        prices = np.nan_to_num(snapshot.column('prescriptions', 'price')[part][known])
+        count += np.bincount(medicines, minlength=len(names))
+        value += np.bincount(medicines, weights=prices, minlength=len(names))
+
+    return [{'medicine': names[i], 'prescriptions': int(count[i]), 'prescribed_value': round(float(value[i]), 2)}
+            for i in _top(count, top)]
+
+
+def report(snapshot, top=10):
+    """Every aggregation over one snapshot, JSON-ready."""
+    started = time.perf_counter()
+    result = {
+        'snapshot': os.path.basename(snapshot.path),
+        'created_at': snapshot.manifest['created_at'],
+        'rows': {table: snapshot.rows(table) for table in TABLES},
+        'spend_per_patient': spend_per_patient(snapshot, top),
+        'vendor_share': vendor_share(snapshot),
+        'top_medicines': top_medicines(snapshot, top),
+    }
+    result['aggregate_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+# --- Store ---
+class ReportStore:
+    """The latest report on disk, cached in memory until a newer snapshot is published."""
+
+    def __init__(self, directory, max_age=3600, batch_size=5000, keep=2, top=10):
+        self.directory = directory
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.keep = keep
+        self.top = top
+        self._cached = (None, None)  # (snapshot name, report)
+        self._lock = threading.Lock()
+
+        self.builds = 0
+        self.last_build_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, app):
+        config = app.config
+        return cls(
+            os.path.join(app.instance_path, config['REPORTS_DIR']),  # an absolute setting is kept
+            max_age=config['REPORT_MAX_AGE'],
+            batch_size=config['REPORT_BATCH_SIZE'],
+            keep=config['REPORT_KEEP'],
+            top=config['REPORT_TOP_N'],
+        )
+
+    def rebuild(self, parquet=False, top=None):
+        """Snapshot, aggregate and publish; returns the new report."""
+        started = time.perf_counter()
+        path = build(self.directory, self.batch_size, parquet)
+        result = report(Snapshot(path), top or self.top)
+        with open(os.path.join(path, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        try:
+            publish(self.directory, path, self.keep)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+        return result
+
+    def latest(self):
+        """The published report, or None before the first build."""
+        name = _pointed_at(self.directory)
+        if name is None:
+            return None
+        cached_name, cached = self._cached
+        if name == cached_name:
+            return cached
+        try:
+            with open(os.path.join(self.directory, name, 'report.json'), encoding='utf-8') as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            return cached  # pruned or half-published; the previous one is still valid
+        with self._lock:
+            self._cached = (name, loaded)
+        return loaded
+
+    def age(self, result):
+        created = datetime.fromisoformat(result['created_at'].rstrip('Z'))
+        return (datetime.utcnow() - created).total_seconds()
+
+    def is_stale(self, result):
+        return self.age(result) > self.max_age
+
+    def stats(self):
+        _, cached = self._cached
+        return {
+            'builds': self.builds,
+            'last_build_seconds': round(self.last_build_seconds, 3),
+            'age_seconds': round(self.age(cached), 1) if cached else None,
+            'orders': cached['rows']['orders'] if cached else None,
+            'prescriptions': cached['rows']['prescriptions'] if cached else None,
+        }
@@ -0,0 +1,252 @@
+"""Slot-based appointment booking.
+
+Appointments occupy fixed ``slot_minutes`` slots inside clinic hours and
+carry a typed ``slot_start``. The unique (doctor_id, slot_start) index is
+what keeps two bookings off one slot, across threads and workers alike:
+a losing insert fails with IntegrityError and becomes ``SlotTaken``.
+
+``SlotIndex`` answers free-slot questions without scanning appointments.
+It keeps one integer bitmap per (doctor, day), bit i set meaning slot i
+is booked. Missing days are loaded for many doctors at once through the
+unique index and cached for ``max_age`` seconds. A stale bitmap can only
+offer a slot that the insert then rejects, never double-book one.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Appointment
+
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%H:%M'
+
+
+class SchedulingError(Exception):
+    pass
+
+
+class InvalidSlot(SchedulingError):
+    """Not a bookable slot: off the slot grid, outside hours or in the past."""
+
+
+class SlotTaken(SchedulingError):
+    def __init__(self, doctor_id, slot, next_free=None):
+        super().__init__(f"Slot {slot:%Y-%m-%d %H:%M} is already booked")
+        self.doctor_id = doctor_id
+        self.slot = slot
+        self.next_free = next_free
+
+
+def parse_slot(date, time_of_day):
+    """Combine the form's date and time strings; None if they do not parse."""
+    for fmt in (f'{DATE_FORMAT} {TIME_FORMAT}', f'{DATE_FORMAT} %H:%M:%S'):
+        try:
+            return datetime.strptime(f"{(date or '').strip()} {(time_of_day or '').strip()}", fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _first_free(booked, start, full):
+    """Index of the lowest clear bit at or above ``start``, or None."""
+    free = ~booked & full & ~((1 << start) - 1)
+    if not free:
+        return None
+    return (free & -free).bit_length() - 1
+
+
+class SlotIndex:
+    def __init__(self, opens='09:00', closes='17:00', slot_minutes=30, max_age=60,
+                 max_entries=50000, clock=time.monotonic, now=datetime.now):
+        open_at = datetime.strptime(opens, TIME_FORMAT)
+        close_at = datetime.strptime(closes, TIME_FORMAT)
+        self.opens = timedelta(hours=open_at.hour, minutes=open_at.minute)
+        self.slot = timedelta(minutes=slot_minutes)
+        self.slots_per_day = int((close_at - open_at) / self.slot)
+        if self.slots_per_day <= 0:
+            raise ValueError("Clinic must close after it opens")
+        self._full = (1 << self.slots_per_day) - 1
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._clock = clock
+        self._now = now
+        self._lock = threading.Lock()
+        self._days = {}  # (doctor_id, date) -> (loaded_at, booked bitmap)
+
+        self.hits = 0
+        self.loads = 0
+        self.conflicts = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            opens=config['CLINIC_OPENS'],
+            closes=config['CLINIC_CLOSES'],
+            slot_minutes=config['APPOINTMENT_SLOT_MINUTES'],
+            max_age=config['SLOT_INDEX_MAX_AGE'],
+        )
+
+    # --- slot arithmetic ---
+    def slot_number(self, slot):
+        """Position of ``slot`` in its day, or InvalidSlot."""
+        offset = slot - datetime.combine(slot.date(), datetime.min.time()) - self.opens
+        number, remainder = divmod(offset, self.slot)
+        if remainder or not 0 <= number < self.slots_per_day:
+            raise InvalidSlot(f"{slot:%H:%M} is not a bookable {self.slot.seconds // 60}-minute slot")
+        return number
+
+    def slot_at(self, day, number):
+        return datetime.combine(day, datetime.min.time()) + self.opens + number * self.slot
+
+    def _first_bookable(self, day, now):
+        """First slot number on ``day`` that is still in the future."""
+        if day > now.date():
+            return 0
+        if day < now.date():
+            return self.slots_per_day
+        elapsed = now - self.slot_at(day, 0)
+        if elapsed < timedelta(0):
+            return 0
+        return min(self.slots_per_day, elapsed // self.slot + 1)
+
+    # --- bitmaps ---
+    def _bitmaps(self, doctor_ids, days):
+        """{(doctor_id, day): booked bitmap}, loading missing days in one query."""
+        now = self._clock()
+        result, missing = {}, set()
+        with self._lock:
+            for doctor_id in doctor_ids:
+                for day in days:
+                    entry = self._days.get((doctor_id, day))
+                    if entry is not None and now - entry[0] <= self.max_age:
+                        result[(doctor_id, day)] = entry[1]
+                    else:
+                        missing.add(doctor_id)
+        self.hits += len(result)
+        if not missing:
+            return result
+
+        loaded = {(doctor_id, day): 0 for doctor_id in missing for day in days}
+        first, last = min(days), max(days)
+        rows = db.session.query(Appointment.doctor_id, Appointment.slot_start).filter(
+            Appointment.doctor_id.in_(missing),
+            Appointment.slot_start >= self.slot_at(first, 0),
+            Appointment.slot_start < self.slot_at(last + timedelta(days=1), 0),
+        )
+        for doctor_id, slot in rows:
+            key = (doctor_id, slot.date())
+            if key in loaded:
+                try:
+                    loaded[key] |= 1 << self.slot_number(slot)
+                except InvalidSlot:
+                    continue  # legacy row off the current grid
+        self.loads += 1
+
+        with self._lock:
+            if len(self._days) + len(loaded) > self.max_entries:
+                self._prune(now)
+            for key, bits in loaded.items():
+                self._days[key] = (now, bits)
+        result.update(loaded)
+        return result
+
+    def _prune(self, now):
+        self._days = {key: entry for key, entry in self._days.items()
+                      if now - entry[0] <= self.max_age}
+        if len(self._days) > self.max_entries // 2:
+            self._days.clear()
+
+    def _mark(self, doctor_id, slot):
+        key = (doctor_id, slot.date())
+        with self._lock:
+            entry = self._days.get(key)
+            if entry is not None:
+                self._days[key] = (entry[0], entry[1] | 1 << self.slot_number(slot))
+
+    def invalidate(self, doctor_id=None):
+        with self._lock:
+            if doctor_id is None:
+                self._days.clear()
+            else:
+                self._days = {key: entry for key, entry in self._days.items() if key[0] != doctor_id}
+
+    # --- queries ---
+    def free_slots(self, doctor_id, day):
+        """Bookable slot datetimes for one doctor on one day."""
+        booked = self._bitmaps([doctor_id], [day])[(doctor_id, day)]
+        start = self._first_bookable(day, self._now())
+        return [self.slot_at(day, n) for n in range(start, self.slots_per_day)
+                if not booked >> n & 1]
+
+    def next_available(self, doctor_ids, after=None, horizon_days=30, window_days=7):
+        """Earliest (doctor_id, slot) free among ``doctor_ids``, or None.
+
+        Days are loaded ``window_days`` at a time and scanned in order; on a
+        tie the doctor listed first wins, so pass them in preference order.
+        """
+        doctor_ids = list(dict.fromkeys(doctor_ids))
+        if not doctor_ids:
+            return None
+        now = max(after, self._now()) if after else self._now()
+        today = now.date()
+        for offset in range(0, horizon_days, window_days):
+            days = [today + timedelta(days=offset + i)
+                    for i in range(min(window_days, horizon_days - offset))]
+            bitmaps = self._bitmaps(doctor_ids, days)
+            for day in days:
+                start = self._first_bookable(day, now)
+                best = None
+                for doctor_id in doctor_ids:
+                    number = _first_free(bitmaps[(doctor_id, day)], start, self._full)
+                    if number is not None and (best is None or number < best[1]):
+                        best = (doctor_id, number)
+                if best is not None:
+                    return best[0], self.slot_at(day, best[1])
+        return None
+
+    # --- booking ---
+    def book(self, patient_id, doctor_id, slot, reason):
+        """Insert the appointment or raise InvalidSlot / SlotTaken."""
+        number = self.slot_number(slot)
+        if slot <= self._now():
+            raise InvalidSlot("That slot has already started")
+
+        booked = self._bitmaps([doctor_id], [slot.date()])[(doctor_id, slot.date())]
+        if booked >> number & 1:
+            self.conflicts += 1
+            raise SlotTaken(doctor_id, slot, self._next_free(doctor_id, slot))
+
+        appointment = Appointment(
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            date=slot.strftime(DATE_FORMAT),
+            time=slot.strftime(TIME_FORMAT),
+            slot_start=slot,
+            reason=reason,
+        )
+        db.session.add(appointment)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Lost the race to another request; the unique index decided
+            db.session.rollback()
+            self.conflicts += 1
+            self._mark(doctor_id, slot)
+            raise SlotTaken(doctor_id, slot, self._next_free(doctor_id, slot))
+        self._mark(doctor_id, slot)
+        return appointment
+
+    def _next_free(self, doctor_id, slot):
+        found = self.next_available([doctor_id], after=slot)
+        return found[1] if found else None
+
+    def stats(self):
+        return {
+            'cached_days': len(self._days),
+            'hits': self.hits,
+            'loads': self.loads,
+            'conflicts': self.conflicts,
+            'slots_per_day': self.slots_per_day,
+        }
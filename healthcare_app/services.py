@@ -0,0 +1,145 @@
+"""The long-lived objects the views share, one set per app.
+
+``create_app`` attaches a ``Services`` to ``app.extensions['aegiscare']``;
+views reach it through ``services.get()``.
+
+The cheap ones (caches, the throttle, the slot index, the job queue, the
+pub/sub broker) are built with the app. The chatbot gateway (imports
+``requests``, opens a session and a thread pool), the symptom matcher
+(reads and compiles the symptom vocabulary), the triage model (imports
+NumPy and trains on that vocabulary), the report store (imports NumPy)
+and the price service (vendor pool, cache) are built the
+first time a request needs them, so a worker boots without paying for
+subsystems it may never serve.
+"""
+import os
+import threading
+
+from flask import current_app
+
+import instrumentation
+import price_snapshots
+from jobs import JobQueue
+from passwords import PasswordHasher
+from pricing import PriceService
+from pubsub import Broker
+from scheduling import SlotIndex
+from specialist_directory import SpecialistDirectory
+from symptom_matcher import SymptomMatcher
+from throttle import LoginThrottle
+from user_cache import UserCache
+
+EXTENSION = 'aegiscare'
+
+
+def get():
+    return current_app.extensions[EXTENSION]
+
+
+class Services:
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.specialists = SpecialistDirectory(max_age=config['SPECIALIST_DIRECTORY_MAX_AGE'])
+        self.slots = SlotIndex.from_config(config)
+        self.users = UserCache.from_config(config)
+        self.hasher = PasswordHasher.from_config(config)
+        self.login_throttle = LoginThrottle.from_config(config) if config['LOGIN_THROTTLE_ENABLED'] else None
+        self.jobs = JobQueue.from_config(app)  # worker threads start with the first request
+        self.pubsub = Broker.from_config(config)
+        self.streams = threading.BoundedSemaphore(config['SSE_MAX_STREAMS'])  # open SSE responses
+        self._lazy = {}
+        self._lock = threading.RLock()
+        app.extensions[EXTENSION] = self
+        self._export_metrics()
+
+    def _export_metrics(self):
+        if not instrumentation.enabled():
+            return
+        instrumentation.add_collector('chatbot_cache', self._lazy_stats('chat_gateway', lambda g: g.cache.stats()))
+        instrumentation.add_collector('chatbot_breaker', self._lazy_stats('chat_gateway', lambda g: g.breaker.stats()))
+        instrumentation.add_collector('specialist_directory', self.specialists.stats)
+        instrumentation.add_collector('price_cache', self._lazy_stats('pricing', lambda p: p.stats()))
+        instrumentation.add_collector('slot_index', self.slots.stats)
+        instrumentation.add_collector('user_cache', self.users.stats)
+        instrumentation.add_collector('passwords', self.hasher.stats)
+        if self.login_throttle is not None:
+            instrumentation.add_collector('login_throttle', self.login_throttle.stats)
+        instrumentation.add_collector('jobs', self.jobs.stats)
+        instrumentation.add_collector('pubsub', self.pubsub.stats)
+        instrumentation.add_collector('reports', self._lazy_stats('reports', lambda r: r.stats()))
+
+    # --- Built on first use ---
+    @property
+    def chat_gateway(self):
+        return self._built('chat_gateway', self._make_chat_gateway)
+
+    @property
+    def symptom_matcher(self):
+        return self._built('symptom_matcher', self._make_symptom_matcher)
+
+    @property
+    def triage(self):
+        return self._built('triage', self._make_triage)
+
+    @property
+    def reports(self):
+        return self._built('reports', self._make_reports)
+
+    @property
+    def pricing(self):
+        return self._built('pricing', self._make_pricing)
+
+    def loaded(self):
+        """Names of the lazy services built so far."""
+        return sorted(self._lazy)
+
+    def _make_chat_gateway(self):
+        from chatbot_gateway import ChatGateway  # pulls in requests
+        gateway = ChatGateway.from_config(self.app.config)
+        if instrumentation.enabled():
+            gateway.on_upstream = lambda seconds: instrumentation.record_outbound('chatbot', seconds)
+        return gateway
+
+    def _make_symptom_matcher(self):
+        return SymptomMatcher.from_file(os.path.join(self.app.root_path, 'data', 'symptoms.json'))
+
+    def _make_triage(self):
+        from triage import TriageModel  # pulls in numpy
+        data = os.path.join(self.app.root_path, 'data')
+        return TriageModel.from_files(os.path.join(data, 'symptoms.json'), os.path.join(data, 'triage.json'),
+                                      min_confidence=self.app.config['TRIAGE_MIN_CONFIDENCE'],
+                                      matcher=self.symptom_matcher)
+
+    def _make_reports(self):
+        from reporting import ReportStore  # pulls in numpy
+        return ReportStore.from_config(self.app)
+
+    def _make_pricing(self):
+        return PriceService.from_config(self.app.config)
+
+    def _built(self, name, factory):
+        service = self._lazy.get(name)
+        if service is None:
+            with self._lock:
+                service = self._lazy.get(name)
+                if service is None:
+                    service = self._lazy[name] = factory()
+        return service
+
+    def _lazy_stats(self, name, collect):
+        # Metrics scrapes must not build a service just to report on it
+        def stats():
+            service = self._lazy.get(name)
+            return collect(service) if service is not None else {}
+        return stats
+
+    # --- Helpers shared by several blueprints ---
+    def prices(self, medicine_names):
+        """Snapshot prices for several medicines: {name: PricedMedicine}."""
+        return price_snapshots.priced(self.pricing, medicine_names, self.app.config['PRICE_SNAPSHOT_MAX_AGE'])
+
+    def ensure_priced(self, medicine):
+        """Price a newly prescribed medicine now unless a fresh snapshot exists."""
+        if not price_snapshots.lookup([medicine], self.app.config['PRICE_SNAPSHOT_MAX_AGE']):
+            price_snapshots.refresh(self.pricing, [medicine])
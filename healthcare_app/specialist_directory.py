@@ -0,0 +1,168 @@
+"""In-memory specialization -> doctors index for chatbot recommendations.
+
+The doctor list changes only on registration and profile edits, so it is
+loaded once and patched in place from those routes instead of being
+queried on every chat turn. A full reload still happens every
+``max_age`` seconds so edits made in other worker processes show up.
+
+``version`` goes up whenever the cached list actually changes, so
+rendered fragments (the booking page's doctor list) can be keyed by it.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy.orm import load_only
+
+from models import User
+
+DoctorEntry = namedtuple(
+    'DoctorEntry', ['id', 'name', 'specialization', 'hospital', 'location', 'experience']
+)
+
+
+def _entry(doctor):
+    return DoctorEntry(
+        id=doctor.id,
+        name=doctor.name,
+        specialization=doctor.specialization,
+        hospital=doctor.hospital,
+        location=doctor.location,
+        experience=doctor.experience or 0,
+    )
+
+
+def summary(entry):
+    """JSON-ready dict for an entry, or None."""
+    return entry._asdict() if entry is not None else None
+
+
+def _key(specialization):
+    return (specialization or '').strip().lower()
+
+
+def _rank(entry):
+    # Most experienced first; name keeps the order stable
+    return (-entry.experience, (entry.name or '').lower())
+
+
+class SpecialistDirectory:
+    def __init__(self, max_age=300, clock=time.monotonic):
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_specialty = {}  # lowercased specialization -> ranked entries
+        self._loaded_at = None
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.updates = 0
+
+    def reload(self):
+        """Rebuild the whole index from the database."""
+        doctors = User.query.options(
+            load_only(User.id, User.name, User.specialization, User.hospital,
+                      User.location, User.experience)
+        ).filter_by(role='doctor').all()
+
+        by_id = {doctor.id: _entry(doctor) for doctor in doctors}
+        by_specialty = {}
+        for entry in by_id.values():
+            by_specialty.setdefault(_key(entry.specialization), []).append(entry)
+        for entries in by_specialty.values():
+            entries.sort(key=_rank)
+
+        with self._lock:
+            if by_id != self._by_id:
+                self.version += 1
+            self._by_id = by_id
+            self._by_specialty = by_specialty
+            self._loaded_at = self._clock()
+            self.reloads += 1
+
+    def upsert(self, doctor):
+        """Add or refresh one doctor after a registration or profile edit."""
+        entry = _entry(doctor)
+        with self._lock:
+            if self._loaded_at is None:
+                return  # nothing cached yet; the first lookup loads everything
+            old = self._by_id.get(entry.id)
+            if old is not None:
+                bucket = self._by_specialty.get(_key(old.specialization), [])
+                bucket[:] = [e for e in bucket if e.id != entry.id]
+            self._by_id[entry.id] = entry
+            bucket = self._by_specialty.setdefault(_key(entry.specialization), [])
+            bucket.append(entry)
+            bucket.sort(key=_rank)
+            if entry != old:
+                self.version += 1
+            self.updates += 1
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or self.age() > self.max_age:
+            self.reload()
+
+    def current_version(self):
+        """``version`` after the staleness check that ``all_doctors`` makes."""
+        self._ensure_fresh()
+        return self.version
+
+    def age(self):
+        if self._loaded_at is None:
+            return None
+        return self._clock() - self._loaded_at
+
+    def doctors_for(self, specialization, near=None):
+        """Ranked doctors of one specialty.
+
+        Doctors whose location appears in ``near`` (the patient's address)
+        come first, then by experience.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            entries = list(self._by_specialty.get(_key(specialization), ()))
+        if entries:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if near and entries:
+            near = near.lower()
+            local = [e for e in entries if e.location and e.location.lower() in near]
+            if local:
+                entries = local + [e for e in entries if e not in local]
+        return entries
+
+    def get(self, doctor_id):
+        self._ensure_fresh()
+        return self._by_id.get(doctor_id)
+
+    def all_doctors(self):
+        """Every doctor, grouped by specialization then by name."""
+        self._ensure_fresh()
+        with self._lock:
+            entries = list(self._by_id.values())
+        return sorted(entries, key=lambda e: (_key(e.specialization), (e.name or '').lower()))
+
+    def best(self, specialization, near=None):
+        entries = self.doctors_for(specialization, near)
+        return entries[0] if entries else None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        age = self.age()
+        return {
+            'doctors': len(self._by_id),
+            'specialties': len(self._by_specialty),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'reloads': self.reloads,
+            'incremental_updates': self.updates,
+            'version': self.version,
+            'age_seconds': round(age, 3) if age is not None else None,
+            'max_age_seconds': self.max_age,
+            'stale': age is None or age > self.max_age,
+        }
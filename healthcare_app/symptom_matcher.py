@@ -0,0 +1,149 @@
+"""Symptom text -> specialty matching for the chatbot.
+
+The vocabulary (``data/symptoms.json``, English / Tamil / Hindi) is
+compiled once into an Aho-Corasick automaton, so one pass over the
+message finds every term no matter how large the vocabulary grows.
+Matches must sit on word boundaries, so "ear" no longer fires inside
+"heart" or "year". Every matched specialty is scored, and multi-word
+phrases count for more than single words. Equal scores go to the
+specialty whose term comes first in the vocabulary's ``precedence`` list
+(the keywords the old substring scan checked, in its order), then to the
+one listed first.
+"""
+import json
+import unicodedata
+from collections import deque
+
+
+def normalize(text):
+    return unicodedata.normalize('NFC', text).casefold()
+
+
+def _is_word_char(ch):
+    # Tamil and Devanagari vowel signs / viramas are combining marks (M*),
+    # not alphanumerics, but they are still part of the word.
+    return ch.isalnum() or ch == '_' or unicodedata.category(ch).startswith('M')
+
+
+def words(text):
+    """The words of ``text``, with Tamil / Devanagari signs kept inside them."""
+    found, current = [], []
+    for ch in text:
+        if _is_word_char(ch):
+            current.append(ch)
+        elif current:
+            found.append(''.join(current))
+            current = []
+    if current:
+        found.append(''.join(current))
+    return found
+
+
+class _Automaton:
+    """Aho-Corasick automaton over characters; outputs are (length, payload)."""
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for term, payload in terms:
+            self._add(term, payload)
+        self._link()
+
+    def _add(self, term, payload):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(term), payload))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Yield (start, end, payload) for every occurrence in ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i + 1 - length, i + 1, payload
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class SymptomMatcher:
+    def __init__(self, specialties, default='General Physician', precedence=()):
+        """``specialties`` maps a specialty to ``{lang: [terms]}``;
+        ``precedence`` lists the terms that break ties, strongest first."""
+        self.default = default
+        self._order = {name: i for i, name in enumerate(specialties)}
+        ranks = {}
+        for rank, term in enumerate(precedence):
+            ranks.setdefault(' '.join(normalize(term).split()), rank)
+        terms = {}
+        for specialty, by_lang in specialties.items():
+            for lang_terms in by_lang.values():
+                for term in lang_terms:
+                    term = ' '.join(normalize(term).split())
+                    if term:
+                        # A phrase is more specific than a single word
+                        terms[(term, specialty)] = len(term.split())
+        self.term_count = len(terms)
+        self._automaton = _Automaton(
+            (term, (specialty, weight, ranks.get(term, len(precedence))))
+            for (term, specialty), weight in terms.items()
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        return cls(vocabulary['specialties'], vocabulary.get('default', 'General Physician'),
+                   vocabulary.get('precedence', ()))
+
+    def _tally(self, text):
+        """{specialty: [score, best precedence rank]} for every specialty mentioned in ``text``."""
+        text = ' '.join(normalize(text).split())
+        tally = {}
+        for start, end, (specialty, weight, rank) in self._automaton.find(text):
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if end < len(text) and _is_word_char(text[end]):
+                continue
+            entry = tally.setdefault(specialty, [0, rank])
+            entry[0] += weight
+            entry[1] = min(entry[1], rank)
+        return tally
+
+    def scores(self, text):
+        """Return {specialty: score} for every specialty mentioned in ``text``."""
+        return {specialty: score for specialty, (score, _) in self._tally(text).items()}
+
+    def ranked(self, text):
+        """Matched specialties, best first; precedence, then vocabulary order, breaks ties."""
+        tally = self._tally(text)
+        ranked = sorted(tally, key=lambda name: (-tally[name][0], tally[name][1], self._order[name]))
+        return [(name, tally[name][0]) for name in ranked]
+
+    def match(self, text):
+        ranked = self.ranked(text)
+        return ranked[0][0] if ranked else self.default
@@ -0,0 +1,88 @@
+"""Shared fixtures: a fresh app on a file-backed SQLite database per test.
+
+    cd healthcare_app && python -m pytest -q
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'secret'
+HASH_METHOD = 'pbkdf2:sha256:1000'  # fast; the tests are not about hashing cost
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app
+    import migrations
+
+    app = create_app(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        REPORTS_DIR=str(tmp_path / 'reports'),
+        JOBS_WORKERS=0,
+        PRICE_SNAPSHOT_INTERVAL=0,
+        ANALYTICS_FOLD_INTERVAL=0,
+        PASSWORD_HASH_WORKERS=0,
+        PASSWORD_HASH_METHOD=HASH_METHOD,
+        LOGIN_THROTTLE_ENABLED=False,
+        INSTRUMENTATION_ENABLED=False,
+    )
+    with app.app_context():
+        migrations.upgrade()
+    yield app
+    with app.app_context():
+        from models import db
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    from models import db, User
+
+    def make_user(role, contact, **fields):
+        with app.app_context():
+            user = User(role=role, name=fields.pop('name', contact), contact=contact,
+                        password=generate_password_hash(PASSWORD, method=HASH_METHOD), **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make_user
+
+
+@pytest.fixture
+def login(app):
+    def login(contact):
+        client = app.test_client()
+        response = client.post('/login', data={'identifier': contact, 'password': PASSWORD})
+        assert response.status_code == 302, response.data
+        return client
+    return login
+
+
+@pytest.fixture
+def count_queries(app):
+    """``with count_queries() as statements:`` records every SQL statement sent."""
+    from models import db
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return count_queries
@@ -0,0 +1,93 @@
+"""Admin analytics: writes append deltas, fold() rolls them up."""
+import analytics
+from models import db, AnalyticsDelta, AnalyticsRollup, Order, Prescription
+
+
+def rollup(metric, key):
+    row = AnalyticsRollup.query.filter_by(metric=metric, key=key).first()
+    return (row.events, round(row.amount, 2)) if row else (0, 0.0)
+
+
+def test_writes_append_deltas_without_touching_rollups(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    with app.app_context():
+        analytics.fold()
+        before = AnalyticsRollup.query.count()
+        db.session.add(Order(patient_id=patient, status='Pending', final_price=10.0, final_vendor='NetMeds'))
+        db.session.commit()
+        assert AnalyticsRollup.query.count() == before
+        assert AnalyticsDelta.query.count() > 0
+
+
+def test_fold_matches_rebuild(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    doctor = make_user('doctor', 'doctor-1')
+    with app.app_context():
+        pres = Prescription(doctor_id=doctor, patient_id=patient, medicine='Paracetamol', price=5.0)
+        db.session.add(pres)
+        db.session.flush()
+        order = Order(patient_id=patient, prescription_id=pres.id, status='Pending',
+                      final_price=12.5, final_vendor='NetMeds')
+        db.session.add(order)
+        db.session.commit()
+        order.status = 'Cancelled'
+        db.session.add(Order(patient_id=patient, status='Delivered', final_price=20.0, final_vendor='NetMeds'))
+        db.session.commit()
+
+        assert analytics.fold(batch_size=2) > 0
+        assert AnalyticsDelta.query.count() == 0
+        folded = {(r.metric, r.key): (r.events, round(r.amount, 2)) for r in AnalyticsRollup.query if r.events}
+        assert rollup('totals', 'orders') == (2, 32.5)
+        assert rollup('vendor_revenue', 'NetMeds') == (1, 20.0)
+        assert rollup('orders_by_status', 'Pending') == (0, 0.0)
+
+        analytics.rebuild()
+        rebuilt = {(r.metric, r.key): (r.events, round(r.amount, 2)) for r in AnalyticsRollup.query if r.events}
+        assert folded == rebuilt
+
+
+def test_rolled_back_writes_leave_no_deltas(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    with app.app_context():
+        analytics.fold()
+        db.session.add(Order(patient_id=patient, status='Pending', final_price=10.0))
+        db.session.flush()
+        db.session.rollback()
+        assert AnalyticsDelta.query.count() == 0
+
+
+def test_apply_without_dialect_upsert(app, monkeypatch):
+    monkeypatch.setattr(analytics.database, 'insert_for', lambda connection, table: None)
+    with app.app_context():
+        connection = db.session.connection()
+        analytics.apply(connection, {('totals', 'orders'): [2, 30.0]})
+        analytics.apply(connection, {('totals', 'orders'): [1, 5.0], ('totals', 'feedback'): [1, 0.0]})
+        db.session.commit()
+        assert rollup('totals', 'orders') == (3, 35.0)
+        assert rollup('totals', 'feedback') == (1, 0.0)
+
+
+def test_admin_pages_only_read_and_post_folds(app, make_user, login, count_queries):
+    import services
+
+    patient = make_user('patient', 'patient-1')
+    make_user('admin', 'admin-1')
+    client = login('admin-1')
+    with app.app_context():
+        db.session.add(Order(patient_id=patient, status='Pending', final_price=10.0, final_vendor='NetMeds'))
+        db.session.commit()
+        pending = AnalyticsDelta.query.count()
+
+    with count_queries() as statements:
+        assert client.get('/admin/analytics').status_code == 200
+        assert client.get('/admin_dashboard').status_code == 200
+    assert not [s for s in statements if not s.lstrip().upper().startswith('SELECT')]
+    with app.app_context():
+        assert AnalyticsDelta.query.count() == pending
+
+    response = client.post('/admin/analytics/fold')
+    assert response.status_code == 202
+    with app.app_context():
+        services.get().jobs.run_pending()
+        assert AnalyticsDelta.query.count() == 0
+    assert client.get('/admin/analytics').get_json()['totals']['orders'] == 1
@@ -0,0 +1,90 @@
+"""Static files: fingerprinted URLs, long caching, revalidation and gzip."""
+import gzip
+import hashlib
+import os
+
+from flask import url_for
+
+from assets import DIGEST_LENGTH, AssetManifest
+
+
+def read_static(app, name):
+    with open(os.path.join(app.root_path, 'static', name), 'rb') as f:
+        return f.read()
+
+
+def test_urls_carry_the_content_hash(app):
+    digest = hashlib.sha256(read_static(app, 'styles.css')).hexdigest()[:DIGEST_LENGTH]
+    with app.test_request_context():
+        assert url_for('static', filename='styles.css') == f'/static/styles.{digest}.css'
+        assert url_for('static', filename='no-such.css') == '/static/no-such.css'
+
+
+def test_fingerprinted_urls_are_cached_for_a_year(app):
+    with app.test_request_context():
+        url = url_for('static', filename='styles.css')
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.cache_control.public and response.cache_control.immutable
+    assert response.cache_control.max_age == app.config['STATIC_MAX_AGE']
+    assert response.get_data() == read_static(app, 'styles.css')
+
+
+def test_plain_and_outdated_names_are_revalidated(app):
+    client = app.test_client()
+    for url in ('/static/styles.css', '/static/styles.000000000000.css'):
+        response = client.get(url)
+        assert response.status_code == 200 and response.cache_control.no_cache
+        assert response.cache_control.max_age is None
+        assert response.get_data() == read_static(app, 'styles.css')
+    assert client.get('/static/missing.css').status_code == 404
+    assert client.get('/static/../config.py').status_code == 404
+
+
+def test_matching_etag_is_a_304(app):
+    client = app.test_client()
+    first = client.get('/static/lang.js')
+    etag = first.headers['ETag']
+    assert etag
+
+    again = client.get('/static/lang.js', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert client.get('/static/lang.js', headers={'If-None-Match': '"stale"'}).status_code == 200
+    assert app.extensions['assets'].stats()['not_modified'] == 1
+
+
+def test_gzip_only_for_clients_that_accept_it(app):
+    client = app.test_client()
+    plain = client.get('/static/lang.js', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_data() == read_static(app, 'lang.js')
+
+    zipped = client.get('/static/lang.js', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert gzip.decompress(zipped.get_data()) == read_static(app, 'lang.js')
+    assert zipped.headers['ETag'] != plain.headers['ETag']  # different bytes, different tag
+    assert app.extensions['assets'].stats()['served_gzip'] == 1
+
+
+def test_small_and_binary_files_are_sent_as_is(tmp_path):
+    (tmp_path / 'tiny.css').write_text('body{}')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 4096)
+    manifest = AssetManifest(str(tmp_path), gzip_min_size=512)
+    assert manifest.get('tiny.css').gzipped is None
+    assert manifest.get('logo.png').gzipped is None
+
+
+def test_debug_reload_changes_the_url(tmp_path):
+    path = tmp_path / 'site.css'
+    path.write_text('body { color: red; }')
+    manifest = AssetManifest(str(tmp_path), check_mtime=True)
+    before = manifest.url_name('site.css')
+
+    path.write_text('body { color: blue; }')
+    os.utime(path, (os.path.getmtime(path) + 5,) * 2)
+    after = manifest.url_name('site.css')
+    assert before != after and after.startswith('site.') and after.endswith('.css')
+
+    asset, immutable = manifest.resolve(before)  # an old URL still gets the new bytes
+    assert asset.body == b'body { color: blue; }' and not immutable
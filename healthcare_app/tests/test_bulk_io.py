@@ -0,0 +1,100 @@
+"""Bulk import/export: per-row rejection and lossless round trips."""
+import io
+import json
+
+import bulk_io
+from models import db, Order, Prescription, User
+
+
+def import_text(entity, text, fmt='jsonl'):
+    errors = []
+    report = bulk_io.import_rows(entity, io.StringIO(text), fmt, workers=1,
+                                 on_error=errors.append, hash_method='pbkdf2:sha256:1000')
+    return report, errors
+
+
+def test_over_long_values_are_rejected_per_row(app):
+    rows = [
+        {'role': 'patient', 'name': 'ok', 'contact': '555-0100', 'password': 'pw'},
+        {'role': 'patient', 'name': 'long contact', 'contact': '9' * 25, 'password': 'pw'},
+        {'role': 'patient', 'name': 'x' * 101, 'contact': '555-0101', 'password': 'pw'},
+    ]
+    with app.app_context():
+        report, errors = import_text('users', ''.join(json.dumps(r) + '\n' for r in rows))
+        assert report.as_dict() == {'read': 3, 'inserted': 1, 'failed': 2}
+        assert [(e.line, e.message) for e in errors] == [
+            (2, 'contact: longer than 20 characters'),
+            (3, 'name: longer than 100 characters'),
+        ]
+        assert [u.contact for u in User.query] == ['555-0100']
+
+
+def test_orders_round_trip_keeps_checkout_keys(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    doctor = make_user('doctor', 'doctor-1')
+    with app.app_context():
+        pres = Prescription(doctor_id=doctor, patient_id=patient, medicine='Paracetamol', status='Ordered')
+        db.session.add(pres)
+        db.session.flush()
+        db.session.add(Order(patient_id=patient, prescription_id=pres.id, status='Pending',
+                             final_price=12.5, final_vendor='NetMeds', checkout_key='k' * 32))
+        db.session.commit()
+
+        exported = io.StringIO()
+        assert bulk_io.export_rows('orders', exported, 'csv') == 1
+        Order.query.delete()
+        db.session.commit()
+
+        report, errors = import_text('orders', exported.getvalue(), 'csv')
+        assert errors == [] and report.inserted == 1
+        assert Order.query.one().checkout_key == 'k' * 32
+
+
+def test_data_errors_fall_back_to_row_by_row(app, monkeypatch):
+    from sqlalchemy.exc import DataError
+
+    # SQLite does not enforce String lengths; raise what Postgres would
+    monkeypatch.setattr(bulk_io, '_too_long', lambda row, model: None)
+    execute = db.session.execute
+
+    def strict_execute(statement, params=None, *args, **kwargs):
+        if isinstance(params, list) and any(len(row.get('contact') or '') > 20 for row in params):
+            raise DataError(str(statement), params, Exception('value too long for type character varying(20)'))
+        return execute(statement, params, *args, **kwargs)
+
+    rows = [
+        {'role': 'patient', 'name': 'a', 'contact': '555-0100', 'password': 'pw'},
+        {'role': 'patient', 'name': 'b', 'contact': '9' * 25, 'password': 'pw'},
+        {'role': 'patient', 'name': 'c', 'contact': '555-0102', 'password': 'pw'},
+    ]
+    with app.app_context():
+        monkeypatch.setattr(db.session, 'execute', strict_execute)
+        report, errors = import_text('users', ''.join(json.dumps(r) + '\n' for r in rows))
+        monkeypatch.undo()
+        assert report.as_dict() == {'read': 3, 'inserted': 2, 'failed': 1}
+        assert errors[0].line == 2 and 'value too long' in errors[0].message
+        assert sorted(u.contact for u in User.query) == ['555-0100', '555-0102']
+
+
+def test_passwords_hash_in_a_pool_that_is_not_forked(app, monkeypatch):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from werkzeug.security import check_password_hash
+
+    contexts = []
+
+    class Recording(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            contexts.append(kwargs.get('mp_context'))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(bulk_io, 'ProcessPoolExecutor', Recording)
+    rows = ''.join(json.dumps({'role': 'patient', 'name': f'p{i}', 'contact': f'555-{i:04d}',
+                               'password': f'pw{i}'}) + '\n' for i in range(12))
+    with app.app_context():
+        report = bulk_io.import_rows('users', io.StringIO(rows), 'jsonl', workers=2,
+                                     hash_method='pbkdf2:sha256:1000')
+        assert report.as_dict() == {'read': 12, 'inserted': 12, 'failed': 0}
+        user = User.query.filter_by(contact='555-0007').one()
+        assert check_password_hash(user.password, 'pw7')
+    assert [context.get_start_method() for context in contexts] in (['forkserver'], ['spawn'])
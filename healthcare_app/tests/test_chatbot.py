@@ -0,0 +1,155 @@
+"""The chatbot falls back to local triage: no API key, bad replies, a busy or open upstream."""
+import pytest
+
+
+@pytest.fixture
+def no_upstream(monkeypatch):
+    import requests
+
+    def post(*args, **kwargs):
+        raise AssertionError("the upstream must not be called without an API key")
+    monkeypatch.setattr(requests.Session, 'post', post)
+
+
+def test_no_key_answers_from_triage(app, make_user, login, no_upstream):
+    app.config['CHATBOT_API_KEY'] = None
+    make_user('patient', 'patient-1')
+    client = login('patient-1')
+
+    response = client.post('/chatbot_api', data={'user_input': 'I have chest pain'})
+    assert response.status_code == 200
+    reply = response.get_json()['reply']
+    assert reply.startswith('🆘') and 'API Error' not in reply
+
+    streamed = client.post('/chatbot_api/stream', data={'user_input': 'I have chest pain'}).get_data(as_text=True)
+    assert 'event: token' in streamed and 'API Error' not in streamed and 'event: done' in streamed
+
+
+def test_no_key_is_the_default(monkeypatch):
+    import importlib
+    import config
+
+    monkeypatch.delenv('OPENROUTER_API_KEY', raising=False)
+    try:
+        assert importlib.reload(config).CHATBOT_API_KEY is None
+    finally:
+        importlib.reload(config)
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body=None, lines=()):
+        self.body = body
+        self.lines = lines
+
+    def json(self):
+        return self.body
+
+    def iter_lines(self, chunk_size=None):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.mark.parametrize('body', [
+    {'choices': []},
+    [],
+    {'choices': [{}]},
+    {'choices': [{'message': None}]},
+    {'choices': [{'message': {'content': None}}]},
+])
+def test_malformed_reply_falls_back(app, make_user, login, monkeypatch, body):
+    import requests
+    import services
+
+    app.config['CHATBOT_API_KEY'] = 'test'
+    monkeypatch.setattr(requests.Session, 'post', lambda *args, **kwargs: FakeResponse(body))
+    make_user('patient', 'patient-1')
+    client = login('patient-1')
+
+    response = client.post('/chatbot_api', data={'user_input': 'I have chest pain'})
+    assert response.status_code == 200
+    assert response.get_json()['reply'].startswith('🆘')
+    with app.app_context():
+        assert services.get().chat_gateway.breaker.failures == 1
+
+
+@pytest.mark.parametrize('line', [b'data: []', b'data: {"choices": [null]}',
+                                  b'data: {"choices": [{"delta": {"content": {"x": 1}}}]}'])
+def test_malformed_stream_falls_back(app, make_user, login, monkeypatch, line):
+    import requests
+    import services
+
+    app.config['CHATBOT_API_KEY'] = 'test'
+    monkeypatch.setattr(requests.Session, 'post', lambda *args, **kwargs: FakeResponse(lines=[line]))
+    make_user('patient', 'patient-1')
+    client = login('patient-1')
+
+    streamed = client.post('/chatbot_api/stream', data={'user_input': 'I have chest pain'}).get_data(as_text=True)
+    assert '🆘' in streamed and 'event: done' in streamed
+    with app.app_context():
+        assert services.get().chat_gateway.breaker.failures == 1
+
+
+@pytest.mark.parametrize('blocked', ['busy', 'open'])
+def test_busy_or_open_upstream_shows_only_the_fallback(app, make_user, login, no_upstream, caplog, blocked):
+    import threading
+    import services
+
+    app.config['CHATBOT_API_KEY'] = 'test'
+    make_user('patient', 'patient-1')
+    client = login('patient-1')
+    with app.app_context():
+        gateway = services.get().chat_gateway
+    if blocked == 'busy':
+        gateway._slots = threading.BoundedSemaphore(1)
+        gateway._slots.acquire()
+    else:
+        for _ in range(gateway.breaker.failure_threshold):
+            gateway.breaker.record_failure()
+
+    with caplog.at_level('WARNING', logger='blueprints.chatbot'):
+        reply = client.post('/chatbot_api', data={'user_input': 'I have chest pain'}).get_json()['reply']
+        streamed = client.post('/chatbot_api/stream',
+                               data={'user_input': 'I have chest pain'}).get_data(as_text=True)
+    assert reply.startswith('🆘') and 'API Error' not in reply
+    assert '🆘' in streamed and 'API Error' not in streamed
+    logged = [r.getMessage() for r in caplog.records if r.name == 'blueprints.chatbot']
+    expected = 'GatewayBusy' if blocked == 'busy' else 'GatewayUnavailable'
+    assert len(logged) == 2 and all(expected in message for message in logged)  # the detail is kept
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    from chatbot_gateway import CircuitBreaker
+
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+    assert breaker.allow() and breaker.state == breaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED  # one failure is not enough
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN and not breaker.allow()
+    now[0] = 4.0
+    assert not breaker.allow() and breaker.retry_in() == 6.0
+
+    # After reset_timeout one trial goes through; its failure reopens at once
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN and not breaker.allow()
+
+    # A trial that never reports back is replaced after another reset_timeout
+    now[0] = 20.0
+    assert breaker.allow() and breaker.state == breaker.HALF_OPEN
+    now[0] = 30.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED and breaker.failures == 0 and breaker.allow()
+    assert breaker.stats() == {'state': breaker.CLOSED, 'consecutive_failures': 0, 'opened': 2, 'rejected': 4}
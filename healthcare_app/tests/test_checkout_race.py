@@ -0,0 +1,64 @@
+"""Concurrent checkouts on a file-backed SQLite database place no duplicate orders.
+
+Several logged-in clients of one patient submit at the same moment, as
+double tabs (one prescription, a key each) and as double clicks (one
+cart, one key).
+"""
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+THREADS = 8
+ROUNDS = 3
+
+
+@pytest.fixture
+def prescriptions(app, make_user):
+    from models import db, Prescription
+
+    patient = make_user('patient', 'patient-1')
+    doctor = make_user('doctor', 'doctor-1', specialization='General Physician')
+    with app.app_context():
+        rows = [Prescription(doctor_id=doctor, patient_id=patient, medicine=f'Medicine {i}',
+                             dosage='1 tablet', price=10.0, status='Available')
+                for i in range(ROUNDS * 2)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [row.id for row in rows]
+
+
+def submit_all(clients, forms):
+    barrier = threading.Barrier(len(forms))
+
+    def one(i):
+        barrier.wait()
+        return clients[i].post('/epharmacy', data=forms[i]).status_code
+
+    with ThreadPoolExecutor(max_workers=len(forms)) as pool:
+        return list(pool.map(one, range(len(forms))))
+
+
+def test_one_order_per_checkout(app, login, prescriptions):
+    from models import Order
+
+    clients = [login('patient-1') for _ in range(THREADS)]
+    for r in range(ROUNDS):
+        tabs, clicks = prescriptions[2 * r], prescriptions[2 * r + 1]
+        statuses = submit_all(clients, [
+            {'prescription_id': tabs, 'vendor': 'MedPlus Mart', 'idempotency_key': f'tab-{r}-{i}'}
+            for i in range(THREADS)])
+        statuses += submit_all(clients, [
+            {'prescription_id': clicks, 'vendor': 'NetMeds', 'idempotency_key': f'click-{r}'}
+            for _ in range(THREADS)])
+        assert set(statuses) == {302}
+
+    with app.app_context():
+        orders = Order.query.all()
+    per_key = Counter(order.checkout_key for order in orders)
+    per_prescription = Counter(order.prescription_id for order in orders)
+    assert per_key == {**{f'click-{r}': 1 for r in range(ROUNDS)},
+                       **{key: 1 for key in per_key if key.startswith('tab-')}}
+    assert sum(1 for key in per_key if key.startswith('tab-')) == ROUNDS  # one winning tab per round
+    assert per_prescription == {pid: 1 for pid in prescriptions}
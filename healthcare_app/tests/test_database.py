@@ -0,0 +1,35 @@
+"""Creating apps does not pile up process-wide hooks; the secret key comes from the environment."""
+import os
+
+import pytest
+from sqlalchemy.orm import Session
+
+import database
+
+
+def test_hooks_are_registered_once(app, tmp_path, monkeypatch):
+    from app import create_app
+
+    forks = []
+    monkeypatch.setattr(os, 'register_at_fork', lambda **hooks: forks.append(hooks), raising=False)
+    listeners = len(Session().dispatch.after_begin)
+
+    apps = [create_app(TESTING=True, SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / f'{i}.db'}",
+                       JOBS_WORKERS=0, INSTRUMENTATION_ENABLED=False) for i in range(3)]
+    assert forks == []
+    assert len(Session().dispatch.after_begin) == listeners
+    for other in apps:
+        with other.app_context():
+            from models import db
+            assert db.engine in database._engines
+            db.engine.dispose()
+
+
+def test_secret_key_is_required_outside_debug_and_testing(monkeypatch):
+    from app import create_app
+
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app(SECRET_KEY=None, SQLALCHEMY_DATABASE_URI='sqlite://', JOBS_WORKERS=0)
+    assert create_app(SECRET_KEY='from-env', SQLALCHEMY_DATABASE_URI='sqlite://',
+                      JOBS_WORKERS=0).secret_key == 'from-env'
+    assert create_app(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite://', JOBS_WORKERS=0).secret_key
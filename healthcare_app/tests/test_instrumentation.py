@@ -0,0 +1,100 @@
+"""Request instrumentation: /metrics access, unhandled errors, failing statements, profiles."""
+import os
+
+import pytest
+from sqlalchemy import text
+
+import instrumentation
+
+
+@pytest.fixture
+def instrumented(tmp_path):
+    from app import create_app
+    import migrations
+    from models import db
+
+    app = create_app(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        JOBS_WORKERS=0,
+        INSTRUMENTATION_ENABLED=True,
+        METRICS_ALLOWED_IPS=['127.0.0.1', '10.1.0.0/16'],
+        METRICS_TOKEN='scrape-me',
+    )
+
+    @app.route('/_test/boom')
+    def boom():
+        raise RuntimeError("unhandled")
+
+    @app.route('/_test/bad_sql')
+    def bad_sql():
+        try:
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        except Exception:
+            db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        return 'ok'
+
+    with app.app_context():
+        migrations.upgrade()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize('remote_addr, headers, status', [
+    ('127.0.0.1', {}, 200),
+    ('10.1.2.3', {}, 200),
+    ('203.0.113.9', {}, 404),
+    ('203.0.113.9', {'Authorization': 'Bearer wrong'}, 404),
+    ('203.0.113.9', {'Authorization': 'Bearer scrape-me'}, 200),
+])
+def test_metrics_are_limited_to_allowed_scrapers(instrumented, remote_addr, headers, status):
+    client = instrumented.test_client()
+    response = client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+    assert response.status_code == status
+
+
+def test_unhandled_errors_are_recorded_as_500(instrumented):
+    response = instrumented.test_client().get('/_test/boom')
+    assert response.status_code == 500
+    assert instrumentation.metrics.requests[('boom', 'GET', 500)] == 1
+
+    # Propagated (debug / testing): no response ever reaches after_request
+    instrumented.config['PROPAGATE_EXCEPTIONS'] = True
+    with pytest.raises(RuntimeError):
+        instrumented.test_client().get('/_test/boom')
+    assert instrumentation.metrics.requests[('boom', 'GET', 500)] == 2
+
+
+def test_failing_statements_are_timed_and_popped(instrumented):
+    from models import db
+
+    assert instrumented.test_client().get('/_test/bad_sql').status_code == 200
+    statements, _ = instrumentation.metrics.sql['bad_sql']
+    assert statements >= 2  # the failed SELECT counts too
+    with instrumented.app_context():
+        with db.engine.connect() as conn:
+            assert not conn.info.get('_instr_started')
+
+
+def test_profiles_in_the_same_second_do_not_overwrite_each_other(tmp_path, monkeypatch):
+    import cProfile
+    import threading
+
+    monkeypatch.setattr(instrumentation.time, 'strftime', lambda fmt: '20300101-090000')
+    paths = []
+
+    def profile_one():
+        profiler = cProfile.Profile()
+        profiler.enable()
+        paths.append(instrumentation._stop_profiler(profiler, True, str(tmp_path), 'chatbot.chatbot_api'))
+
+    threads = [threading.Thread(target=profile_one) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(paths)) == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(os.path.basename(p) for p in paths)
@@ -0,0 +1,42 @@
+"""Job queue: deduplicated enqueue and handlers that are safe to re-run."""
+from models import db, Feedback, Job
+
+
+def test_dedupe_key_keeps_one_live_job(app, make_user):
+    admin = make_user('admin', 'admin-1')
+    queue = app.extensions['aegiscare'].jobs
+    with app.app_context():
+        first = queue.enqueue('reports.build', owner_id=admin, dedupe_key='reports.build')
+        second = queue.enqueue('reports.build', owner_id=admin, dedupe_key='reports.build')
+        assert second.id == first.id
+        assert Job.query.filter_by(kind='reports.build').count() == 1
+
+        # A finished build releases the key, so the next request queues a fresh one
+        queue.run_pending()
+        assert db.session.get(Job, first.id).dedupe_key is None
+        third = queue.enqueue('reports.build', owner_id=admin, dedupe_key='reports.build')
+        assert third.id != first.id
+
+
+def test_dedupe_conflict_keeps_callers_session(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    queue = app.extensions['aegiscare'].jobs
+    with app.app_context():
+        queue.enqueue('reports.build', dedupe_key='k')
+        db.session.add(Feedback(patient_id=patient, message='pending in the same session'))
+        queue.enqueue('reports.build', dedupe_key='k')
+        assert Feedback.query.count() == 1
+
+
+def test_feedback_job_rerun_does_not_duplicate(app, make_user):
+    patient = make_user('patient', 'patient-1')
+    queue = app.extensions['aegiscare'].jobs
+    with app.app_context():
+        job = queue.enqueue('feedback.submit', {'patient_id': patient, 'message': 'great service'})
+        queue.run_pending()
+        # The worker died after the handler committed: the lease sweep requeues it
+        db.session.get(Job, job.id).status = 'queued'
+        db.session.commit()
+        queue.run_pending()
+        assert Feedback.query.filter_by(patient_id=patient).count() == 1
+        assert db.session.get(Job, job.id).status == 'succeeded'
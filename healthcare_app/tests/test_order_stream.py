@@ -0,0 +1,86 @@
+"""The "My Orders" live stream without a shared broker, and its per-process cap."""
+import threading
+
+import pytest
+from sqlalchemy import update
+
+
+@pytest.fixture
+def patient_order(app, make_user):
+    from models import db, Order, Prescription
+
+    patient = make_user('patient', 'patient-1')
+    doctor = make_user('doctor', 'doctor-1', specialization='Cardiologist')
+    with app.app_context():
+        prescription = Prescription(doctor_id=doctor, patient_id=patient, medicine='Paracetamol',
+                                    dosage='1 tablet', price=10.0, status='Ordered')
+        db.session.add(prescription)
+        db.session.flush()
+        order = Order(patient_id=patient, prescription_id=prescription.id, status='Pending',
+                      final_price=12.5, final_vendor='NetMeds')
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+
+def test_changes_from_other_processes_are_polled(app, login, patient_order):
+    from models import db, Order
+
+    app.config.update(SSE_POLL_SECONDS=0.05, SSE_KEEPALIVE_SECONDS=0.05, SSE_STREAM_MAX_SECONDS=5)
+    client = login('patient-1')
+    response = client.get('/patient/my_orders/stream', buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+
+    # What a job worker in another process does: commit, publish to its own broker
+    with app.app_context():
+        db.session.execute(update(Order).where(Order.id == patient_order).values(status='Shipped'))
+        db.session.commit()
+
+    for chunk in chunks:
+        if chunk.startswith(b'event: order'):
+            assert b'"status": "Shipped"' in chunk and f'"order_id": {patient_order}'.encode() in chunk
+            break
+    else:
+        pytest.fail("no order event before the stream ended")
+    response.close()
+
+
+def test_open_streams_are_capped_per_process(app, login, patient_order):
+    import services
+
+    app.config.update(SSE_POLL_SECONDS=0, SSE_KEEPALIVE_SECONDS=0.05, SSE_STREAM_MAX_SECONDS=5)
+    app.extensions[services.EXTENSION].streams = threading.BoundedSemaphore(1)
+    client = login('patient-1')
+
+    first = client.get('/patient/my_orders/stream', buffered=False)
+    assert first.status_code == 200
+    second = client.get('/patient/my_orders/stream', buffered=False)
+    assert second.status_code == 503 and second.headers['Retry-After']
+
+    first.close()  # frees the slot
+    third = client.get('/patient/my_orders/stream', buffered=False)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_a_failed_setup_hands_the_slot_back(app, login, patient_order, monkeypatch):
+    import services
+    from blueprints import pharmacy
+
+    app.config.update(SSE_POLL_SECONDS=5, PROPAGATE_EXCEPTIONS=False)
+    svc = app.extensions[services.EXTENSION]
+    svc.streams = threading.BoundedSemaphore(1)
+    client = login('patient-1')
+
+    def broken(patient_id):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(pharmacy, '_order_statuses', broken)
+    for _ in range(3):
+        assert client.get('/patient/my_orders/stream').status_code == 500
+    assert svc.pubsub.stats()['subscriptions'] == 0
+
+    monkeypatch.undo()
+    response = client.get('/patient/my_orders/stream', buffered=False)
+    assert response.status_code == 200
+    response.close()
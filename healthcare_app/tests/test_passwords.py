@@ -0,0 +1,21 @@
+"""PasswordHasher's process pool, started after the web process has threads."""
+import threading
+
+from passwords import PasswordHasher
+
+HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_pool_is_not_forked_from_a_threaded_process():
+    stop = threading.Event()
+    busy = threading.Thread(target=stop.wait)  # a request thread already running
+    busy.start()
+    hasher = PasswordHasher(method=HASH_METHOD, workers=1, timeout=60)
+    try:
+        pwhash = hasher.hash('secret')
+        assert hasher.verify(pwhash, 'secret') and not hasher.verify(pwhash, 'wrong')
+        assert hasher._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    finally:
+        hasher.shutdown()
+        stop.set()
+        busy.join()
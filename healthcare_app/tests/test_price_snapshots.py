@@ -0,0 +1,76 @@
+"""Price snapshots: concurrent refreshes and the single scheduled refresh job."""
+import threading
+
+import price_snapshots
+from jobs import JobQueue
+from models import db, Job, PriceSnapshot
+from pricing import PriceService, default_vendors
+
+MEDICINES = ['Paracetamol', 'Ibuprofen', 'Amoxicillin']
+
+
+class RacingService(PriceService):
+    """Holds every caller inside quotes_many until all of them are there."""
+
+    def __init__(self, parties):
+        super().__init__(default_vendors())
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def quotes_many(self, medicine_names):
+        quotes = super().quotes_many(medicine_names)
+        self.barrier.wait()
+        return quotes
+
+
+def test_concurrent_refreshes_of_the_same_medicines(app):
+    service = RacingService(parties=2)
+    errors = []
+
+    def refresh():
+        try:
+            with app.app_context():
+                price_snapshots.refresh(service, MEDICINES)
+        except Exception as error:  # noqa: BLE001 - reported below
+            errors.append(error)
+
+    threads = [threading.Thread(target=refresh) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        assert sorted(s.medicine_key for s in PriceSnapshot.query) == sorted(m.lower() for m in MEDICINES)
+
+
+def test_refresh_updates_existing_snapshot(app):
+    service = PriceService(default_vendors())
+    with app.app_context():
+        price_snapshots.refresh(service, ['Paracetamol'])
+        first = db.session.scalar(db.select(PriceSnapshot.refreshed_at))
+        price_snapshots.refresh(service, ['paracetamol '])
+        db.session.expire_all()
+        assert PriceSnapshot.query.count() == 1
+        assert db.session.scalar(db.select(PriceSnapshot.refreshed_at)) >= first
+
+
+def test_one_scheduled_refresh_job_across_processes(app):
+    app.config['PRICE_SNAPSHOT_INTERVAL'] = 900
+    queue = app.extensions['aegiscare'].jobs
+    other_process = JobQueue(app, workers=0)
+    with app.app_context():
+        # Every process schedules the periodic tasks on its first request
+        queue.schedule_periodic()
+        other_process.schedule_periodic()
+        refreshes = Job.query.filter_by(kind=price_snapshots.REFRESH_JOB)
+        assert refreshes.count() == 1
+        first = refreshes.one()
+
+        assert queue.run_one()
+        assert db.session.get(Job, first.id).status == 'succeeded'
+        assert PriceSnapshot.query.count() == 0  # nothing prescribed yet
+        # The run queued exactly one follow-up, an interval later
+        pending = refreshes.filter_by(status='queued').all()
+        assert len(pending) == 1
+        assert (pending[0].run_at - db.session.get(Job, first.id).started_at).total_seconds() >= 899
@@ -0,0 +1,21 @@
+"""PriceService counters under concurrent callers."""
+from concurrent.futures import ThreadPoolExecutor
+
+from pricing import PriceService, default_vendors
+
+
+def test_lookup_counters_add_up_across_threads():
+    service = PriceService(default_vendors())
+    names = [f'Medicine {i}' for i in range(20)]
+    service.quotes_many(names)
+
+    def lookups(_):
+        for _ in range(200):
+            service.quotes_many(names)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lookups, range(8)))
+
+    stats = service.stats()
+    assert stats['misses'] == len(names)
+    assert stats['hits'] + stats['stale_hits'] == 8 * 200 * len(names)
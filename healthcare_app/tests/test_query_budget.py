@@ -0,0 +1,56 @@
+"""Listing pages run a fixed number of SQL statements, however many rows they show.
+
+N+1 regressions (a lazy load per row in a template) show up here as a
+count that grows with the page size.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+# Statements per page view; the user loader is cached, so a warm page
+# is only its own queries.
+BUDGETS = {
+    '/patient/my_orders': ('patient', 1),  # orders + prescription (joined)
+    '/doctor/manage_orders': ('doctor', 1),  # orders + prescription + patient (joined)
+    '/doctor/appointments': ('doctor', 1),  # appointments + patient (joined)
+    '/epharmacy': ('patient', 2),  # prescriptions, then one snapshot lookup for all of them
+}
+
+
+@pytest.fixture
+def seeded(app, make_user):
+    from models import db, Appointment, Order, Prescription
+
+    def seed(rows):
+        patient = make_user('patient', 'patient-1')
+        doctor = make_user('doctor', 'doctor-1', specialization='Cardiologist')
+        with app.app_context():
+            start = datetime(2030, 1, 1, 9, 0)
+            for i in range(rows):
+                ordered = Prescription(doctor_id=doctor, patient_id=patient, medicine=f'Medicine {i}',
+                                       dosage='1 tablet', price=10.0, status='Ordered')
+                db.session.add(ordered)
+                db.session.flush()
+                db.session.add(Order(patient_id=patient, prescription_id=ordered.id, status='Pending',
+                                     final_price=12.5, final_vendor='NetMeds'))
+                db.session.add(Prescription(doctor_id=doctor, patient_id=patient, medicine=f'Medicine {i}',
+                                            dosage='1 tablet', price=10.0, status='Available'))
+                slot = start + timedelta(minutes=30 * i)
+                db.session.add(Appointment(patient_id=patient, doctor_id=doctor, date=f'{slot:%Y-%m-%d}',
+                                           time=f'{slot:%H:%M}', slot_start=slot, reason='checkup'))
+            db.session.commit()
+    return seed
+
+
+@pytest.mark.parametrize('path', list(BUDGETS))
+@pytest.mark.parametrize('rows', [3, 20])
+def test_listing_query_budget(path, rows, seeded, login, count_queries):
+    role, budget = BUDGETS[path]
+    seeded(rows)
+    client = login(f'{role}-1')
+    assert client.get(path).status_code == 200  # warms the user cache and price snapshots
+
+    with count_queries() as statements:
+        response = client.get(path)
+    assert response.status_code == 200
+    assert len(statements) <= budget, "\n".join(statements)
@@ -0,0 +1,67 @@
+"""Every hot query is answered by an index on a seeded database (``check_query_plans``).
+
+Planners happily scan tiny tables, so the tables are filled and ANALYZEd
+first, the way ``flask db-check-plans`` should be run.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, inspect, text
+
+ROWS = 2000
+
+
+def _seed():
+    from models import db, Appointment, Job, Order, Prescription, User
+
+    specialties = ['Cardiologist', 'Dermatologist', 'Neurologist', 'Pediatrician']
+    users = [{'id': i, 'role': ('doctor', 'patient', 'patient', 'patient')[i % 4], 'name': f'user {i:05d}',
+              'contact': f'555-{i:06d}', 'password': 'x', 'specialization': specialties[i % 7 % 4]}
+             for i in range(1, ROWS + 1)]
+    doctors = [user['id'] for user in users if user['role'] == 'doctor']
+    patients = [user['id'] for user in users if user['role'] == 'patient']
+    start = datetime(2025, 1, 1, 9, 0)
+    slots = [start + timedelta(minutes=30 * i) for i in range(ROWS)]
+    db.session.execute(insert(User), users)
+    db.session.execute(insert(Appointment), [
+        {'patient_id': patients[i % len(patients)], 'doctor_id': doctors[i % len(doctors)],
+         'date': f'{slot:%Y-%m-%d}', 'time': f'{slot:%H:%M}', 'slot_start': slot, 'reason': 'checkup'}
+        for i, slot in enumerate(slots)])
+    db.session.execute(insert(Prescription), [
+        {'id': i + 1, 'doctor_id': doctors[i % len(doctors)], 'patient_id': patients[i % len(patients)],
+         'medicine': f'Medicine {i % 50}', 'dosage': '1 tablet', 'price': 10.0,
+         'status': ('Available', 'Ordered')[i % 2]}
+        for i in range(ROWS)])
+    db.session.execute(insert(Order), [
+        {'patient_id': patients[i % len(patients)], 'prescription_id': i + 1, 'status': 'Pending',
+         'final_price': 12.5, 'final_vendor': 'NetMeds'}
+        for i in range(1, ROWS, 2)])
+    db.session.execute(insert(Job), [
+        {'kind': 'noop', 'payload': '{}', 'status': ('succeeded', 'queued')[i % 10 == 0], 'priority': 5,
+         'attempts': 0, 'max_attempts': 3, 'run_at': start, 'created_at': start}
+        for i in range(ROWS)])
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def test_hot_queries_use_an_index(app):
+    import migrations
+
+    with app.app_context():
+        _seed()
+        report = migrations.check_query_plans()
+    scans = {name: plan for name, (plan, full_scan) in report.items() if full_scan}
+    assert not scans
+
+
+def test_upgrade_drops_retired_indexes(app):
+    import migrations
+    from models import db
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX ix_appointment_doctor_slot ON appointment (doctor_id, date, time)'))
+        migrations.upgrade()
+        names = {index['name'] for index in inspect(db.engine).get_indexes('appointment')}
+    assert 'ix_appointment_doctor_slot' not in names
+    assert 'uq_appointment_doctor_slot' in names
@@ -0,0 +1,54 @@
+"""Publishing report snapshots never removes a build in progress or the current one."""
+import os
+import time
+
+import reporting
+from reporting import ReportStore
+
+
+def published(directory):
+    return sorted(entry for entry in os.listdir(directory)
+                  if os.path.isdir(os.path.join(directory, entry)) and not entry.startswith(reporting.BUILDING))
+
+
+def test_rebuild_keeps_other_builds_in_progress(app, tmp_path):
+    directory = str(tmp_path / 'reports')
+    store = ReportStore(directory, keep=1)
+    os.makedirs(os.path.join(directory, '.tmp-00000000T000000000000-1'))  # another process, still writing
+
+    with app.app_context():
+        store.rebuild()
+        store.rebuild()
+
+    assert os.path.isdir(os.path.join(directory, '.tmp-00000000T000000000000-1'))
+    assert published(directory) == [reporting._pointed_at(directory)]
+    assert store.latest()['rows'] == {'orders': 0, 'prescriptions': 0}
+
+
+def test_prune_keeps_the_snapshot_latest_names(tmp_path):
+    directory = str(tmp_path)
+    for name in ('20250101T000000000000-1', '20250102T000000000000-2', '20250103T000000000000-3'):
+        os.makedirs(os.path.join(directory, name))
+    with open(os.path.join(directory, reporting.POINTER), 'w', encoding='utf-8') as f:
+        f.write('20250101T000000000000-1')  # an older build published last
+
+    reporting.prune(directory, keep=1)
+    assert published(directory) == ['20250101T000000000000-1', '20250103T000000000000-3']
+
+
+def test_prune_removes_abandoned_builds(tmp_path):
+    directory = str(tmp_path)
+    abandoned = os.path.join(directory, '.tmp-20250101T000000000000-1')
+    running = os.path.join(directory, '.tmp-20250102T000000000000-2')
+    os.makedirs(abandoned)
+    os.makedirs(running)
+    old = time.time() - reporting.ABANDONED_AFTER - 60
+    os.utime(abandoned, (old, old))
+
+    reporting.prune(directory, keep=1)
+    assert not os.path.exists(abandoned) and os.path.isdir(running)
+
+
+def test_reports_dir_is_under_the_instance_folder(app):
+    app.config['REPORTS_DIR'] = 'reports'
+    assert ReportStore.from_config(app).directory == os.path.join(app.instance_path, 'reports')
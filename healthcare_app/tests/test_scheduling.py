@@ -0,0 +1,80 @@
+"""Slot booking: one appointment per (doctor, slot) however the bookings race."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from scheduling import SlotIndex, SlotTaken
+
+NOW = datetime(2030, 1, 1, 8, 0)  # before opening on the day the tests book
+SLOT = datetime(2030, 1, 1, 9, 0)
+THREADS = 8
+
+
+@pytest.fixture
+def people(app, make_user):
+    patients = [make_user('patient', f'patient-{i}') for i in range(THREADS)]
+    doctors = [make_user('doctor', f'doctor-{i}', specialization='Cardiologist') for i in range(2)]
+    return patients, doctors
+
+
+def make_index():
+    return SlotIndex(opens='09:00', closes='17:00', slot_minutes=30, now=lambda: NOW)
+
+
+def test_concurrent_bookings_of_one_slot(app, people):
+    from models import Appointment
+
+    patients, (doctor, _) = people
+    index = make_index()
+    barrier = threading.Barrier(THREADS)
+
+    def book(patient_id):
+        with app.app_context():
+            barrier.wait()
+            try:
+                return index.book(patient_id, doctor, SLOT, 'checkup').id
+            except SlotTaken as taken:
+                return taken
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(book, patients))
+
+    booked = [r for r in results if not isinstance(r, SlotTaken)]
+    taken = [r for r in results if isinstance(r, SlotTaken)]
+    assert len(booked) == 1 and len(taken) == THREADS - 1
+    assert {t.next_free for t in taken} == {datetime(2030, 1, 1, 9, 30)}
+    with app.app_context():
+        assert Appointment.query.filter_by(doctor_id=doctor, slot_start=SLOT).count() == 1
+
+
+def test_insert_conflict_with_a_stale_index(app, people):
+    """Another worker booked after this index cached the day: the unique index decides."""
+    from models import db, Appointment
+
+    (first, second, *_), (doctor, _) = people
+    index, other_worker = make_index(), make_index()
+    with app.app_context():
+        assert SLOT in index.free_slots(doctor, SLOT.date())  # cached: slot looks free
+        other_worker.book(first, doctor, SLOT, 'checkup')
+        with pytest.raises(SlotTaken) as taken:
+            index.book(second, doctor, SLOT, 'checkup')
+        assert taken.value.next_free == datetime(2030, 1, 1, 9, 30)
+        assert index.stats()['conflicts'] == 1
+        assert SLOT not in index.free_slots(doctor, SLOT.date())  # marked after the conflict
+        assert Appointment.query.filter_by(doctor_id=doctor, slot_start=SLOT).count() == 1
+        db.session.remove()
+
+
+def test_next_available_prefers_the_earliest_slot_then_listed_order(app, people):
+    (patient, *_), (first_choice, second_choice) = people
+    index = make_index()
+    with app.app_context():
+        assert index.next_available([first_choice, second_choice]) == (first_choice, SLOT)
+        index.book(patient, first_choice, SLOT, 'checkup')
+        assert index.next_available([first_choice, second_choice]) == (second_choice, SLOT)
+        index.book(patient, second_choice, SLOT, 'checkup')
+        assert index.next_available([second_choice, first_choice]) == (second_choice, datetime(2030, 1, 1, 9, 30))
+        assert index.next_available([first_choice], after=datetime(2030, 1, 1, 16, 45)) == \
+            (first_choice, datetime(2030, 1, 2, 9, 0))
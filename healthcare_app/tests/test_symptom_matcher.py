@@ -0,0 +1,91 @@
+"""Keyword matching: word boundaries, phrases, case and the old scan's ordering."""
+import itertools
+import os
+
+import pytest
+
+from symptom_matcher import SymptomMatcher
+
+SYMPTOMS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'symptoms.json')
+
+# What match_specialist did before the matcher: first keyword found as a substring wins
+OLD_KEYWORDS = {
+    "heart": "Cardiologist",
+    "chest": "Cardiologist",
+    "throat": "ENT",
+    "fever": "General Physician",
+    "skin": "Dermatologist",
+    "eye": "Ophthalmologist",
+    "ear": "ENT",
+    "headache": "Neurologist",
+}
+
+
+def old_match(text):
+    text = text.lower()
+    for keyword, specialist in OLD_KEYWORDS.items():
+        if keyword in text:
+            return specialist
+    return "General Physician"
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return SymptomMatcher.from_file(SYMPTOMS)
+
+
+def small():
+    return SymptomMatcher({
+        'Cardiologist': {'en': ['heart', 'chest pain']},
+        'ENT': {'en': ['ear', 'sore throat']},
+        'General Physician': {'en': ['pain', 'fever']},
+    })
+
+
+def test_terms_only_match_whole_words():
+    m = small()
+    assert m.scores("my heart hurts") == {'Cardiologist': 1}
+    assert m.scores("all year, early and nearly every day") == {}
+    assert m.match("my ear hurts") == 'ENT'
+    assert m.match("ear-ache since last night") == 'ENT'  # punctuation is a boundary
+
+
+def test_phrases_outweigh_single_words():
+    m = small()
+    assert m.scores("chest pain") == {'Cardiologist': 2, 'General Physician': 1}
+    assert m.ranked("fever and chest pain")[0] == ('Cardiologist', 2)
+    assert m.match("a sore\n  throat") == 'ENT'  # whitespace inside a phrase is folded
+    assert m.scores("chest and pain") == {'General Physician': 1}  # the words, but not the phrase
+
+
+def test_matching_ignores_case():
+    m = small()
+    assert m.scores("CHEST PAIN") == m.scores("Chest Pain") == m.scores("chest pain")
+    assert m.match("My HEART races") == 'Cardiologist'
+
+
+def test_no_match_is_the_default():
+    assert small().match("nothing useful here") == 'General Physician'
+    assert SymptomMatcher({'ENT': {'en': ['ear']}}, default=None).match("heart") is None
+
+
+@pytest.mark.parametrize('first, second', list(itertools.permutations(OLD_KEYWORDS, 2)))
+def test_ties_resolve_like_the_old_scan(matcher, first, second):
+    text = f"I have {first} trouble and some {second} trouble"
+    assert matcher.match(text) == old_match(text)
+
+
+@pytest.mark.parametrize('text', [
+    "Heart racing", "tight CHEST", "sore throat and fever", "skin is dry",
+    "my eye is red", "ear hurts", "HEADACHE all day", "feeling fine",
+])
+def test_single_complaints_match_the_old_scan(matcher, text):
+    assert matcher.match(text) == old_match(text)
+
+
+def test_old_false_positives_are_gone(matcher):
+    assert old_match("my heart hurts") == 'Cardiologist'
+    assert old_match("I feel weary") == 'ENT'  # "ear" inside "weary"
+    assert matcher.match("I feel weary") == 'General Physician'
+    assert old_match("my eyebrows are itchy") == 'Ophthalmologist'
+    assert matcher.match("my eyebrows are itchy") == 'Dermatologist'
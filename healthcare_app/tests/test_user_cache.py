@@ -0,0 +1,69 @@
+"""The cached user behind the login loader: fewer queries, no stale snapshots."""
+import re
+
+USER_SELECT = re.compile(r'\bFROM "?user"?\b', re.IGNORECASE)
+
+
+def user_selects(statements):
+    return [s for s in statements if s.lstrip().upper().startswith('SELECT') and USER_SELECT.search(s)]
+
+
+def test_logged_in_requests_skip_the_user_query(app, make_user, login, count_queries):
+    import services
+
+    doctor = make_user('doctor', 'doctor-1', specialization='Cardiologist')
+    client = login('doctor-1')
+    users = app.extensions[services.EXTENSION].users
+    users.forget(doctor)  # start cold
+
+    with count_queries() as first:
+        assert client.get('/doctor_dashboard').status_code == 200
+    with count_queries() as later:
+        for _ in range(5):
+            assert client.get('/doctor_dashboard').status_code == 200
+
+    assert len(user_selects(first)) == 1
+    assert user_selects(later) == []
+    assert users.stats()['hits'] >= 5
+
+
+def test_edit_profile_drops_the_snapshot(app, make_user, login):
+    import services
+
+    doctor = make_user('doctor', 'doctor-1', specialization='Cardiologist', hospital='Old General',
+                       experience=3, location='Chennai')
+    client = login('doctor-1')
+    assert b'Old General' in client.get('/doctor/edit_profile').data  # snapshot cached
+
+    response = client.post('/doctor/edit_profile',
+                           data={'hospital': 'New Mission', 'experience': '4', 'location': 'Madurai'})
+    assert response.status_code == 302
+    page = client.get('/doctor/edit_profile').data
+    assert b'New Mission' in page and b'Old General' not in page
+    with app.app_context():
+        cached = services.get().users.load(doctor)
+        assert (cached.hospital, cached.experience, cached.location) == ('New Mission', 4, 'Madurai')
+
+
+def test_registration_drops_a_snapshot_left_under_a_reused_id(app, make_user):
+    import services
+    from models import db, User
+
+    make_user('patient', 'patient-1')
+    departed = make_user('doctor', 'doctor-1', name='Dr Gone', specialization='Cardiologist')
+    with app.app_context():
+        users = services.get().users
+        assert users.load(departed).name == 'Dr Gone'  # cached
+        db.session.delete(db.session.get(User, departed))  # the row goes, the snapshot stays
+        db.session.commit()
+
+    response = app.test_client().post('/register', data={
+        'role': 'admin', 'name': 'New Admin', 'address': 'Somewhere', 'contact': 'admin-1',
+        'password': 'secret',
+    })
+    assert response.status_code == 302
+    with app.app_context():
+        registered = User.query.filter_by(contact='admin-1').one()
+        assert registered.id == departed  # SQLite hands out the freed id again
+        cached = users.load(registered.id)
+        assert (cached.name, cached.role) == ('New Admin', 'admin')
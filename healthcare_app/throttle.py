@@ -0,0 +1,89 @@
+"""In-memory token-bucket throttling.
+
+Each key (an IP address, a login identifier) owns a bucket holding up to
+``capacity`` tokens, refilled at ``rate`` tokens per second. An attempt
+takes one token; an empty bucket means "slow down". Buckets are created
+on demand and the least recently used are dropped past ``max_keys``, so
+memory stays bounded under a flood of distinct keys.
+
+Limits are per process. With several workers the effective limit is
+multiplied by the worker count, which is still enough to keep a login
+storm from pinning every CPU on password hashing.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate, max_keys=100000, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+        self.allowed = 0
+        self.limited = 0
+
+    def _level(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def take(self, key):
+        """Consume one token for ``key``; returns 0 if allowed, else seconds to wait."""
+        now = self._clock()
+        with self._lock:
+            tokens = self._level(key, now)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                self.allowed += 1
+                return 0
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self.limited += 1
+        return (1 - tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self):
+        return {'keys': len(self._buckets), 'allowed': self.allowed, 'limited': self.limited}
+
+
+class LoginThrottle:
+    """One bucket per client IP and one per login identifier."""
+
+    def __init__(self, per_ip, per_identifier):
+        self.per_ip = per_ip
+        self.per_identifier = per_identifier
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            TokenBucket(config['LOGIN_IP_BURST'], config['LOGIN_IP_RATE']),
+            TokenBucket(config['LOGIN_IDENTIFIER_BURST'], config['LOGIN_IDENTIFIER_RATE']),
+        )
+
+    def check(self, ip, identifier=None):
+        """Seconds the caller must wait (0 = go ahead). Always charges the IP."""
+        wait = self.per_ip.take(ip or 'unknown')
+        if identifier and not wait:
+            wait = self.per_identifier.take(' '.join(identifier.lower().split()))
+        return wait
+
+    def succeeded(self, identifier):
+        # A correct password clears the account's own failures, not the IP's
+        self.per_identifier.reset(' '.join(identifier.lower().split()))
+
+    def stats(self):
+        ip, ident = self.per_ip.stats(), self.per_identifier.stats()
+        return {
+            'ip_keys': ip['keys'], 'ip_limited': ip['limited'],
+            'identifier_keys': ident['keys'], 'identifier_limited': ident['limited'],
+        }
@@ -0,0 +1,151 @@
+"""Offline triage: symptom text -> specialty and first-aid advice (en/ta/hi).
+
+The chatbot answers from here whenever the remote model is unavailable
+(see the circuit breaker in chatbot_gateway.py), without any network
+call.
+
+A specialty comes from the keyword matcher (symptom_matcher.py) when the
+message names a known symptom, and otherwise from a TF-IDF
+nearest-centroid classifier. The classifier is trained at load time on
+the symptom vocabulary (data/symptoms.json) plus example phrasings
+(data/triage.json). Features are words, word pairs and character
+3-grams inside words; the 3-grams let "vomited", "headaches" or an
+inflected Tamil / Hindi form share weight with the vocabulary term.
+Each specialty's centroid is an L2-normalised row of one float32 matrix,
+so classifying a message is a single gather and dot product, well under
+a millisecond.
+
+First-aid snippets, emergency phrases and the "not sure" reply live in
+data/triage.json.
+"""
+import json
+import math
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from symptom_matcher import SymptomMatcher, normalize, words
+
+LANGUAGES = ('en', 'ta', 'hi')
+
+# source: 'keywords' (vocabulary match), 'model' (classifier) or 'default' (no signal)
+Assessment = namedtuple('Assessment', ['specialty', 'confidence', 'source', 'language', 'urgent', 'advice'])
+
+
+def features(text):
+    """Feature counts of ``text``: words, word pairs and in-word character 3-grams."""
+    tokens = words(normalize(text))
+    counts = Counter()
+    for token in tokens:
+        counts['w:' + token] += 1
+        padded = f'<{token}>'
+        for i in range(len(padded) - 2):
+            counts['c:' + padded[i:i + 3]] += 1
+    for first, second in zip(tokens, tokens[1:]):
+        counts[f'b:{first} {second}'] += 1
+    return counts
+
+
+def detect_language(text, fallback='en'):
+    """'ta' or 'hi' when the message is written in that script, else ``fallback``."""
+    tamil = devanagari = 0
+    for ch in text:
+        if '\u0b80' <= ch <= '\u0bff':
+            tamil += 1
+        elif '\u0900' <= ch <= '\u097f':
+            devanagari += 1
+    if tamil or devanagari:
+        return 'ta' if tamil >= devanagari else 'hi'
+    return fallback if fallback in LANGUAGES else 'en'
+
+
+def _weights(counts):
+    # Sublinear term frequency: a repeated word is evidence, not proof
+    return {feature: 1.0 + math.log(count) for feature, count in counts.items()}
+
+
+class TriageModel:
+    def __init__(self, specialties, triage, default='General Physician', min_confidence=0.12, matcher=None):
+        """``specialties``: symptoms.json's ``{specialty: {lang: [terms]}}``;
+        ``triage``: the parsed data/triage.json; ``matcher``: an already
+        built SymptomMatcher over the same vocabulary, if there is one."""
+        self.default = default
+        self.min_confidence = min_confidence
+        self.matcher = matcher or SymptomMatcher(specialties, default)
+        self.first_aid = {name: entry['first_aid'] for name, entry in triage['specialties'].items()}
+        self.unsure = triage['unsure']
+        self.emergency_advice = triage['emergency']['advice']
+        self._emergency = SymptomMatcher({'emergency': triage['emergency']['terms']}, default=None)
+        self._train(specialties, triage['specialties'])
+
+    @classmethod
+    def from_files(cls, symptoms_path, triage_path, min_confidence=0.12, matcher=None):
+        with open(symptoms_path, encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        with open(triage_path, encoding='utf-8') as f:
+            triage = json.load(f)
+        return cls(vocabulary['specialties'], triage,
+                   default=vocabulary.get('default', 'General Physician'),
+                   min_confidence=min_confidence, matcher=matcher)
+
+    # --- Training ---
+    def _train(self, specialties, examples):
+        self.labels = list(specialties)
+        docs = []  # (label index, {feature: tf})
+        for index, name in enumerate(self.labels):
+            texts = [term for terms in specialties[name].values() for term in terms]
+            texts += [text for by_lang in examples.get(name, {}).get('examples', {}).values() for text in by_lang]
+            docs.extend((index, _weights(features(text))) for text in texts)
+
+        document_frequency = Counter(feature for _, doc in docs for feature in doc)
+        self.vocabulary = {feature: i for i, feature in enumerate(sorted(document_frequency))}
+        n_docs = len(docs)
+        self.idf = np.array([math.log((1 + n_docs) / (1 + document_frequency[feature])) + 1.0
+                             for feature in sorted(document_frequency)], dtype=np.float32)
+
+        centroids = np.zeros((len(self.labels), len(self.vocabulary)), dtype=np.float32)
+        for label, doc in docs:
+            columns = np.fromiter((self.vocabulary[f] for f in doc), dtype=np.intp, count=len(doc))
+            values = np.fromiter(doc.values(), dtype=np.float32, count=len(doc)) * self.idf[columns]
+            centroids[label, columns] += values / np.linalg.norm(values)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.where(norms == 0, 1, norms)
+
+    # --- Inference ---
+    def classify(self, text):
+        """(specialty, cosine similarity) of the nearest centroid; (None, 0.0) if no feature is known."""
+        known = [(self.vocabulary[f], w) for f, w in _weights(features(text)).items() if f in self.vocabulary]
+        if not known:
+            return None, 0.0
+        columns = np.fromiter((column for column, _ in known), dtype=np.intp, count=len(known))
+        values = np.fromiter((w for _, w in known), dtype=np.float32, count=len(known)) * self.idf[columns]
+        scores = self.centroids[:, columns] @ (values / np.linalg.norm(values))
+        best = int(scores.argmax())
+        return self.labels[best], float(scores[best])
+
+    def assess(self, text, lang_code='en'):
+        """Specialty, urgency and advice text for one message."""
+        ranked = self.matcher.ranked(text)
+        if ranked:
+            specialty, confidence, source = ranked[0][0], 1.0, 'keywords'
+        else:
+            specialty, confidence = self.classify(text)
+            source = 'model'
+            if specialty is None or confidence < self.min_confidence:
+                specialty, source = self.default, 'default'
+
+        language = detect_language(text, lang_code)
+        urgent = bool(self._emergency.scores(text))
+        parts = [self.emergency_advice[language]] if urgent else []
+        if source == 'default':
+            parts.append(self.unsure[language])
+        else:
+            parts.append(self.first_aid.get(specialty, self.unsure)[language])
+        return Assessment(specialty, round(confidence, 4), source, language, urgent, ' '.join(parts))
+
+    def stats(self):
+        return {
+            'specialties': len(self.labels),
+            'features': len(self.vocabulary),
+            'matrix_bytes': int(self.centroids.nbytes),
+        }
@@ -0,0 +1,157 @@
+"""Read-through cache behind the Flask-Login user loader.
+
+Every authenticated request used to load its ``User`` row. ``UserCache``
+keeps a snapshot of the row's columns (never the password hash) and
+hands back a ``CachedUser``: enough for ``current_user.id``, ``.role``,
+``.name`` and the profile fields the pages show, with no query at all.
+Anything else (relationships) falls through to the real row, loaded once.
+
+The default backend is the in-process LRU/TTL cache, so an edit made in
+another worker shows up after ``ttl`` seconds at most. Set
+``USER_CACHE_REDIS_URL`` to share one cache (and its invalidations)
+between workers; any Redis-protocol server works.
+
+Invalidate with ``forget(user_id)`` after writing a user row.
+"""
+import json
+import threading
+import time
+
+from flask_login import UserMixin
+
+from cache import TTLCache
+from models import db, User
+
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+# Columns copied into the snapshot; the password hash stays in the database
+FIELDS = tuple(c.key for c in User.__table__.columns if c.key != 'password')
+
+
+class CachedUser(UserMixin):
+    """Detached, read-only stand-in for a ``User`` row."""
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+        self._row = None
+
+    def __getattr__(self, name):
+        # Only reached for attributes not in the snapshot (relationships)
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if self._row is None:
+            self._row = db.session.get(User, self.id)
+        return getattr(self._row, name)
+
+    def __repr__(self):
+        return f"<CachedUser {self.id} {self.role}>"
+
+
+def snapshot(user):
+    return {field: getattr(user, field) for field in FIELDS}
+
+
+class _LocalBackend:
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id):
+        return self._cache.get(user_id)
+
+    def set(self, user_id, fields):
+        self._cache.set(user_id, fields)
+
+    def delete(self, user_id):
+        self._cache.delete(user_id)
+
+    def size(self):
+        return len(self._cache)
+
+
+class _RedisBackend:
+    PREFIX = 'aegiscare:user:'
+
+    def __init__(self, url, ttl):
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, user_id):
+        payload = self._client.get(f"{self.PREFIX}{user_id}")
+        return json.loads(payload) if payload else None
+
+    def set(self, user_id, fields):
+        self._client.set(f"{self.PREFIX}{user_id}", json.dumps(fields), ex=max(1, int(self.ttl)))
+
+    def delete(self, user_id):
+        self._client.delete(f"{self.PREFIX}{user_id}")
+
+    def size(self):
+        return None
+
+
+class UserCache:
+    def __init__(self, maxsize=2048, ttl=60, redis_url=None, clock=time.perf_counter):
+        if redis_url and redis is None:
+            raise RuntimeError("USER_CACHE_REDIS_URL is set but the redis package is not installed")
+        self.backend = _RedisBackend(redis_url, ttl) if redis_url else _LocalBackend(maxsize, ttl)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hit_seconds = 0.0
+        self.load_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            maxsize=config['USER_CACHE_SIZE'],
+            ttl=config['USER_CACHE_TTL'],
+            redis_url=config['USER_CACHE_REDIS_URL'],
+        )
+
+    def load(self, user_id):
+        """CachedUser for ``user_id``, or None if there is no such user."""
+        started = self._clock()
+        fields = self.backend.get(user_id)
+        if fields is not None:
+            elapsed = self._clock() - started
+            with self._lock:
+                self.hits += 1
+                self.hit_seconds += elapsed
+            return CachedUser(fields)
+
+        user = db.session.get(User, user_id)
+        fields = snapshot(user) if user is not None else None
+        if fields is not None:
+            self.backend.set(user_id, fields)
+        elapsed = self._clock() - started
+        with self._lock:
+            self.misses += 1
+            self.load_seconds += elapsed
+        return CachedUser(fields) if fields is not None else None
+
+    def forget(self, user_id):
+        self.backend.delete(user_id)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        avg_load = self.load_seconds / self.misses if self.misses else 0.0
+        avg_hit = self.hit_seconds / self.hits if self.hits else 0.0
+        return {
+            'size': self.backend.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'avg_load_ms': round(avg_load * 1000, 3),
+            'avg_hit_ms': round(avg_hit * 1000, 3),
+            # What the hits would have cost as loads, minus what they did cost
+            'saved_ms_total': round(max(0.0, avg_load - avg_hit) * self.hits * 1000, 3),
+        }